@@ -1,18 +1,22 @@
 import os
 import json
+import time
 import streamlit as st
-from supabase import create_client
+import repository as repo
+import thread_loader
+import thread_cache
+import transcript
+import live
+import metrics
 from datetime import datetime, timezone, date
 
 # ---------------- App + auth gate ----------------
 st.set_page_config(page_title="Flabee Admin", layout="wide")
+perf_run = repo.metrics_recorder().begin_run("admin", metrics.debug_enabled())
 
 # Admin PIN from secrets (set this in Cloud later)
 ADMIN_PIN = st.secrets.get("ADMIN_PIN", None)
 
-# Supabase client (service key required)
-sb = create_client(st.secrets["SUPABASE_URL"], st.secrets["SUPABASE_SERVICE_KEY"])
-
 # Simple gate
 st.sidebar.title("Admin")
 pin_ok = False
@@ -29,6 +33,7 @@ else:
     pin_ok = True
 
 if not pin_ok:
+    repo.metrics_recorder().end_run(perf_run)   # recorded, but no panel before the PIN
     st.stop()
 
 # ---------------- Helpers ----------------
@@ -38,49 +43,68 @@ def iso_to_dt(ts: str):
     except Exception:
         return None
 
-def list_conversations(search: str, limit: int, offset: int):
-    return sb.rpc(
-        "list_conversations",
-        {"p_search": search or None, "p_limit": limit, "p_offset": offset},
-    ).execute().data or []
-
-def list_messages(conv_id, before=None, limit=100):
-    return sb.rpc(
-        "list_messages",
-        {"p_conversation_id": conv_id, "p_before": before, "p_limit": limit},
-    ).execute().data or []
-
-def refresh_state():
-    st.session_state.pop("msgs_cache", None)
+def next_page(key: str, cursor):
+    st.session_state[key].append(cursor)
+
+def prev_page(key: str):
+    if len(st.session_state[key]) > 1:
+        st.session_state[key].pop()
+
+def refresh_state(conv_id):
+    # drop only the affected thread from the shared cache
+    repo.thread_cache().invalidate(conv_id)
+
+def write_status(status, key):
+    # ⏳ while a queued edit waits to be sent, ⚠ with Retry / Discard once it has failed
+    if status is None:
+        return
+    if status["state"] == "pending":
+        retrying = f" (retry {status['attempts']}: {status['error']})" if status["error"] else ""
+        st.caption(f"⏳ Saving…{retrying}")
+        return
+    st.caption(f"⚠ Not saved: {status['error']}")
+    r1, r2 = st.columns(2)
+    r1.button("Retry", key=f"retry_{key}", use_container_width=True, on_click=repo.retry_write, args=(key,))
+    r2.button("Discard", key=f"discard_{key}", use_container_width=True, on_click=repo.discard_write, args=(key,))
 
 # ---------------- Sidebar: select conversation ----------------
 with st.sidebar:
+    bulk_mode = st.toggle("Bulk mode", key="admin_bulk")
     st.subheader("Select Conversation")
 
-    if "admin_conv_page" not in st.session_state:
-        st.session_state.admin_conv_page = 1
+    # keyset paging state: stack of page-start cursors, current page on top
+    if "admin_conv_cursors" not in st.session_state:
+        st.session_state.admin_conv_cursors = [None]
 
     search = st.text_input("Search (user/last msg)", "")
+    if st.session_state.get("admin_conv_search") != search:
+        st.session_state.admin_conv_search = search
+        st.session_state.admin_conv_cursors = [None]
+
+    limit = 30
+    convs, next_cursor = repo.list_conversations(search, limit, after=st.session_state.admin_conv_cursors[-1])
+
     c1, c2 = st.columns(2)
     with c1:
-        if st.button("⟨ Prev", use_container_width=True, key="prev_admin"):
-            st.session_state.admin_conv_page = max(1, st.session_state.admin_conv_page - 1)
+        st.button("⟨ Prev", use_container_width=True, key="prev_admin", on_click=prev_page,
+                  args=("admin_conv_cursors",), disabled=len(st.session_state.admin_conv_cursors) <= 1)
     with c2:
-        if st.button("Next ⟩", use_container_width=True, key="next_admin"):
-            st.session_state.admin_conv_page += 1
-
-    limit = 30
-    offset = (st.session_state.admin_conv_page - 1) * limit
-    convs = list_conversations(search, limit, offset)
+        st.button("Next ⟩", use_container_width=True, key="next_admin", on_click=next_page,
+                  args=("admin_conv_cursors", next_cursor), disabled=next_cursor is None)
 
     if not convs:
         st.info("No conversations found.")
+        metrics.render_panel(repo.metrics_recorder(), perf_run)
         st.stop()
 
-    labels = [
-        f"{c['user_label'] or 'Chat'} • {c['status'] or 'open'} • {c['msg_count']} msgs • {c['last_message_at'][:19]}"
-        for c in convs
-    ]
+    page_stats = repo.conversation_stats(c["conversation_id"] for c in convs)
+
+    def thread_label(c):
+        stats = page_stats.get(c["conversation_id"])
+        split = f" • {stats['user_msgs']}u/{stats['assistant_msgs']}a" if stats else ""
+        return f"{c['user_label'] or 'Chat'} • {c['status'] or 'open'} • {c['msg_count']} msgs{split} • {(c['last_message_at'] or 'no messages')[:19]}"
+
+    labels = [thread_label(c) for c in convs]
     if "admin_conv_idx" not in st.session_state:
         st.session_state.admin_conv_idx = 0
 
@@ -91,70 +115,173 @@ with st.sidebar:
         format_func=lambda i: labels[i],
     )
 
+# ---------------- Bulk actions ----------------
+if bulk_mode:
+    st.title("Admin • Bulk actions")
+
+    scope = st.radio("Apply to", ["Picked conversations", "Every conversation matching a filter"], horizontal=True)
+    if scope == "Picked conversations":
+        page_labels = {c["conversation_id"]: label for c, label in zip(convs, labels)}
+        ids = st.multiselect("Conversations (current page)", options=list(page_labels),
+                             format_func=lambda cid: page_labels[cid])
+        selection = (scope, tuple(ids))
+    else:
+        f1, f2, f3, f4, f5 = st.columns([2, 1, 1, 1, 1])
+        with f1:
+            b_search = st.text_input("Search (user/last msg)", value=search, key="bulk_search")
+        with f2:
+            b_channel = st.selectbox("Channel", ["All"] + repo.list_channels(), key="bulk_channel")
+        with f3:
+            b_from = st.date_input("From", value=None, key="bulk_from")
+        with f4:
+            b_to = st.date_input("To", value=None, key="bulk_to")
+        with f5:
+            b_status = st.selectbox("Status", ["Any", "open", "closed"], key="bulk_status")
+        selection = (scope, b_search, b_channel, b_from, b_to, b_status)
+        # one round trip per filter, not per rerun (loading polls rerun every 0.5 s)
+        if st.session_state.get("bulk_ids", (None,))[0] != selection:
+            st.session_state.bulk_ids = (selection, repo.conversation_ids(
+                b_search, None if b_channel == "All" else b_channel, b_from, b_to,
+                None if b_status == "Any" else b_status,
+            ))
+        ids = st.session_state.bulk_ids[1]
+    st.caption(f"{len(ids)} conversations selected")
+
+    action = st.selectbox("Action", ["Set status", "Set tags", "Find & replace in messages"])
+    if action == "Set status":
+        bulk_status = st.selectbox("New status", ["open", "closed"])
+        plan = (action, bulk_status)
+    elif action == "Set tags":
+        t1, t2 = st.columns([3, 1])
+        with t1:
+            bulk_tags = [t.strip() for t in st.text_input("Tags (comma-separated)").split(",") if t.strip()]
+        with t2:
+            tag_mode = st.selectbox("Mode", ["add", "remove", "replace"])
+        plan = (action, tuple(bulk_tags), tag_mode)
+    else:
+        r1, r2 = st.columns(2)
+        with r1:
+            find = st.text_input("Find (exact text)")
+        with r2:
+            replace = st.text_input("Replace with")
+        plan = (action, find, replace)
+
+    def run_bulk(ids: list, dry_run: bool, progress=None) -> int:
+        if action == "Set status":
+            return repo.bulk_set_status(ids, bulk_status, dry_run=dry_run, progress=progress)
+        if action == "Set tags":
+            return repo.bulk_set_tags(ids, bulk_tags, tag_mode, dry_run=dry_run, progress=progress)
+        return repo.bulk_replace_content(ids, find, replace, dry_run=dry_run, progress=progress)
+
+    ready = bool(ids)
+    if action == "Set tags":
+        ready = ready and (bool(bulk_tags) or tag_mode == "replace")
+    elif action == "Find & replace in messages":
+        ready = ready and bool(find)
+    unit = "messages" if action == "Find & replace in messages" else "conversations"
+    b1, b2, b3 = st.columns([1, 1, 3])
+    with b1:
+        if st.button("Dry run", use_container_width=True, disabled=not ready):
+            with st.spinner("Counting…"):
+                # the previewed ids are frozen: Apply writes exactly these
+                st.session_state.bulk_preview = (selection, plan, list(ids), run_bulk(ids, dry_run=True))
+    # a preview only stands for the selection and action it was made with
+    preview = st.session_state.get("bulk_preview")
+    if preview and preview[:2] != (selection, plan):
+        preview = None
+    with b3:
+        confirmed = st.checkbox(
+            f"Apply to {len(preview[2])} conversations" if preview else "Apply (dry run first)",
+            key="bulk_confirm", disabled=not preview)
+    with b2:
+        apply = st.button("Apply", type="primary", use_container_width=True,
+                          disabled=not (ready and preview and confirmed))
+
+    if preview:
+        st.info(f"Dry run: {preview[3]} {unit} in {len(preview[2])} conversations would change.")
+
+    if apply:
+        frozen = preview[2]
+        bar = st.progress(0.0, text="Starting…")
+        t0 = time.perf_counter()
+        n = run_bulk(frozen, dry_run=False, progress=lambda done, total: bar.progress(
+            done / total, text=f"{done} / {total} conversations"))
+        elapsed = time.perf_counter() - t0
+        st.session_state.pop("bulk_preview", None)
+        st.session_state.pop("bulk_ids", None)   # the write may move rows in or out of the filter
+        st.success(f"Updated {n} {unit} in {elapsed:.1f}s ({len(frozen) / max(elapsed, 1e-3):.0f} conversations/s).")
+    metrics.render_panel(repo.metrics_recorder(), perf_run)
+    st.stop()
+
 selected = convs[st.session_state.admin_conv_idx]
 conv_id = selected["conversation_id"]
 
 st.title(f"Admin • {selected.get('user_label') or 'Conversation'}")
-st.caption(f"ID: {conv_id} • Updated: {selected['last_message_at']} • {selected['msg_count']} msgs")
+st.caption(f"ID: {conv_id} • Updated: {selected['last_message_at'] or '—'} • {selected['msg_count']} msgs")
+sel_stats = page_stats.get(conv_id)
+if sel_stats:
+    st.caption(transcript.stats_line(sel_stats) + (" • refresh pending" if sel_stats["stale"] else ""))
 
 # ---------------- Conversation actions ----------------
 st.subheader("Conversation Actions")
 
 col1, col2, col3 = st.columns([2,1,2])
 
+# edits are queued and shown at once; the write queue saves them in the background
 with col1:
     new_title = st.text_input("Title", value=selected.get("title") or "")
     if st.button("Rename", use_container_width=True):
-        sb.rpc("rename_conversation", {"p_conversation_id": conv_id, "p_title": new_title}).execute()
-        st.success("Title updated.")
-        refresh_state()
+        repo.queue_conversation_update(conv_id, title=new_title)
+    write_status(repo.conversation_write_status(conv_id, "title"), ("conversation", conv_id, "title"))
 
 with col2:
     new_status = st.selectbox("Status", options=["open", "closed"], index=0 if (selected.get("status") or "open")=="open" else 1)
     if st.button("Update Status", use_container_width=True):
-        sb.rpc("set_conversation_status", {"p_conversation_id": conv_id, "p_status": new_status}).execute()
-        st.success("Status updated.")
-        refresh_state()
+        repo.queue_conversation_update(conv_id, status=new_status)
+    write_status(repo.conversation_write_status(conv_id, "status"), ("conversation", conv_id, "status"))
 
 with col3:
     tags_csv = st.text_input("Tags (comma-separated)", value=", ".join(selected.get("tags") or []))
     if st.button("Save Tags", use_container_width=True):
         tags_list = [t.strip() for t in tags_csv.split(",") if t.strip()]
-        sb.rpc("set_conversation_tags", {"p_conversation_id": conv_id, "p_tags": tags_list}).execute()
-        st.success("Tags updated.")
-        refresh_state()
+        repo.queue_conversation_update(conv_id, tags=tags_list)
+    write_status(repo.conversation_write_status(conv_id, "tags"), ("conversation", conv_id, "tags"))
 
 st.divider()
 
 # ---------------- Messages: pick and edit ----------------
 st.subheader("Edit Messages")
 
-# cache messages per conv
-if "msgs_cache" not in st.session_state:
-    st.session_state.msgs_cache = {}
-
-if conv_id not in st.session_state.msgs_cache:
-    # load newest 200; you can paginate more if needed
-    all_rows, cursor = [], None
-    while True:
-        page = list_messages(conv_id, before=cursor, limit=200)
-        if not page:
-            break
-        all_rows.extend(page)
-        cursor = page[-1]["created_at"]
-        if len(page) < 200:
-            break
-    st.session_state.msgs_cache[conv_id] = list(reversed(all_rows))  # oldest->newest
-
-msgs = st.session_state.msgs_cache[conv_id]
+# messages come from the process-wide thread cache; misses load in the background
+cache = repo.thread_cache()
+loading = False
+msgs = cache.get(conv_id)
+if msgs is None:
+    # newest page now, older pages fetched in parallel time windows
+    load, version = cache.load(conv_id, lambda: thread_loader.start_load(
+        repo.list_messages, repo.list_messages_after, conv_id, selected["msg_count"]))
+    msgs = thread_cache.CompactThread(load.rows())
+    if load.error is not None:
+        cache.finish_load(conv_id, version)
+        st.error(f"Loading older messages failed: {load.error}")
+    elif load.done:
+        cache.put(conv_id, msgs, version)
+        cache.finish_load(conv_id, version)
+    else:
+        loading = True
+        st.progress(load.loaded / load.total, text=f"Loading older messages… {len(msgs)} loaded")
 
 if not msgs:
     st.info("No messages in this conversation.")
 else:
-    # selection dropdown
-    options = [f"{m['created_at'][:19]} • {m['role']} • {m['content'][:60].replace('\n',' ')}" for m in msgs]
-    sel_idx = st.selectbox("Select message", options=range(len(msgs)), format_func=lambda i: options[i], index=len(msgs)-1)
-    sel = msgs[sel_idx]
+    # selection dropdown over positions, labels built straight from the compact thread;
+    # the selected id is remembered so the selection survives older pages arriving
+    prev = msgs.find(st.session_state.get("admin_msg_id"))
+    msg_labels = msgs.labels()
+    pos = st.selectbox("Select message", options=range(len(msgs)), format_func=msg_labels.__getitem__,
+                       index=prev if prev >= 0 else len(msgs)-1)
+    sel = msgs[pos]
+    st.session_state.admin_msg_id = sel["id"]
 
     st.write(f"**Message ID:** {sel['id']}  \n**Role:** {sel['role']}  \n**Created:** {sel['created_at']}")
     new_content = st.text_area("Edit content", value=sel["content"], height=180)
@@ -162,16 +289,70 @@ else:
     cA, cB = st.columns([1,1])
     with cA:
         if st.button("Save Change", use_container_width=True):
-            sb.rpc("update_message", {"p_message_id": sel["id"], "p_content": new_content}).execute()
-            sel["content"] = new_content
-            st.success("Message updated.")
+            repo.queue_message_update(conv_id, sel, new_content)
+        write_status(repo.message_write_status(sel["id"]), ("message", sel["id"]))
 
     with cB:
         if st.button("Reload Messages", use_container_width=True):
-            st.session_state.msgs_cache.pop(conv_id, None)
+            refresh_state(conv_id)
+            repo.invalidate_messages(conv_id)
             st.rerun()
 
     # optional: show meta
     if sel.get("meta"):
         with st.expander("Message meta"):
             st.json(sel["meta"])
+
+# ---------------- Live updates ----------------
+# realtime inserts/edits patch the cached thread in place; rerun only when it changed
+feed = repo.message_feed()
+if feed.error is not None:
+    st.sidebar.caption(f"Live updates unavailable: {feed.error}")
+seen = feed.version(conv_id)
+# ...or when one of this thread's queued writes is saved or fails
+seen_writes = repo.pending_writes(conv_id)
+
+@st.fragment(run_every=live.WATCH_INTERVAL)
+def watch_feed():
+    if not loading and (feed.version(conv_id) != seen or repo.pending_writes(conv_id) != seen_writes):
+        st.rerun()
+
+watch_feed()
+
+# ---------------- Read ahead ----------------
+# newest page of the neighbouring threads (unless already cached) and the adjacent list pages
+idx = st.session_state.admin_conv_idx
+cursors = st.session_state.admin_conv_cursors
+repo.prefetch(
+    search, limit,
+    cursors=([next_cursor] if next_cursor is not None else []) + cursors[-2:-1],
+    conv_ids=[convs[i]["conversation_id"] for i in (idx + 1, idx - 1)
+              if 0 <= i < len(convs) and not cache.cached(convs[i]["conversation_id"])],
+    message_limit=thread_loader.PAGE_SIZE,
+)
+
+# ---------------- Cache stats ----------------
+with st.sidebar.expander("Cache stats"):
+    tc = cache.stats()
+    st.caption(
+        f"Threads: {tc['threads']} cached • {tc['bytes'] / 1e6:.1f} / {tc['max_bytes'] / 1e6:.0f} MB  \n"
+        f"Hits {tc['hits']} • misses {tc['misses']} • hit rate {tc['hit_rate']:.0%}  \n"
+        f"Evictions {tc['evictions']} • loading {tc['loading']}"
+    )
+    for name, pc in repo.page_cache_stats().items():
+        st.caption(f"{name.capitalize()} pages: {pc['entries']} • hits {pc['hits']} • misses {pc['misses']}")
+    pf = repo.prefetch_stats()
+    st.caption(
+        f"Prefetch: {pf['prefetch_hits']} of {pf['prefetched']} pages used • hit rate {pf['hit_rate']:.0%}  \n"
+        f"Wasted {pf['prefetch_wasted']} • jobs cancelled {pf['cancelled']} • {pf['ahead_bytes'] / 1e6:.1f} MB waiting"
+    )
+    wq = repo.write_queue_stats()
+    st.caption(f"Writes: {wq['pending']} pending • {wq['failed']} failed • {wq['sent']} saved in {wq['batches']} batches")
+
+# ---------------- Debug: per-rerun performance (?debug=1) ----------------
+metrics.render_panel(repo.metrics_recorder(), perf_run)
+
+# poll until the background load finishes
+if loading:
+    time.sleep(0.5)
+    st.rerun()
@@ -1,12 +1,15 @@
-import os
 import pandas as pd
-import altair as alt
 import streamlit as st
-from supabase import create_client
+import repository as repo
+import assets
+import export
+import transcript
+import analytics_store
+import analytics_engine
+import metrics
 from datetime import datetime, timedelta, timezone
 
 # ----- branding --------------------------------------------------------------
-LOGO_PATH = "flabeelogo.jpg"
 PALETTE = {
     "FUCHSIA": "#FF3C69",
     "BABY":    "#FFC2C8",
@@ -39,60 +42,67 @@ html, body, [data-testid="stAppViewContainer"]>.main {{
 # ---------------------------------------------------------------------------
 
 st.set_page_config(page_title="Flabee Analytics", layout="wide")
+perf_run = repo.metrics_recorder().begin_run("analytics", metrics.debug_enabled())
 st.markdown(GLASS_CSS, unsafe_allow_html=True)
 
-sb = create_client(st.secrets["SUPABASE_URL"], st.secrets["SUPABASE_SERVICE_KEY"])
+sb = repo.get_client()
+
+RANGES = [7, 30, 90]
+
+@st.cache_resource
+def get_store():
+    return analytics_store.AggregateStore()
 
 @st.cache_data(ttl=60)
-def load_data(cutoff_iso: str):
-    # Use .order("day") for ascending; desc=False is the default
-    daily = (
-        sb.table("daily_message_counts")
-          .select("*")
-          .gte("day", cutoff_iso)
-          .order("day")              # ascending
-          .execute()
-          .data
-    )
-    channel = (
-        sb.table("channel_message_counts")
-          .select("*")
-          .gte("day", cutoff_iso)
-          .order("day")              # ascending
-          .execute()
-          .data
-    )
-    active = (
-        sb.table("daily_active_conversations")
-          .select("*")
-          .gte("day", cutoff_iso)
-          .order("day")              # ascending
-          .execute()
-          .data
-    )
-    convs = (
-        sb.table("conversations")
-          .select("status,last_message_at")
-          .gte("last_message_at", cutoff_iso)
-          .execute()
-          .data
-    )
-    import pandas as pd
-    return pd.DataFrame(daily), pd.DataFrame(channel), pd.DataFrame(active), pd.DataFrame(convs)
+def load_status_counts(cutoff_iso: str):
+    # per-day totals / closed counts aggregated server-side; fetched once for the widest range
+    rows = sb.rpc("conversation_status_counts", {"p_from": cutoff_iso}).execute().data or []
+    return pd.DataFrame(rows, columns=["day", "total", "closed"])
+
+@st.cache_data(ttl=60)
+def load_conversation_stats(cutoff_iso: str):
+    # per day/channel sums of the trigger-maintained conversation_stats; no messages are read
+    rows = sb.rpc("conversation_stats_daily", {"p_from": cutoff_iso}).execute().data or []
+    return pd.DataFrame(rows, columns=["day", "channel", "conversations", "user_msgs", "assistant_msgs",
+                                       "responses", "response_ms_sum", "p50_first_response_ms",
+                                       "user_chars", "assistant_chars", "tokens"])
+
+@st.cache_data(ttl=600, show_spinner="Computing from raw messages…")
+def load_engine_metrics(cutoff_iso: str):
+    # raw rows pulled in bulk and aggregated page by page; cached per range for every session
+    with repo.metrics_recorder().span("analytics_engine", {"since": cutoff_iso}):
+        return analytics_engine.compute(sb, cutoff_iso)
+
+def load_data(cutoff_dt):
+    # daily aggregates come from the local Parquet store, synced incrementally
+    min_day = (datetime.now(timezone.utc) - timedelta(days=max(RANGES))).date()
+    store = get_store()
+    with repo.metrics_recorder().span("store.sync", {"min_day": min_day.isoformat()}):
+        store.sync(sb, min_day=min_day)
+    daily = store.frame("daily_message_counts", cutoff_dt)
+    channel = store.frame("channel_message_counts", cutoff_dt)
+    active = store.frame("daily_active_conversations", cutoff_dt)
+
+    status = load_status_counts(min_day.isoformat())
+    status = status[status["day"] >= cutoff_dt.isoformat()]
+    conv_stats = load_conversation_stats(min_day.isoformat())
+    conv_stats = conv_stats[conv_stats["day"] >= cutoff_dt.isoformat()]
+    return daily, channel, active, status, conv_stats
 
 
 # ----- sidebar controls ------------------------------------------------------
-try:
-    st.sidebar.image(LOGO_PATH, width=140)
-except Exception:
-    pass
+logo = assets.logo()
+if logo:
+    st.sidebar.image(logo, width=assets.LOGO_WIDTH)
 
 st.sidebar.title("Analytics")
-range_days = st.sidebar.selectbox("Range", [7, 30, 90], index=1)
+range_days = st.sidebar.selectbox("Range", RANGES, index=1)
+deep_dive = st.sidebar.toggle("Deep dive", help="Heatmap, response-time percentiles, resolution and thread "
+                                                "lengths, computed from raw messages (cached 10 min per range)")
 cutoff_dt = (datetime.now(timezone.utc) - timedelta(days=range_days)).date()
-cutoff_iso = cutoff_dt.isoformat()
 
-daily_df, channel_df, active_df, convs_df = load_data(cutoff_iso)
+with repo.metrics_recorder().span("load_data", {"cutoff": cutoff_dt.isoformat()}):
+    daily_df, channel_df, active_df, status_df, stats_df = load_data(cutoff_dt)
 
 st.title("Flabee Analytics")
 
@@ -101,14 +111,9 @@ total_msgs = int(daily_df["total"].sum()) if not daily_df.empty else 0
 total_convs = int(active_df["active_conversations"].sum()) if not active_df.empty else 0
 avg_msgs_per_conv = round(total_msgs / max(total_convs, 1), 2)
 
-if convs_df.empty:
-    closed = 0
-    total_in_range = 0
-    resolution_rate = 0.0
-else:
-    total_in_range = len(convs_df)
-    closed = int((convs_df["status"] == "closed").sum())
-    resolution_rate = round(100.0 * closed / max(total_in_range, 1), 1)
+total_in_range = int(status_df["total"].sum()) if not status_df.empty else 0
+closed = int(status_df["closed"].sum()) if not status_df.empty else 0
+resolution_rate = round(100.0 * closed / max(total_in_range, 1), 1)
 
 k1, k2, k3, k4 = st.columns(4)
 with k1: st.markdown(f'<div class="card kpi">{total_msgs}</div><div class="kpi-label">Messages</div>', unsafe_allow_html=True)
@@ -116,9 +121,25 @@ with k2: st.markdown(f'<div class="card kpi">{total_convs}</div><div class="kpi-
 with k3: st.markdown(f'<div class="card kpi">{avg_msgs_per_conv}</div><div class="kpi-label">Avg msgs / conversation</div>', unsafe_allow_html=True)
 with k4: st.markdown(f'<div class="card kpi">{resolution_rate}%</div><div class="kpi-label">Resolution rate</div>', unsafe_allow_html=True)
 
+# reply times and volume from conversation_stats (conversations by day of their last message)
+responses = int(stats_df["responses"].sum()) if not stats_df.empty else 0
+avg_reply = transcript.fmt_duration(stats_df["response_ms_sum"].sum() / responses) if responses else "—"
+first_reply = stats_df["p50_first_response_ms"].dropna()
+typical_first_reply = transcript.fmt_duration(first_reply.median()) if not first_reply.empty else "—"
+total_tokens = int(stats_df["tokens"].sum()) if not stats_df.empty else 0
+stats_msgs = int(stats_df["user_msgs"].sum() + stats_df["assistant_msgs"].sum()) if not stats_df.empty else 0
+chars_per_msg = round((stats_df["user_chars"].sum() + stats_df["assistant_chars"].sum()) / max(stats_msgs, 1))
+
+k5, k6, k7, k8 = st.columns(4)
+with k5: st.markdown(f'<div class="card kpi">{avg_reply}</div><div class="kpi-label">Avg reply time</div>', unsafe_allow_html=True)
+with k6: st.markdown(f'<div class="card kpi">{typical_first_reply}</div><div class="kpi-label">Typical first reply (median of daily p50)</div>', unsafe_allow_html=True)
+with k7: st.markdown(f'<div class="card kpi">{total_tokens:,}</div><div class="kpi-label">Tokens</div>', unsafe_allow_html=True)
+with k8: st.markdown(f'<div class="card kpi">{chars_per_msg}</div><div class="kpi-label">Chars / message</div>', unsafe_allow_html=True)
+
 st.divider()
 
 # ----- Daily volume (user vs assistant) -------------------------------------
+import altair as alt   # ~200 ms to import and only the charts use it, so the KPIs above render first
 if not daily_df.empty:
     daily_long = daily_df.melt(id_vars=["day"], value_vars=["user_msgs","assistant_msgs"],
                                var_name="role", value_name="count")
@@ -159,16 +180,97 @@ if not active_df.empty:
 else:
     st.info("No activity data in selected range.")
 
+# ----- Reply times -----------------------------------------------------------
+st.subheader("Reply times")
+if not stats_df.empty:
+    per_day = stats_df.groupby("day", as_index=False).agg(
+        responses=("responses", "sum"), response_ms_sum=("response_ms_sum", "sum"),
+        p50_first_response_ms=("p50_first_response_ms", "median"))
+    per_day["Avg reply"] = per_day["response_ms_sum"] / per_day["responses"].where(per_day["responses"] > 0) / 1000
+    per_day["p50 first reply"] = per_day["p50_first_response_ms"] / 1000
+    reply_long = per_day.melt(id_vars=["day"], value_vars=["Avg reply", "p50 first reply"],
+                              var_name="measure", value_name="seconds").dropna()
+    replies = alt.Chart(reply_long).mark_line(point=True).encode(
+        x=alt.X("day:T", title="Day"),
+        y=alt.Y("seconds:Q", title="Seconds"),
+        color=alt.Color("measure:N", title="",
+                        scale=alt.Scale(domain=["Avg reply", "p50 first reply"],
+                                        range=[PALETTE["NAVY"], PALETTE["CONGO"]]))
+    ).properties(height=260)
+    st.altair_chart(replies, use_container_width=True)
+else:
+    st.info("No conversation stats in selected range.")
+
+# ----- Deep dive: metrics computed from raw rows -------------------------------
+engine_frames = ()
+if deep_dive:
+    deep = load_engine_metrics(cutoff_dt.isoformat())
+    st.subheader("Deep dive")
+    pct = deep["response_percentiles"]
+    st.caption(f"{deep['messages']:,} messages in {deep['seconds']:.1f}s"
+               + (f" · responses p50 {transcript.fmt_duration(pct['p50'] * 1000)}"
+                  f" · p90 {transcript.fmt_duration(pct['p90'] * 1000)}"
+                  f" · p99 {transcript.fmt_duration(pct['p99'] * 1000)}" if pct else ""))
+
+    d1, d2 = st.columns(2)
+    with d1:
+        heat = alt.Chart(deep["heatmap"]).mark_rect().encode(
+            x=alt.X("hour:O", title="Hour (UTC)"),
+            y=alt.Y("weekday:O", sort=analytics_engine.WEEKDAYS, title=""),
+            color=alt.Color("messages:Q", title="Messages",
+                            scale=alt.Scale(range=[PALETTE["JASMINE"], PALETTE["FUCHSIA"]]))
+        ).properties(height=260, title="Messages by hour")
+        st.altair_chart(heat, use_container_width=True)
+    with d2:
+        if not deep["response_times"].empty:
+            rt_long = deep["response_times"].melt(id_vars=["day"], value_vars=["p50", "p90"],
+                                                  var_name="percentile", value_name="seconds")
+            rt = alt.Chart(rt_long).mark_line(point=True).encode(
+                x=alt.X("day:T", title="Day"),
+                y=alt.Y("seconds:Q", title="Seconds", scale=alt.Scale(type="log")),
+                color=alt.Color("percentile:N", title="",
+                                scale=alt.Scale(domain=["p50", "p90"], range=[PALETTE["NAVY"], PALETTE["FUCHSIA"]]))
+            ).properties(height=260, title="Response time percentiles")
+            st.altair_chart(rt, use_container_width=True)
+        else:
+            st.info("No responses in selected range.")
+
+    d3, d4 = st.columns(2)
+    with d3:
+        res = alt.Chart(deep["resolution"]).mark_bar().encode(
+            x=alt.X("resolution_rate:Q", title="Resolution rate (%)"),
+            y=alt.Y("channel:N", sort="-x", title="Channel"),
+            tooltip=["channel", "conversations", "closed", "resolution_rate"],
+            color=alt.value(PALETTE["CONGO"])
+        ).properties(height=260, title="Resolution by channel")
+        st.altair_chart(res, use_container_width=True)
+    with d4:
+        lengths = alt.Chart(deep["lengths"]).mark_bar().encode(
+            x=alt.X("messages:N", sort=analytics_engine.LENGTH_LABELS, title="Messages per conversation"),
+            y=alt.Y("conversations:Q", title="Conversations"),
+            color=alt.value(PALETTE["NAVY"])
+        ).properties(height=260, title="Conversation lengths")
+        st.altair_chart(lengths, use_container_width=True)
+    engine_frames = (("heatmap", deep["heatmap"]), ("response_times", deep["response_times"]),
+                     ("resolution", deep["resolution"]), ("lengths", deep["lengths"]))
+
 # ----- Exports ---------------------------------------------------------------
+def frame_downloads(name: str, df):
+    # the payloads are built when a download is clicked, not on every rerun
+    st.download_button(f"Download {name}.csv", lambda: df.to_csv(index=False), f"{name}.csv", "text/csv")
+    st.download_button(f"Download {name}.parquet", lambda: export.frame_parquet(df), f"{name}.parquet",
+                       export.PARQUET_MIME)
+
 st.subheader("Exports")
-cA, cB, cC = st.columns(3)
-with cA:
-    if not daily_df.empty:
-        st.download_button("Download daily.csv", daily_df.to_csv(index=False), "daily.csv", "text/csv")
-with cB:
-    if not channel_df.empty:
-        st.download_button("Download channels.csv", channel_df.to_csv(index=False), "channels.csv", "text/csv")
-with cC:
-    if not active_df.empty:
-        st.download_button("Download active.csv", active_df.to_csv(index=False), "active.csv", "text/csv")
+cA, cB, cC, cD = st.columns(4)
+for col, name, df in ((cA, "daily", daily_df), (cB, "channels", channel_df), (cC, "active", active_df),
+                      (cD, "conversation_stats", stats_df)):
+    with col:
+        if not df.empty:
+            frame_downloads(name, df)
+for col, (name, df) in zip(st.columns(4), engine_frames):
+    with col:
+        frame_downloads(name, df)
 
+# ----- Debug: per-rerun performance (?debug=1) --------------------------------
+metrics.render_panel(repo.metrics_recorder(), perf_run)
@@ -0,0 +1,187 @@
+"""Derived metrics computed from raw message and conversation rows.
+
+Messages are pulled in bulk through analytics_message_page: pages of
+parallel arrays (conversation id, role, epoch ms) in created_at order, so
+nothing but those three columns crosses the wire. Each page is folded into
+a MessageMetrics accumulator with vectorized numpy/pandas operations and
+then dropped; only the heatmap counters, one (day, gap) pair per response
+and the pending user turns of open conversations are kept. Memory therefore
+stays at one page plus 8 bytes per response, whatever the message count.
+
+A "response" is the first assistant message after one or more user
+messages, timed from the first of those user messages (as in
+conversation_stats).
+"""
+import time
+
+import numpy as np
+import pandas as pd
+
+# ---------------- Settings ----------------
+PAGE_SIZE = 50_000
+PENDING_TTL_MS = 7 * 86_400_000   # user turns unanswered this long stop waiting for a response
+LENGTH_BINS = [0, 1, 2, 5, 10, 20, 50, 100, 500, np.inf]
+LENGTH_LABELS = ["1", "2", "3-5", "6-10", "11-20", "21-50", "51-100", "101-500", "500+"]
+WEEKDAYS = ["Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun"]
+MS_PER_DAY = 86_400_000
+
+
+def message_pages(client, since: str, page_size: int = PAGE_SIZE):
+    """Yield analytics_message_page results ({conversation_id, role, created_at} arrays) from `since` on."""
+    cursor = None
+    while True:
+        page = client.rpc("analytics_message_page", {
+            "p_from": since,
+            "p_after_at": cursor["at"] if cursor else None,
+            "p_after_id": cursor["id"] if cursor else None,
+            "p_limit": page_size,
+        }).execute().data
+        if not page or not page["created_at"]:
+            return
+        yield page
+        if len(page["created_at"]) < page_size:
+            return
+        cursor = page["next"]
+
+
+def _quantile(sorted_values, starts, counts, q: float):
+    # per-group quantile of runs of sorted values, interpolated linearly like numpy/pandas
+    pos = (counts - 1) * q
+    lo = np.floor(pos).astype(np.int64)
+    hi = np.ceil(pos).astype(np.int64)
+    a = sorted_values[starts + lo].astype(np.float64)
+    b = sorted_values[starts + hi].astype(np.float64)
+    return a + (b - a) * (pos - lo)
+
+
+class MessageMetrics:
+    """Streaming accumulator over time-ordered message pages."""
+
+    def __init__(self):
+        self.heat = np.zeros(7 * 24, dtype=np.int64)   # weekday * 24 + hour (UTC)
+        self.messages = 0
+        self._gap_days, self._gaps = [], []            # per response: answer day, gap in seconds
+        self._pending = {}                             # conversation id -> first unanswered user ms
+
+    def add(self, conversation_id, role, created_at):
+        ts = np.asarray(created_at, dtype=np.int64)
+        if not len(ts):
+            return
+        self.messages += len(ts)
+        secs = ts // 1000
+        self.heat += np.bincount(((secs // 86_400 + 3) % 7) * 24 + secs // 3600 % 24, minlength=7 * 24)
+
+        conv = np.asarray(conversation_id, dtype=object)
+        role = np.asarray(role, dtype=object)
+        is_user, is_asst = role == "user", role == "assistant"
+        if self._pending:
+            # re-enter the still-open user turns of earlier pages ahead of this page
+            conv = np.concatenate([np.fromiter(self._pending.keys(), dtype=object, count=len(self._pending)), conv])
+            carried = np.fromiter(self._pending.values(), dtype=np.int64, count=len(self._pending))
+            ts = np.concatenate([carried, ts])
+            is_user = np.concatenate([np.ones(len(carried), bool), is_user])
+            is_asst = np.concatenate([np.zeros(len(carried), bool), is_asst])
+
+        codes, uniques = pd.factorize(conv)
+        order = np.lexsort((ts, codes))                # by conversation, then time (stable)
+        codes, ts, is_user, is_asst = codes[order], ts[order], is_user[order], is_asst[order]
+
+        # turn = assistant messages before this one in its conversation; the
+        # user messages of turn k are answered by the assistant message of turn k
+        asst = is_asst.astype(np.int64)
+        before = np.cumsum(asst) - asst
+        starts = np.flatnonzero(np.r_[True, codes[1:] != codes[:-1]])
+        turn = before - np.repeat(before[starts], np.diff(np.r_[starts, len(codes)]))
+        key = codes.astype(np.int64) * (len(codes) + 1) + turn
+
+        asked = pd.Series(ts[is_user]).groupby(key[is_user]).min()
+        answered = pd.Series(ts[is_asst], index=key[is_asst])
+        asked_at = asked.reindex(answered.index).to_numpy()
+        ok = ~np.isnan(asked_at)
+        answer_ms = answered.to_numpy()[ok]
+        self._gaps.append(((answer_ms - asked_at[ok]) / 1000).astype(np.float32))
+        self._gap_days.append((answer_ms // MS_PER_DAY).astype(np.int32))
+
+        # turns still waiting at the end of the page carry over to the next one
+        waiting = asked[~asked.index.isin(answered.index)]
+        waiting = waiting[waiting.to_numpy() >= ts.max() - PENDING_TTL_MS]
+        self._pending = dict(zip(uniques[waiting.index.to_numpy() // (len(codes) + 1)], waiting.to_numpy().tolist()))
+
+    @property
+    def responses(self) -> int:
+        return sum(len(g) for g in self._gaps)
+
+    def heatmap(self) -> pd.DataFrame:
+        grid = self.heat.reshape(7, 24)
+        return pd.DataFrame({
+            "weekday": np.repeat(WEEKDAYS, 24),
+            "hour": np.tile(np.arange(24), 7),
+            "messages": grid.ravel(),
+        })
+
+    def response_times(self) -> pd.DataFrame:
+        """Per day: responses and p50/p90/p99 response time in seconds."""
+        if not self.responses:
+            return pd.DataFrame(columns=["day", "responses", "p50", "p90", "p99"])
+        # one sort by (day, gap) and index arithmetic; a pandas groupby-quantile
+        # needs several times the memory of the gaps themselves
+        days = np.concatenate(self._gap_days)
+        gaps = np.concatenate(self._gaps)
+        order = np.lexsort((gaps, days))
+        days, gaps = days[order], gaps[order]
+        del order
+        starts = np.flatnonzero(np.r_[True, days[1:] != days[:-1]])
+        counts = np.diff(np.r_[starts, len(days)])
+        out = pd.DataFrame({
+            "day": pd.to_datetime(days[starts].astype("int64"), unit="D").date,
+            "responses": counts,
+        })
+        for name, q in (("p50", 0.5), ("p90", 0.9), ("p99", 0.99)):
+            out[name] = _quantile(gaps, starts, counts, q)
+        return out
+
+    def response_percentiles(self) -> dict:
+        if not self.responses:
+            return {}
+        gaps = np.concatenate(self._gaps)
+        p50, p90, p99 = np.percentile(gaps, [50, 90, 99])
+        return {"responses": len(gaps), "p50": float(p50), "p90": float(p90), "p99": float(p99)}
+
+
+def conversation_metrics(columns: dict) -> dict:
+    """Resolution by channel and the conversation length distribution, from analytics_conversations."""
+    df = pd.DataFrame({
+        "channel": pd.Categorical(columns.get("channel") or []),
+        "closed": np.asarray(columns.get("status") or [], dtype=object) == "closed",
+        "msg_count": np.asarray(columns.get("msg_count") or [], dtype=np.int64),
+    })
+    resolution = df.groupby("channel", observed=True).agg(conversations=("closed", "size"), closed=("closed", "sum"))
+    resolution["resolution_rate"] = (100.0 * resolution["closed"] / resolution["conversations"]).round(1)
+    lengths = pd.cut(df["msg_count"], LENGTH_BINS, labels=LENGTH_LABELS).value_counts(sort=False)
+    return {
+        "resolution": resolution.reset_index().sort_values("conversations", ascending=False),
+        "lengths": lengths.rename_axis("messages").reset_index(name="conversations"),
+    }
+
+
+def compute(client, since: str, pages=None) -> dict:
+    """Every derived metric for messages / conversations from `since` (ISO date or timestamp) on.
+
+    `pages` overrides the message source (an iterable of page dicts, as
+    message_pages yields); the conversation metrics then need `client` only
+    if it is not None.
+    """
+    t0 = time.perf_counter()
+    acc = MessageMetrics()
+    for page in (message_pages(client, since) if pages is None else pages):
+        acc.add(page["conversation_id"], page["role"], page["created_at"])
+    result = {
+        "heatmap": acc.heatmap(),
+        "response_times": acc.response_times(),
+        "response_percentiles": acc.response_percentiles(),
+        "messages": acc.messages,
+    }
+    if client is not None:
+        result.update(conversation_metrics(client.rpc("analytics_conversations", {"p_from": since}).execute().data or {}))
+    result["seconds"] = time.perf_counter() - t0
+    return result
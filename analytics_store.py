@@ -0,0 +1,119 @@
+import json
+import os
+import threading
+import time
+from datetime import date, timedelta
+
+import pandas as pd
+
+# ---------------- Settings ----------------
+STORE_DIR = os.environ.get("FLABEE_ANALYTICS_STORE", ".analytics_cache")
+RECHECK_DAYS = 3          # recent days re-fetched on every sync (late rows, corrections)
+SYNC_INTERVAL = 60        # seconds between syncs, shared by every session
+PAGE_SIZE = 1000          # PostgREST max-rows default
+
+# daily aggregate tables mirrored locally (every row has an ISO `day`) and the
+# columns that order them uniquely, so range() paging never skips a row
+TABLES = {
+    "daily_message_counts": ("day",),
+    "channel_message_counts": ("day", "channel"),
+    "daily_active_conversations": ("day",),
+}
+
+
+class AggregateStore:
+    """Local Parquet mirror of the daily aggregate views.
+
+    Each sync only fetches days after the stored high-water mark, plus the last
+    RECHECK_DAYS days again, and replaces those days in the local file. Range
+    selectors are then answered from disk without touching Supabase.
+    """
+
+    def __init__(self, root: str = STORE_DIR):
+        self.root = root
+        self._lock = threading.Lock()
+        self._frames = {}
+        self._last_sync = 0.0
+        os.makedirs(root, exist_ok=True)
+        self._state = self._load_state()
+
+    # ---------------- Public ----------------
+    def sync(self, client, min_day: date, force: bool = False):
+        """Bring every table up to date, covering at least `min_day` onwards."""
+        with self._lock:
+            if not force and time.monotonic() - self._last_sync < SYNC_INTERVAL:
+                return
+            for table in TABLES:
+                self._sync_table(client, table, min_day)
+            self._save_state()
+            self._last_sync = time.monotonic()
+
+    def frame(self, table: str, cutoff: date) -> pd.DataFrame:
+        with self._lock:
+            df = self._frame(table)
+        return df[df["day"] >= cutoff.isoformat()].reset_index(drop=True) if not df.empty else df
+
+    def high_water(self, table: str):
+        return self._state.get(table, {}).get("hw")
+
+    # ---------------- Internals ----------------
+    def _sync_table(self, client, table: str, min_day: date):
+        state = self._state.get(table)
+        if state is None or state["from"] > min_day.isoformat():
+            # empty store, or the requested range reaches further back: refetch from min_day
+            start = min_day.isoformat()
+        else:
+            start = max(state["from"], (date.fromisoformat(state["hw"]) - timedelta(days=RECHECK_DAYS - 1)).isoformat())
+
+        fresh = pd.DataFrame(_fetch_since(client, table, start))
+        old = self._frame(table)
+        if not old.empty:
+            old = old[old["day"] < start]
+        df = pd.concat([old, fresh], ignore_index=True) if not old.empty else fresh
+        if not df.empty:
+            df = df.sort_values("day", kind="stable").reset_index(drop=True)
+
+        self._write(table, df)
+        self._frames[table] = df
+        hw = df["day"].max() if not df.empty else start
+        self._state[table] = {"from": min(start, state["from"]) if state else start, "hw": hw}
+
+    def _frame(self, table: str) -> pd.DataFrame:
+        if table not in self._frames:
+            path = self._path(table)
+            self._frames[table] = pd.read_parquet(path) if os.path.exists(path) else pd.DataFrame()
+        return self._frames[table]
+
+    def _write(self, table: str, df: pd.DataFrame):
+        tmp = self._path(table) + ".tmp"
+        df.to_parquet(tmp, index=False)
+        os.replace(tmp, self._path(table))
+
+    def _path(self, table: str) -> str:
+        return os.path.join(self.root, f"{table}.parquet")
+
+    def _load_state(self) -> dict:
+        try:
+            with open(os.path.join(self.root, "state.json"), encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save_state(self):
+        tmp = os.path.join(self.root, "state.json.tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self._state, f)
+        os.replace(tmp, os.path.join(self.root, "state.json"))
+
+
+def _fetch_since(client, table: str, start_iso: str) -> list:
+    rows, offset = [], 0
+    while True:
+        query = client.table(table).select("*").gte("day", start_iso)
+        for col in TABLES[table]:
+            query = query.order(col)
+        page = query.range(offset, offset + PAGE_SIZE - 1).execute().data or []
+        rows.extend(page)
+        if len(page) < PAGE_SIZE:
+            return rows
+        offset += PAGE_SIZE
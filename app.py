@@ -1,14 +1,15 @@
-import os
-import json
+import html
 import streamlit as st
-from supabase import create_client
-from datetime import datetime, timezone, date
-
-# ========= Brand + Assets =========
-LOGO_PATH = r"D:\chat-viewer\flabeelogo.jpg"
-if not os.path.exists(LOGO_PATH):
-    LOGO_PATH = "flabeelogo.jpg"
-
+import repository as repo
+import assets
+import export
+import transcript
+import live
+import metrics
+import timeline
+from datetime import datetime, timezone
+
+# ========= Brand =========
 PALETTE = {
     "FUCHSIA": "#FF3C69",   # Flabee pink (primary)
     "BABY":    "#FFC2C8",
@@ -20,7 +21,8 @@ PALETTE = {
 
 # ========= App config =========
 st.set_page_config(page_title="Flabee Chat Viewer", layout="wide")
-sb = create_client(st.secrets["SUPABASE_URL"], st.secrets["SUPABASE_SERVICE_KEY"])
+perf_run = repo.metrics_recorder().begin_run("viewer", metrics.debug_enabled())
+repo.use_replica()   # browse from the local replica when REPLICA_PATH is set
 
 # ========= Global styles (glassmorphism) =========
 GLASS_CSS = f"""
@@ -71,131 +73,156 @@ h1, h2, h3 {{ color: var(--navy); }}
   box-shadow: var(--shadow);
 }}
 
-.chat-row{{display:flex; margin:10px 0;}}
-.chat-left{{justify-content:flex-start;}}
-.chat-right{{justify-content:flex-end;}}
-
-.bubble{{
-  max-width: 74%;
-  padding: 12px 14px;
-  border-radius: 16px;
-  line-height: 1.45;
-  word-wrap: break-word;
-  white-space: pre-wrap;
-  box-shadow: var(--shadow);
-  border: 1px solid var(--glass-border);
-  backdrop-filter: blur(8px);
-}}
-
-.user {{ background: rgba(255,255,255,0.55); }}
-.assistant {{
-  background: rgba(255, 60, 105, 0.18);
-  border-color: rgba(255, 60, 105, 0.35);
-}}
-
-.meta{{ font-size:12px; color: rgba(0,0,0,.45); margin-top:6px; }}
 .small-cap{{ font-variant-caps: all-small-caps; letter-spacing: .6px; color: rgba(0,0,0,.45); }}
 </style>
 """
 st.markdown(GLASS_CSS, unsafe_allow_html=True)
 
 # ========= Helpers =========
-def fmt_time(ts: str) -> str:
-    try:
-        dt = datetime.fromisoformat(ts.replace("Z", "+00:00"))
-        return dt.astimezone(timezone.utc).strftime("%Y-%m-%d %H:%M UTC")
-    except Exception:
-        return ts
-
-def bubble(role: str, content: str, ts: str):
-    side_class = "chat-left" if (role or "").lower() == "user" else "chat-right"
-    role_class = "user" if (role or "").lower() == "user" else "assistant"
-    st.markdown(
-        f"""
-        <div class="chat-row {side_class}">
-          <div>
-            <div class="bubble {role_class}">{content}</div>
-            <div class="meta">{fmt_time(ts)}</div>
-          </div>
-        </div>
-        """,
-        unsafe_allow_html=True
-    )
+def next_page(key: str, cursor):
+    st.session_state[key].append(cursor)
+
+def prev_page(key: str):
+    if len(st.session_state[key]) > 1:
+        st.session_state[key].pop()
+
+MSG_PAGE = 50
+
+def set_view(at=None, before: int = 0, after: int = 0, message_id=None, after_anchor: bool = False):
+    # message window: None = newest page, else `before`/`after` messages around `at`,
+    # or around the (at, message_id) keyset of a message (after_anchor: strictly after it)
+    st.session_state.view = None if at is None else {
+        "at": at, "id": message_id, "before": before, "after": after, "after_anchor": after_anchor}
+
+def edge_view(m: dict, **window):
+    # window paged from the message at an edge of the current one; its keyset keeps ties
+    return set_view(m["created_at"], message_id=m["id"], **window)
+
+def jump_to_date():
+    day = st.session_state.get("jump_date")
+    if day:
+        at = datetime.combine(day, datetime.min.time(), tzinfo=timezone.utc).isoformat()
+        set_view(at, before=MSG_PAGE // 2, after=MSG_PAGE // 2)
+
+def open_hit(hit: dict):
+    # jump to a search hit: its thread, windowed around the matching message
+    st.session_state.jump = {"conversation_id": hit["conversation_id"], "message_id": hit["message_id"]}
+    set_view(hit["created_at"], before=MSG_PAGE // 2, after=MSG_PAGE // 2, message_id=hit["message_id"])
+    st.session_state.last_conv_id = hit["conversation_id"]
+    st.session_state.msg_query = ""
 
-def to_jsonl(rows):
-    return "\n".join(json.dumps(r, ensure_ascii=False) for r in rows)
+def close_jump():
+    st.session_state.pop("jump", None)
 
-# ========= Sidebar: logo + conversations =========
+def latest_page(key: str):
+    del st.session_state[key][1:]
+
+# ========= Sidebar: logo + message search =========
 with st.sidebar:
-    try:
-        st.image(LOGO_PATH, width=140)
-    except Exception:
+    logo = assets.logo()
+    if logo:
+        st.image(logo, width=assets.LOGO_WIDTH)
+    else:
         st.write(" ")
 
+    msg_query = st.text_input("Search messages", key="msg_query", placeholder='words, "a phrase", -exclude')
+
+# ========= Message search results (replace the thread view) =========
+if msg_query:
+    if st.session_state.get("search_query") != msg_query:
+        st.session_state.search_query = msg_query
+        st.session_state.search_cursors = [None]
+    hits, next_hits = repo.search_messages(msg_query, 20, after=st.session_state.search_cursors[-1])
+
+    st.subheader(f"Messages matching “{msg_query}”")
+    if not hits:
+        st.info("No messages match.")
+    for h in hits:
+        col_hit, col_open = st.columns([8, 1])
+        with col_hit:
+            st.markdown(
+                f"""
+                <div class="header-card">
+                  <div class="small-cap">{html.escape(h.get("user_label") or "Chat")} · {html.escape(h.get("title") or "—")} · {h["role"]} · {transcript.fmt_time(h["created_at"])}</div>
+                  <div style="margin-top:4px;">{transcript.snippet_html(h["snippet"])}</div>
+                </div>
+                """,
+                unsafe_allow_html=True
+            )
+        with col_open:
+            st.button("Open", key=f"hit_{h['message_id']}", on_click=open_hit, args=(h,))
+
+    p1, p2 = st.columns(2)
+    with p1:
+        st.button("⟨ Better matches", use_container_width=True, on_click=prev_page, args=("search_cursors",),
+                  disabled=len(st.session_state.search_cursors) <= 1)
+    with p2:
+        st.button("More results ⟩", use_container_width=True, on_click=next_page, args=("search_cursors", next_hits),
+                  disabled=next_hits is None)
+    metrics.render_panel(repo.metrics_recorder(), perf_run)
+    st.stop()
+
+# ========= Sidebar: conversations =========
+with st.sidebar:
     st.title("Conversations")
 
-    # paging state
-    if "conv_page" not in st.session_state:
-        st.session_state.conv_page = 1
+    # keyset paging state: stack of page-start cursors, current page on top
+    if "conv_cursors" not in st.session_state:
+        st.session_state.conv_cursors = [None]
 
     # search
     search = st.text_input("Search (user / last msg)", value="")
 
-    # simple date filters (set defaults to avoid None issues)
+    # optional date filters; empty by default, so conversations without
+    # messages (no last_message_at) stay listed
     col_from, col_to = st.columns(2)
     with col_from:
-        start_date = st.date_input("From", value=date(2000, 1, 1))
+        start_date = st.date_input("From", value=None)
     with col_to:
-        end_date = st.date_input("To", value=date.today())
+        end_date = st.date_input("To", value=None)
 
-    # paging buttons
+    # paging buttons (filled in once the page is fetched)
     c1, c2 = st.columns(2)
-    with c1:
-        if st.button("⟨ Prev", use_container_width=True, disabled=st.session_state.conv_page <= 1):
-            st.session_state.conv_page = max(1, st.session_state.conv_page - 1)
-    with c2:
-        if st.button("Next ⟩", use_container_width=True):
-            st.session_state.conv_page += 1
+
+    channel = st.selectbox("Channel", options=["(all)"] + repo.list_channels(), index=0)
+
+    # back to the first page whenever the filters change
+    filters = (search, start_date, end_date, channel)
+    if st.session_state.get("conv_filters") != filters:
+        st.session_state.conv_filters = filters
+        st.session_state.conv_cursors = [None]
 
     limit = 30
-    offset = (st.session_state.conv_page - 1) * limit
-
-    # fetch page
-    convs_raw = sb.rpc(
-        "list_conversations",
-        {"p_search": search or None, "p_limit": limit, "p_offset": offset},
-    ).execute().data or []
-
-    # channel options from page
-    page_channels = sorted({(c.get("last_channel") or "unknown") for c in convs_raw})
-    channel = st.selectbox("Channel", options=["(all)"] + page_channels, index=0)
-
-    # date + channel filter (client-side)
-    def in_date_range(iso_ts: str) -> bool:
-        if not iso_ts:
-            return True
-        try:
-            dt = datetime.fromisoformat(iso_ts.replace("Z", "+00:00")).date()
-        except Exception:
-            return True
-        return (dt >= start_date) and (dt <= end_date)
-
-    convs = []
-    for c in convs_raw:
-        ch_ok = (channel == "(all)") or ((c.get("last_channel") or "unknown") == channel)
-        dt_ok = in_date_range(c.get("last_message_at"))
-        if ch_ok and dt_ok:
-            convs.append(c)
+
+    # fetch page (search, channel and dates are filtered server-side)
+    list_filters = dict(channel=None if channel == "(all)" else channel, date_from=start_date, date_to=end_date)
+    convs, next_cursor = repo.list_conversations(
+        search, limit, after=st.session_state.conv_cursors[-1], **list_filters,
+    )
+
+    with c1:
+        st.button("⟨ Prev", use_container_width=True, on_click=prev_page, args=("conv_cursors",),
+                  disabled=len(st.session_state.conv_cursors) <= 1)
+    with c2:
+        st.button("Next ⟩", use_container_width=True, on_click=next_page, args=("conv_cursors", next_cursor),
+                  disabled=next_cursor is None)
 
     if not convs:
-        st.info("No conversations match the filters on this page.")
+        st.info("No conversations match the filters.")
+        metrics.render_panel(repo.metrics_recorder(), perf_run)
         st.stop()
 
-    # list UI
-    labels = [
-        f"{c['user_label'] or 'Chat'} · {c['last_message_at'][:19]} · {c['msg_count']} msgs · {c.get('last_channel') or 'unknown'}"
-        for c in convs
-    ]
+    # list UI (derived stats for the whole page come from one call, no messages loaded)
+    page_stats = repo.conversation_stats(c["conversation_id"] for c in convs)
+
+    def conv_label(c):
+        label = f"{c['user_label'] or 'Chat'} · {(c['last_message_at'] or 'no messages')[:19]} · {c['msg_count']} msgs · {c.get('last_channel') or 'unknown'}"
+        stats = page_stats.get(c["conversation_id"])
+        if stats and stats["first_response_ms"] is not None:
+            label += f" · ⏱ {transcript.fmt_duration(stats['first_response_ms'])}"
+        return label
+
+    labels = [conv_label(c) for c in convs]
     if "conv_idx" not in st.session_state:
         st.session_state.conv_idx = 0
     st.session_state.conv_idx = st.radio(
@@ -203,78 +230,206 @@ with st.sidebar:
         range(len(convs)),
         index=min(st.session_state.conv_idx, len(convs)-1),
         format_func=lambda i: labels[i],
+        on_change=close_jump,
+    )
+
+    # merged timeline: threads picked here (kept across list pages) read as one stream
+    page_ids = [c["conversation_id"] for c in convs]
+    picked = st.session_state.get("timeline_pick", [])
+    known = {**st.session_state.get("timeline_rows", {}), **dict(zip(page_ids, convs))}
+    st.session_state.timeline_rows = {i: known[i] for i in page_ids + picked}
+    st.multiselect(
+        "Merged timeline",
+        options=page_ids + [i for i in picked if i not in page_ids],
+        format_func=lambda i: conv_label(st.session_state.timeline_rows[i]),
+        key="timeline_pick",
+        placeholder="Pick two or more threads",
+        on_change=close_jump,
     )
 
-# selected conversation
-selected = convs[st.session_state.conv_idx]
+# ========= Merged timeline =========
+picked = st.session_state.timeline_pick
+if len(picked) >= 2 and not st.session_state.get("jump"):
+    # one window of every picked thread merged by time; older windows are read only when asked for
+    if st.session_state.get("timeline_ids") != picked:
+        st.session_state.timeline_ids = list(picked)
+        st.session_state.timeline_cursors = [timeline.first_cursors(picked)]
+    threads = [st.session_state.timeline_rows[i] for i in picked]
+    sources = {c["conversation_id"]: f"{c['user_label'] or 'Chat'} · {c.get('last_channel') or 'unknown'}" for c in threads}
+    msgs, older = timeline.load_window(repo.list_messages_pages, st.session_state.timeline_cursors[-1], size=MSG_PAGE)
+
+    st.markdown(
+        f"""
+        <div class="header-card">
+          <div class="small-cap">Merged timeline · {len(threads)} threads</div>
+          <div style="margin-top:4px; color:rgba(0,0,0,.55);">
+            {html.escape(" · ".join(sorted(set(sources.values()))))} · {sum(c["msg_count"] for c in threads)} msgs
+          </div>
+        </div>
+        """,
+        unsafe_allow_html=True
+    )
+    if msgs:
+        transcript.render_transcript(msgs, PALETTE, sources=sources)
+    else:
+        st.info("No messages in these conversations yet.")
+
+    t1, t2, t3, _ = st.columns([1, 1, 1, 2])
+    with t1:
+        st.button("⟨ Load earlier", use_container_width=True, disabled=older is None,
+                  on_click=next_page, args=("timeline_cursors", older))
+    with t2:
+        st.button("Load newer ⟩", use_container_width=True, on_click=prev_page, args=("timeline_cursors",),
+                  disabled=len(st.session_state.timeline_cursors) <= 1)
+    with t3:
+        st.button("Latest ⟫", use_container_width=True, on_click=latest_page, args=("timeline_cursors",),
+                  disabled=len(st.session_state.timeline_cursors) <= 1)
+
+    metrics.render_panel(repo.metrics_recorder(), perf_run)
+    st.stop()
+
+# selected conversation (a search hit overrides the list selection)
+jump = st.session_state.get("jump")
+selected = (jump and repo.get_conversation(jump["conversation_id"])) or convs[st.session_state.conv_idx]
 conv_id = selected["conversation_id"]  # <-- correct field name from your view
 
-# ======== Reset message cursor when thread changes ========
+# ======== Reset message window when thread changes ========
 if st.session_state.get("last_conv_id") != conv_id:
-    st.session_state["cursor_before"] = None
+    st.session_state["view"] = None
     st.session_state["last_conv_id"] = conv_id
 
 # ========= Header (glass card) =========
+sel_stats = page_stats.get(conv_id) or repo.conversation_stats([conv_id]).get(conv_id)
+fresh = repo.replica_freshness()
+if fresh is None:
+    source = "live"
+elif fresh["age_s"] is None:
+    source = "local replica · not synced yet"
+else:
+    source = f"local replica · synced {transcript.fmt_duration(fresh['age_s'] * 1000)} ago"
+if fresh and fresh["error"]:
+    source += " · sync failing"
+stats_html = (
+    f'<div style="margin-top:4px; color:rgba(0,0,0,.55); font-size:13px;">{html.escape(transcript.stats_line(sel_stats))}</div>'
+    if sel_stats else ""
+)
 st.markdown(
     f"""
     <div class="header-card">
-      <div class="small-cap">Chat</div>
+      <div class="small-cap" title="{html.escape((fresh or {}).get("error") or "")}">Chat · {source}</div>
       <div style="font-size:22px; font-weight:700; color:var(--navy); margin-top:2px;">
         {selected.get("user_label") or "Conversation"}
       </div>
       <div style="margin-top:4px; color:rgba(0,0,0,.55);">
-        {selected.get('title') or '—'} · updated {selected['last_message_at']} · {selected['msg_count']} msgs
+        {selected.get('title') or '—'} · updated {selected['last_message_at'] or '—'} · {selected['msg_count']} msgs
       </div>
+      {stats_html}
     </div>
     """,
     unsafe_allow_html=True
 )
 
-# --- Export JSONL of entire thread ---
-actions = st.columns([1, 1, 6])
+# --- Export entire thread (JSONL or Parquet) ---
+EXPORT_CHOICES = {
+    "JSONL": ("jsonl", None),
+    "JSONL · gzip": ("jsonl", "gzip"),
+    "JSONL · zstd": ("jsonl", "zstd"),
+    "Parquet": ("parquet", None),
+}
+actions = st.columns([1, 1, 1, 5])
 with actions[0]:
-    if st.button("Export JSONL"):
-        all_rows, cursor = [], None
-        while True:
-            page = sb.rpc(
-                "list_messages",
-                {"p_conversation_id": conv_id, "p_before": cursor, "p_limit": 200},
-            ).execute().data or []
-            if not page:
-                break
-            all_rows.extend(page)
-            cursor = page[-1]["created_at"]  # newest-first page
-            if len(page) < 200:
-                break
-
-        all_rows = list(reversed(all_rows))  # oldest-first for export
+    if st.button("Export"):
+        # builds the file page by page, oldest first, without a list of rows;
+        # download_button takes bytes, so the finished file is read into memory here
+        fmt, compression = EXPORT_CHOICES[st.session_state.get("export_format") or "JSONL"]
+        if fmt == "parquet":
+            data = export.export_thread_parquet(repo.list_messages_after, conv_id)
+        else:
+            data = export.export_thread(repo.list_messages_after, conv_id, compression=compression)
+        file_name = export.export_filename(conv_id, compression, fmt)
         st.download_button(
-            label="Download conversation.jsonl",
-            mime="text/plain",
-            data=to_jsonl(all_rows),
-            file_name=f"conversation-{conv_id}.jsonl",
+            label=f"Download {file_name}",
+            mime=export.export_mime(compression, fmt),
+            data=data.read(),
+            file_name=file_name,
             use_container_width=True,
         )
+with actions[1]:
+    st.selectbox(
+        "Format",
+        options=list(EXPORT_CHOICES),
+        key="export_format",
+        label_visibility="collapsed",
+    )
+with actions[2]:
+    st.toggle("Live", key="live_updates", help="Show new and edited messages as they arrive")
+with actions[3]:
+    if jump:
+        st.button("✕ Back to list", on_click=close_jump)
 
 # ========= Fetch + render messages =========
-res = sb.rpc(
-    "list_messages",
-    {"p_conversation_id": conv_id, "p_before": st.session_state.get("cursor_before"), "p_limit": 50},
-).execute().data
-
-msgs = list(reversed(res))  # oldest -> newest
-for m in msgs:
-    bubble(m.get("role", "assistant"), m.get("content", ""), m.get("created_at", ""))
-    meta = m.get("meta")
-    if meta:
-        with st.expander("Details"):
-            st.json(meta)
+view = st.session_state.get("view")
+if view is None:
+    msgs = list(reversed(repo.list_messages(conv_id, before=None, limit=MSG_PAGE)))  # oldest -> newest
+else:
+    # one round trip for any window: earlier, newer, a date, or a search hit
+    msgs = repo.list_messages_window(conv_id, at=view["at"], message_id=view["id"], n_before=view["before"],
+                                     n_after=view["after"], after_anchor=view["after_anchor"])
+
+if msgs:
+    # single batched, viewport-virtualized component instead of one element per bubble
+    transcript.render_transcript(msgs, PALETTE, highlight_id=jump and jump["message_id"])
+
+# ========= Live updates =========
+if st.session_state.get("live_updates"):
+    feed = repo.message_feed()
+    if feed.error is not None:
+        st.caption(f"Live updates unavailable: {feed.error}")
+    seen = feed.version(conv_id)
+
+    @st.fragment(run_every=live.WATCH_INTERVAL)
+    def watch_feed():
+        # in-memory check; the full rerun reads the already-patched page cache
+        if feed.version(conv_id) != seen:
+            st.rerun()
+
+    watch_feed()
 
 # ========= Paging =========
-if res:
-    oldest_ts = res[-1]["created_at"]
-    if st.button("Load earlier"):
-        st.session_state["cursor_before"] = oldest_ts
-        st.rerun()
-else:
-    st.info("No messages in this conversation yet.")
+if not msgs:
+    st.info("No messages in this conversation yet." if view is None else "No messages in this window.")
+
+p1, p2, p3, p4, p5 = st.columns([1, 1, 1, 1.4, 0.6])
+with p1:
+    st.button("⟨ Load earlier", use_container_width=True, disabled=not msgs,
+              on_click=edge_view, args=(msgs[0] if msgs else None,), kwargs={"before": MSG_PAGE})
+with p2:
+    st.button("Load newer ⟩", use_container_width=True, disabled=view is None or not msgs,
+              on_click=edge_view, args=(msgs[-1] if msgs else None,), kwargs={"after": MSG_PAGE, "after_anchor": True})
+with p3:
+    st.button("Latest ⟫", use_container_width=True, disabled=view is None, on_click=set_view)
+with p4:
+    st.date_input("Jump to date", value=None, key="jump_date", label_visibility="collapsed")
+with p5:
+    st.button("Go", use_container_width=True, on_click=jump_to_date)
+
+# ========= Read ahead =========
+# while this thread is read: the threads above and below it, and the adjacent list pages
+idx = st.session_state.conv_idx
+cursors = st.session_state.conv_cursors
+repo.prefetch(
+    search, limit,
+    cursors=([next_cursor] if next_cursor is not None else []) + cursors[-2:-1],
+    conv_ids=[convs[i]["conversation_id"] for i in (idx + 1, idx - 1) if 0 <= i < len(convs)],
+    message_limit=MSG_PAGE,
+    **list_filters,
+)
+
+# ========= Debug: per-rerun performance (?debug=1) =========
+if metrics.debug_enabled():
+    pf = repo.prefetch_stats()
+    st.sidebar.caption(
+        f"Prefetch: {pf['prefetch_hits']} of {pf['prefetched']} pages used • hit rate {pf['hit_rate']:.0%} • "
+        f"{pf['cancelled']} jobs cancelled • {pf['ahead_bytes'] / 1e6:.1f} MB waiting"
+    )
+metrics.render_panel(repo.metrics_recorder(), perf_run)
@@ -0,0 +1,329 @@
+"""Headless archive export of every conversation, or only what changed since the last run.
+
+    python archive.py --out archive/ [--format jsonl|parquet] [--partition day|channel]
+                      [--incremental] [--workers 8] [--compression gzip|zstd]
+
+Uses the same repository functions as the apps (credentials come from
+.streamlit/secrets.toml, as for `streamlit run`). Conversations are exported
+in batches on a thread pool. Each batch streams its threads page by page
+into .tmp files, <out>/<partition>=<value>/part-<batch>-<n>.<ext>: one per
+partition, or more when a partition's file was closed to keep at most
+MAX_OPEN_FILES open. Once every file of the batch is written, the batch and
+its files are logged to the checkpoint, the files are renamed into place and
+the batch is logged as done. After a failure, running the same command again
+first finishes the renames of a logged batch, then resumes with the batches
+that are not logged yet; a batch is never written twice.
+
+A finished run records its start time. --incremental then exports only the
+messages created after it, of the conversations that have new messages since.
+Edits to older messages are not picked up incrementally.
+"""
+import argparse
+import json
+import os
+import sys
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timezone
+
+import export
+import repository as repo
+
+# ---------------- Settings ----------------
+LIST_PAGE_SIZE = 500
+BATCH_SIZE = 200          # conversations per batch; one file per partition per batch
+WORKERS = 8
+ROW_GROUP_ROWS = 10_000   # parquet rows buffered per open file before a row group is written
+MAX_OPEN_FILES = 8        # open files (and row buffers) per batch; the least recently written is closed
+RETRIES = 2               # extra attempts per batch before the run stops
+CHECKPOINT_NAME = "_checkpoint.jsonl"
+
+
+# ---------------- Checkpoint ----------------
+class Checkpoint:
+    """Append-only run log.
+
+    {"run": {...}} starts a run, {"commit": {"ids": [...], "files": [...]}}
+    precedes the renames of a batch's files, {"done": [ids]} follows them,
+    and {"complete": started_at} ends the run (the file is then compacted to
+    that one line). Lines are fsynced; a torn last line is ignored.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.watermark = None     # start time of the last complete run
+        self.run = None           # the unfinished run, if any
+        self.done = set()
+        self.committed = {}       # tuple(ids) -> files of batches committed but not done
+        self._read()
+
+    def start(self, **run):
+        self.run = {"started_at": datetime.now(timezone.utc).isoformat(), **run}
+        self.done, self.committed = set(), {}
+        self._append({"run": self.run})
+
+    def commit(self, ids: list, files: list):
+        self.committed[tuple(ids)] = files
+        self._append({"commit": {"ids": ids, "files": files}})
+
+    def mark_done(self, ids: list):
+        self.done.update(ids)
+        self.committed.pop(tuple(ids), None)
+        self._append({"done": ids})
+
+    def complete(self):
+        self.watermark = self.run["started_at"]
+        self.run, self.done, self.committed = None, set(), {}
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(json.dumps({"complete": self.watermark}) + "\n")
+        os.replace(tmp, self.path)
+
+    def _read(self):
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                text = f.read()
+        except FileNotFoundError:
+            return
+        for line in text.splitlines():
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue
+            if "complete" in entry:
+                self.watermark, self.run, self.done, self.committed = entry["complete"], None, set(), {}
+            elif "run" in entry:
+                self.run, self.done, self.committed = entry["run"], set(), {}
+            elif "commit" in entry:
+                self.committed[tuple(entry["commit"]["ids"])] = entry["commit"]["files"]
+            elif "done" in entry:
+                self.done.update(entry["done"])
+                self.committed.pop(tuple(entry["done"]), None)
+        if text and not text.endswith("\n"):
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write("\n")   # keep the next entry off the torn line
+
+    def _append(self, entry: dict):
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(entry) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+
+# ---------------- Output files ----------------
+# sinks write <path>.tmp; close() finishes and fsyncs it, run() renames it into place
+def _fsync(path: str):
+    with open(path, "rb") as f:
+        os.fsync(f.fileno())
+
+
+def _remove(path: str):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+class _JsonlSink:
+    def __init__(self, path: str, compression):
+        self.path, self.tmp = path, path + ".tmp"
+        self._file = open(self.tmp, "wb")
+        self._writer = export.open_writer(self._file, compression)
+
+    def write(self, row: dict):
+        self._writer.write(json.dumps(row, ensure_ascii=False).encode("utf-8") + b"\n")
+
+    def close(self):
+        if self._writer is not self._file:
+            self._writer.close()
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._file.close()
+
+    def discard(self):
+        self._file.close()
+        _remove(self.tmp)
+
+
+class _ParquetSink:
+    def __init__(self, path: str, compression):
+        self.path, self.tmp = path, path + ".tmp"
+        self._compression = compression or export.PARQUET_COMPRESSION
+        self._rows = []
+        self._writer = None
+
+    def write(self, row: dict):
+        self._rows.append(row)
+        if len(self._rows) >= ROW_GROUP_ROWS:
+            self._flush()
+
+    def _flush(self):
+        import pyarrow.parquet as pq
+
+        table = export.messages_table(self._rows)
+        if self._writer is None:
+            self._writer = pq.ParquetWriter(self.tmp, table.schema, compression=self._compression)
+        self._writer.write_table(table)
+        self._rows = []
+
+    def close(self):
+        if self._rows or self._writer is None:
+            self._flush()
+        self._writer.close()
+        _fsync(self.tmp)
+
+    def discard(self):
+        self._rows = []
+        if self._writer is not None:
+            self._writer.close()
+        _remove(self.tmp)
+
+
+FORMATS = {"jsonl": _JsonlSink, "parquet": _ParquetSink}
+
+
+def _extension(fmt: str, compression) -> str:
+    return export.COMPRESSIONS[compression][0] if fmt == "jsonl" else "parquet"
+
+
+def _partition_value(partition: str, conv: dict, msg: dict) -> str:
+    if partition == "day":
+        return msg["created_at"][:10]
+    return conv.get("last_channel") or "unknown"
+
+
+# ---------------- Export ----------------
+def list_all(since=None):
+    """Every conversation (with messages since `since`, an ISO timestamp), newest first."""
+    date_from = datetime.fromisoformat(since) if since else None
+    cursor = None
+    while True:
+        rows, cursor = repo.list_conversations("", LIST_PAGE_SIZE, after=cursor, date_from=date_from)
+        yield from rows
+        if cursor is None:
+            return
+
+
+def export_batch(convs: list, out: str, fmt: str, partition: str, compression=None, since=None) -> tuple:
+    """Export one batch of conversations into .tmp files.
+
+    Returns (their ids, the files written, relative to `out`) once every
+    file is complete; nothing is renamed into place here (see run()).
+    """
+    batch = uuid.uuid4().hex[:12]
+    ext = _extension(fmt, compression)
+    sinks = []
+    open_sinks = OrderedDict()    # partition value -> sink, least recently written first
+    try:
+        for conv in convs:
+            for msg in export.iter_thread(repo.list_messages_after, conv["conversation_id"], after=since):
+                value = _partition_value(partition, conv, msg)
+                sink = open_sinks.get(value)
+                if sink is None:
+                    if len(open_sinks) >= MAX_OPEN_FILES:
+                        open_sinks.popitem(last=False)[1].close()
+                    folder = os.path.join(out, f"{partition}={value}")
+                    os.makedirs(folder, exist_ok=True)
+                    path = os.path.join(folder, f"part-{batch}-{len(sinks)}.{ext}")
+                    sink = open_sinks[value] = FORMATS[fmt](path, compression)
+                    sinks.append(sink)
+                else:
+                    open_sinks.move_to_end(value)
+                sink.write(msg)
+        for sink in open_sinks.values():
+            sink.close()
+    except BaseException:
+        for sink in sinks:
+            sink.discard()
+        raise
+    return [c["conversation_id"] for c in convs], [os.path.relpath(s.path, out) for s in sinks]
+
+
+def _export_with_retries(*args) -> list:
+    for attempt in range(RETRIES + 1):
+        try:
+            return export_batch(*args)
+        except Exception as e:
+            if attempt == RETRIES:
+                raise
+            print(f"batch failed ({e}); retrying", file=sys.stderr)
+
+
+def _rename_into_place(out: str, files: list):
+    # a file whose .tmp is gone was renamed before the run stopped
+    for name in files:
+        path = os.path.join(out, name)
+        if os.path.exists(path + ".tmp"):
+            os.replace(path + ".tmp", path)
+
+
+def _remove_tmp_files(out: str):
+    # leftovers of a run that was killed mid-batch
+    for folder, _, files in os.walk(out):
+        for name in files:
+            if name.endswith(".tmp"):
+                os.remove(os.path.join(folder, name))
+
+
+def run(out: str, fmt: str = "jsonl", partition: str = "day", compression=None,
+        incremental: bool = False, workers: int = WORKERS, checkpoint: str = None) -> int:
+    """Export (or resume exporting) the archive into `out`; returns the conversations written."""
+    os.makedirs(out, exist_ok=True)
+    ckpt = Checkpoint(checkpoint or os.path.join(out, CHECKPOINT_NAME))
+    settings = {"format": fmt, "partition": partition, "compression": compression}
+    if ckpt.run is None:
+        ckpt.start(since=ckpt.watermark if incremental else None, **settings)
+    else:
+        previous = {k: ckpt.run.get(k) for k in settings}
+        if previous != settings:
+            raise SystemExit(f"An unfinished run with {previous} is in the checkpoint; "
+                             "resume it with the same options or delete the checkpoint.")
+        print(f"Resuming run started {ckpt.run['started_at']} ({len(ckpt.done)} conversations done)",
+              file=sys.stderr)
+    since = ckpt.run["since"]
+    for ids, files in list(ckpt.committed.items()):
+        _rename_into_place(out, files)
+        ckpt.mark_done(list(ids))
+    _remove_tmp_files(out)
+
+    convs = [c for c in list_all(since) if c["conversation_id"] not in ckpt.done]
+    batches = [convs[i:i + BATCH_SIZE] for i in range(0, len(convs), BATCH_SIZE)]
+    written = 0
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="archive") as pool:
+        futures = [pool.submit(_export_with_retries, b, out, fmt, partition, compression, since)
+                   for b in batches]
+        try:
+            for f in as_completed(futures):
+                ids, files = f.result()
+                ckpt.commit(ids, files)
+                _rename_into_place(out, files)
+                ckpt.mark_done(ids)
+                written += len(ids)
+                print(f"{written} / {len(convs)} conversations", file=sys.stderr)
+        except BaseException:
+            for f in futures:
+                f.cancel()
+            raise
+    ckpt.complete()
+    return written
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Export conversations to a partitioned archive.")
+    ap.add_argument("--out", required=True, help="archive directory")
+    ap.add_argument("--format", choices=list(FORMATS), default="jsonl")
+    ap.add_argument("--partition", choices=["day", "channel"], default="day")
+    ap.add_argument("--compression", choices=["gzip", "zstd"], default=None)
+    ap.add_argument("--incremental", action="store_true", help="only messages since the last complete run")
+    ap.add_argument("--workers", type=int, default=WORKERS)
+    ap.add_argument("--checkpoint", help=f"checkpoint file (default <out>/{CHECKPOINT_NAME})")
+    args = ap.parse_args(argv)
+
+    n = run(args.out, args.format, args.partition, args.compression,
+            args.incremental, args.workers, args.checkpoint)
+    print(f"Exported {n} conversations to {args.out}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,30 @@
+import io
+import os
+
+import streamlit as st
+
+# ---------------- Settings ----------------
+LOGO_PATH = os.environ.get("FLABEE_LOGO_PATH") or os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                                               "flabeelogo.jpg")
+LOGO_WIDTH = 140
+LOGO_SCALE = 2            # pixels per displayed pixel, so the logo stays sharp on hi-dpi screens
+
+
+@st.cache_resource
+def logo(width: int = LOGO_WIDTH):
+    """The logo resized for `width` display pixels, as JPEG bytes; None if it can't be read.
+
+    Loaded once per server process: reruns reuse the same bytes instead of
+    re-reading (and re-sending) the full-size 1478px original.
+    """
+    from PIL import Image   # Pillow ships with streamlit; only needed the first time
+
+    try:
+        with Image.open(LOGO_PATH) as img:
+            img = img.convert("RGB")
+            img.thumbnail((width * LOGO_SCALE, width * LOGO_SCALE))
+            buf = io.BytesIO()
+            img.save(buf, format="JPEG", quality=85, optimize=True)
+    except OSError:
+        return None
+    return buf.getvalue()
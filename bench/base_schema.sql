@@ -0,0 +1,65 @@
+-- Minimal stand-in for the hosted Supabase schema, used only by the benchmarks.
+-- It holds the tables and the original list_messages RPC that the migrations
+-- in supabase/migrations build on.
+create extension if not exists pgcrypto;
+
+create table if not exists public.conversations (
+  id uuid primary key default gen_random_uuid(),
+  user_label text,
+  title text,
+  status text default 'open',
+  tags text[] default '{}',
+  last_channel text,
+  last_message text,
+  last_message_at timestamptz,
+  msg_count bigint default 0
+);
+
+create table if not exists public.messages (
+  id uuid primary key default gen_random_uuid(),
+  conversation_id uuid not null references public.conversations (id) on delete cascade,
+  role text not null,
+  content text,
+  meta jsonb,
+  created_at timestamptz not null default now()
+);
+
+create or replace function public.list_messages(
+  p_conversation_id uuid,
+  p_before timestamptz default null,
+  p_limit int default 50
+)
+returns setof public.messages
+language sql
+stable
+as $$
+  select m.*
+  from public.messages m
+  where m.conversation_id = p_conversation_id
+    and (p_before is null or m.created_at < p_before)
+  order by m.created_at desc
+  limit greatest(p_limit, 1);
+$$;
+
+-- Stand-ins for the daily aggregate views mirrored by analytics_store.
+create or replace view public.daily_message_counts as
+  select (m.created_at at time zone 'utc')::date::text as day,
+         count(*) as total,
+         count(*) filter (where m.role = 'user') as user_msgs,
+         count(*) filter (where m.role = 'assistant') as assistant_msgs
+  from public.messages m
+  group by 1;
+
+create or replace view public.channel_message_counts as
+  select (m.created_at at time zone 'utc')::date::text as day,
+         coalesce(c.last_channel, 'unknown') as channel,
+         count(*) as cnt
+  from public.messages m
+  join public.conversations c on c.id = m.conversation_id
+  group by 1, 2;
+
+create or replace view public.daily_active_conversations as
+  select (m.created_at at time zone 'utc')::date::text as day,
+         count(distinct m.conversation_id) as active_conversations
+  from public.messages m
+  group by 1;
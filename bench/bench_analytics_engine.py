@@ -0,0 +1,146 @@
+"""Analytics engine throughput and peak memory at up to 10M messages.
+
+    python bench/bench_analytics_engine.py [--messages 10000000] [--conversations 50000]
+                                           [--page-size 50000] [--budget-mb 256]
+
+Pages come from the synthetic dataset (datagen.py) in created_at order, built
+with numpy one day at a time, so the source never holds more than a day
+(plus a page) of messages. They have the same shape as analytics_message_page
+results. Peak memory is traced (tracemalloc) across generating and folding
+every page; the run fails if it exceeds --budget-mb. A small dataset is also
+checked against a row-by-row reference.
+"""
+import argparse
+import os
+import resource
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+sys.path.insert(0, HERE)
+
+import analytics_engine
+import datagen
+
+WINDOW_MS = 86_400_000    # messages generated per day of the dataset's timeline
+
+
+def pages(ds, since_ms: int, page_size: int):
+    """analytics_message_page-shaped pages of `ds`, oldest first, from since_ms on."""
+    first = np.array([dt.timestamp() * 1000 for dt in ds._first], dtype=np.int64)
+    gap = np.array(ds._gap, dtype=np.int64) * 1000
+    count = np.array([c["msg_count"] for c in ds.conversations], dtype=np.int64)
+    ids = np.array([c["conversation_id"] for c in ds.conversations], dtype=object)
+    end = int((first + gap * (count - 1)).max()) + 1
+    buf, buffered = [], 0
+    for t0 in range(since_ms, end, WINDOW_MS):
+        t1 = t0 + WINDOW_MS
+        # message j of conversation i is at first[i] + j * gap[i]: the j's inside [t0, t1)
+        lo = np.clip(-(-(t0 - first) // gap), 0, count)
+        hi = np.clip(-(-(t1 - first) // gap), 0, count)
+        n = hi - lo
+        total = int(n.sum())
+        if not total:
+            continue
+        conv = np.repeat(np.arange(len(n)), n)
+        j = np.arange(total) - np.repeat(np.cumsum(n) - n, n) + np.repeat(lo, n)
+        ts = first[conv] + gap[conv] * j
+        order = np.argsort(ts, kind="stable")
+        conv, j, ts = conv[order], j[order], ts[order]
+        buf.append((conv, j, ts))
+        buffered += total
+        if buffered >= page_size:
+            yield from _split(buf, ids, page_size)
+            buf, buffered = [], 0
+    if buf:
+        yield from _split(buf, ids, page_size)
+
+
+def _split(buf, ids, page_size):
+    conv, j, ts = (np.concatenate(parts) for parts in zip(*buf))
+    for lo in range(0, len(ts), page_size):
+        sl = slice(lo, lo + page_size)
+        yield {
+            "conversation_id": ids[conv[sl]],
+            "role": np.where(j[sl] % 2 == 0, "user", "assistant"),
+            "created_at": ts[sl],
+        }
+
+
+def reference(ds, since_ms: int):
+    """Row-by-row response gaps (seconds) of the same messages, for the correctness check."""
+    gaps = []
+    for i, c in enumerate(ds.conversations):
+        pending = None
+        for j in range(c["msg_count"]):
+            t = ds.created_at(i, j).timestamp() * 1000
+            if t < since_ms:
+                continue
+            if j % 2 == 0:
+                pending = pending if pending is not None else t
+            elif pending is not None:
+                gaps.append((t - pending) / 1000)
+                pending = None
+    return np.array(gaps)
+
+
+def check(page_size: int):
+    ds = datagen.Dataset(conversations=300, messages=20_000)
+    since = int((datagen.END.timestamp() - 45 * 86_400) * 1000)
+    acc = analytics_engine.MessageMetrics()
+    for page in pages(ds, since, page_size=min(page_size, 1_000)):
+        acc.add(page["conversation_id"], page["role"], page["created_at"])
+    ref = reference(ds, since)
+    got = acc.response_percentiles()
+    want = dict(zip(["p50", "p90", "p99"], np.percentile(ref, [50, 90, 99])))
+    ok = got["responses"] == len(ref) and all(abs(got[k] - want[k]) < 1e-3 for k in want)
+    print(f"check vs row-by-row reference: {'ok' if ok else 'MISMATCH'} "
+          f"({got['responses']} responses, p50 {got['p50']:.0f}s, p90 {got['p90']:.0f}s)")
+    return ok
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--messages", type=int, default=10_000_000)
+    ap.add_argument("--conversations", type=int, default=50_000)
+    ap.add_argument("--page-size", type=int, default=analytics_engine.PAGE_SIZE)
+    ap.add_argument("--budget-mb", type=float, default=256)
+    args = ap.parse_args()
+
+    if not check(args.page_size):
+        sys.exit(1)
+
+    ds = datagen.Dataset(conversations=args.conversations, messages=args.messages)
+    since = int(min(dt.timestamp() for dt in ds._first) * 1000)
+    print(f"{ds.total_messages:,} messages in {args.conversations:,} conversations, pages of {args.page_size:,}")
+
+    tracemalloc.start()
+    t0 = time.perf_counter()
+    acc = analytics_engine.MessageMetrics()
+    for page in pages(ds, since, args.page_size):
+        acc.add(page["conversation_id"], page["role"], page["created_at"])
+    t_fold = time.perf_counter() - t0
+    heat, times, pct = acc.heatmap(), acc.response_times(), acc.response_percentiles()
+    elapsed = time.perf_counter() - t0
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    peak_mb = peak / 1e6
+    busiest = heat.loc[heat["messages"].idxmax()]
+    print(f"folded {acc.messages:,} messages in {t_fold:.1f}s ({acc.messages / t_fold / 1e6:.2f}M msg/s), "
+          f"results in {elapsed - t_fold:.1f}s")
+    print(f"{pct['responses']:,} responses: p50 {pct['p50']:.0f}s p90 {pct['p90']:.0f}s p99 {pct['p99']:.0f}s; "
+          f"{len(times)} days, busiest hour {busiest.weekday} {busiest.hour:02d}:00 UTC")
+    print(f"peak traced memory {peak_mb:.0f} MB (budget {args.budget_mb:g} MB), "
+          f"process max RSS {resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024:.0f} MB")
+    if peak_mb > args.budget_mb:
+        print("OVER BUDGET")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,269 @@
+"""End-to-end latency and memory of the three apps, driven through Streamlit's AppTest.
+
+    python bench/bench_apps.py [--messages 100000] [--conversations 2000] [--rtt-ms 0]
+                               [--backend fake|postgres] [--repeat 10] [--only viewer] [--replica]
+                               [--think-ms 0]
+
+The apps run unmodified; repository.create_client is pointed at a local
+stand-in (see local_supabase.py): the in-process fake over a synthetic
+dataset (datagen.py), or the real RPCs on a scratch Postgres
+(--backend postgres, BENCH_PG_URL as in pg.py). --rtt-ms adds a fixed delay
+per request to approximate the hosted project. --replica syncs a local
+SQLite replica (replica.py) first and lets the viewer read from it.
+--think-ms pauses (untimed) before every step, like a user reading the page,
+which gives background read-ahead (prefetch.py) time to land.
+
+Every scenario step is timed --repeat times; the report has p50/p95 in ms,
+Supabase requests per step, and process RSS after the scenario.
+"""
+import argparse
+import os
+import resource
+import statistics
+import sys
+import tempfile
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+sys.path.insert(0, ROOT)
+sys.path.insert(0, HERE)
+
+import datagen
+from local_supabase import FakeSupabase, PostgresSupabase
+
+SECRETS = {
+    "SUPABASE_URL": "http://localhost:54321",
+    "SUPABASE_SERVICE_KEY": "bench",
+    "REALTIME_ENABLED": False,
+}
+TIMEOUT = 120
+
+
+# ---------------- Harness ----------------
+def make_client(args):
+    ds = datagen.Dataset(conversations=args.conversations, messages=args.messages)
+    if args.backend == "fake":
+        return FakeSupabase(ds, rtt_ms=args.rtt_ms)
+    import pg
+    conn = pg.fresh_database()
+    datagen.load_postgres(conn, ds)
+    return PostgresSupabase(conn, rtt_ms=args.rtt_ms)
+
+
+def install_replica(client) -> str:
+    import replica
+    path = os.path.join(tempfile.mkdtemp(prefix="flabee-replica-"), "replica.sqlite3")
+    replica.Replica(path).sync(client)
+    SECRETS["REPLICA_PATH"] = path
+    SECRETS["REPLICA_SYNC_SECONDS"] = 0   # synced once here; the scenarios measure reads only
+    return path
+
+
+def install(client):
+    # every app builds its client through repository.get_client -> create_client
+    import repository
+    repository.create_client = lambda url, key: client
+
+
+def clear_caches():
+    import streamlit as st
+    st.cache_data.clear()
+    st.cache_resource.clear()
+
+
+def app(script: str):
+    from streamlit.testing.v1 import AppTest
+    at = AppTest.from_file(os.path.join(ROOT, script), default_timeout=TIMEOUT)
+    for k, v in SECRETS.items():
+        at.secrets[k] = v
+    return at
+
+
+def check(at):
+    if at.exception:
+        raise RuntimeError(f"app raised: {at.exception[0].message}")
+    return at
+
+
+def button(at, label: str):
+    return next(b for b in at.button if b.label == label)
+
+
+def rss_mb() -> float:
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+# ---------------- Scenarios ----------------
+# each yields one timed step per iteration; setup happens outside the timing
+def viewer_cold_start(repeat):
+    for _ in range(repeat):
+        clear_caches()
+        at = app("app.py")
+        yield lambda: check(at.run())
+
+
+def viewer_warm_start(repeat):
+    check(app("app.py").run())
+    for _ in range(repeat):
+        at = app("app.py")
+        yield lambda: check(at.run())
+
+
+def viewer_sidebar_paging(repeat):
+    at = check(app("app.py").run())
+    for _ in range(repeat):
+        if button(at, "Next ⟩").disabled:
+            at = check(app("app.py").run())
+        yield lambda: check(button(at, "Next ⟩").click().run())
+
+
+def viewer_open_thread(repeat):
+    at = check(app("app.py").run())
+    for k in range(repeat):
+        radio = at.sidebar.radio[0]
+        idx = (k + 1) % len(radio.options)
+        yield lambda: check(radio.set_value(idx).run())
+
+
+def viewer_next_thread(repeat):
+    # walk down the thread list one at a time, the move read-ahead bets on
+    at = check(app("app.py").run())
+    for _ in range(repeat):
+        # the radio's id follows its index; an untimed rerun makes it current so the click lands
+        radio = check(at.run()).sidebar.radio[0]
+        yield lambda: check(radio.set_value((at.session_state.conv_idx + 1) % len(radio.options)).run())
+
+
+def viewer_export(repeat):
+    at = check(app("app.py").run())
+    for _ in range(repeat):
+        yield lambda: check(button(at, "Export").click().run())
+
+
+def viewer_search(repeat):
+    at = check(app("app.py").run())
+    for k in range(repeat):
+        query = datagen.WORDS[k % len(datagen.WORDS)]
+        yield lambda: check(at.text_input(key="msg_query").input(query).run())
+
+
+def viewer_merged_timeline(repeat):
+    # four threads of the list page into one timeline, a different four each time
+    for k in range(repeat):
+        at = check(app("app.py").run())
+        pick = at.sidebar.multiselect[0]
+        threads = [pick.options[(4 * k + i) % len(pick.options)] for i in range(4)]
+        yield lambda: check(pick.set_value(threads).run())
+
+
+def viewer_timeline_earlier(repeat):
+    # step back through the merged timeline of the page's four longest threads
+    at = check(app("app.py").run())
+    rows = at.session_state.timeline_rows
+    longest = sorted(rows, key=lambda i: rows[i]["msg_count"], reverse=True)[:4]
+    check(at.sidebar.multiselect[0].set_value(longest).run())
+    for _ in range(repeat):
+        if button(at, "⟨ Load earlier").disabled:
+            check(button(at, "Latest ⟫").click().run())
+        yield lambda: check(button(at, "⟨ Load earlier").click().run())
+
+
+def analytics_load(repeat):
+    for k in range(repeat):
+        clear_caches()
+        at = app("analytics_app.py")
+        yield lambda: check(at.run())
+
+
+def analytics_range(repeat):
+    at = check(app("analytics_app.py").run())
+    for k in range(repeat):
+        days = [7, 30, 90][k % 3]
+        yield lambda: check(at.sidebar.selectbox[0].set_value(days).run())
+
+
+def admin_open_thread(repeat):
+    # full thread load through the shared thread cache (cold each time)
+    at = check(app("admin_app.py").run())
+    for k in range(repeat):
+        clear_caches()
+        radio = at.sidebar.radio[0]
+        idx = (k + 1) % len(radio.options)
+        yield lambda: check(radio.set_value(idx).run())
+
+
+def admin_edit_message(repeat):
+    # Save Change on the selected message, new text each time (the thread is already loaded)
+    at = check(app("admin_app.py").run())
+    for k in range(repeat):
+        at.text_area[0].set_value(f"edited {k}")
+        yield lambda: check(button(at, "Save Change").click().run())
+
+
+SCENARIOS = {
+    "viewer: cold start": viewer_cold_start,
+    "viewer: warm start": viewer_warm_start,
+    "viewer: sidebar next page": viewer_sidebar_paging,
+    "viewer: open thread": viewer_open_thread,
+    "viewer: next thread": viewer_next_thread,
+    "viewer: export thread": viewer_export,
+    "viewer: search": viewer_search,
+    "viewer: merged timeline": viewer_merged_timeline,
+    "viewer: timeline earlier": viewer_timeline_earlier,
+    "analytics: cold load": analytics_load,
+    "analytics: change range": analytics_range,
+    "admin: open thread": admin_open_thread,
+    "admin: edit message": admin_edit_message,
+}
+
+
+def run_scenario(name, scenario, client, repeat: int, think: float = 0.0):
+    samples, requests = [], []
+    for step in scenario(repeat):
+        time.sleep(think)
+        before = client.requests
+        t0 = time.perf_counter()
+        step()
+        samples.append((time.perf_counter() - t0) * 1000)
+        requests.append(client.requests - before)
+    samples.sort()
+    p95 = samples[int(0.95 * (len(samples) - 1))]
+    print(f"{name:>26}  {statistics.median(samples):9.1f}  {p95:9.1f}  "
+          f"{statistics.mean(requests):8.1f}  {rss_mb():8.0f}")
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--backend", choices=["fake", "postgres"], default="fake")
+    ap.add_argument("--conversations", type=int, default=2_000)
+    ap.add_argument("--messages", type=int, default=100_000)
+    ap.add_argument("--rtt-ms", type=float, default=0.0)
+    ap.add_argument("--repeat", type=int, default=10)
+    ap.add_argument("--only", help="run scenarios whose name contains this text")
+    ap.add_argument("--replica", action="store_true", help="viewer reads from a local SQLite replica")
+    ap.add_argument("--think-ms", type=float, default=0.0, help="untimed pause before every step")
+    args = ap.parse_args()
+
+    os.chdir(ROOT)   # the apps load flabeelogo.jpg relative to the repo
+    import streamlit.logger
+    streamlit.logger.set_log_level("error")   # bare-mode and deprecation chatter
+    t0 = time.perf_counter()
+    client = make_client(args)
+    install(client)
+    print(f"{args.backend} backend: {args.conversations} conversations, {args.messages} messages "
+          f"(ready in {time.perf_counter() - t0:.1f}s), rtt {args.rtt_ms:g} ms")
+    if args.replica:
+        t0, before = time.perf_counter(), client.requests
+        path = install_replica(client)
+        print(f"replica synced in {time.perf_counter() - t0:.1f}s ({client.requests - before} requests, "
+              f"{os.path.getsize(path) / 1e6:.1f} MB)")
+    print(f"{'scenario':>26}  {'p50 ms':>9}  {'p95 ms':>9}  {'requests':>8}  {'RSS MB':>8}")
+    for name, scenario in SCENARIOS.items():
+        if args.only and args.only not in name:
+            continue
+        run_scenario(name, scenario, client, args.repeat, args.think_ms / 1000)
+
+
+if __name__ == "__main__":
+    main()
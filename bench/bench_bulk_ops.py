@@ -0,0 +1,102 @@
+"""Bulk admin write throughput: one call per conversation vs chunked bulk RPCs.
+
+    BENCH_PG_URL=postgresql://... python bench/bench_bulk_ops.py [--conversations 20000] [--rtt-ms 40]
+
+Seeds a scratch database (see bench/pg.py), then closes / tags / edits the
+same set of conversations once per strategy. Each call runs in its own
+transaction, like a PostgREST request. Local calls have almost no network
+cost, so the table also projects wall time at --rtt-ms per round trip, which is
+where per-row calls lose most.
+"""
+import argparse
+import time
+
+import pg
+
+MESSAGES_PER_CONVERSATION = 20
+CHUNKS = (100, 500, 2000)
+
+OPS = {
+    # name: (per-conversation sql, bulk sql)
+    "status": (
+        "update public.conversations set status = %s where id = %s",
+        "select public.bulk_set_conversation_status(%s, %s)",
+    ),
+    "tags (add)": (
+        "update public.conversations set tags = array_append(tags, %s) where id = %s",
+        "select public.bulk_set_conversation_tags(%s, array[%s], 'add')",
+    ),
+    "find/replace": (
+        "update public.messages set content = replace(content, 'refund', %s)"
+        " where conversation_id = %s and strpos(content, 'refund') > 0",
+        "select public.bulk_replace_message_content(%s, 'refund', %s, false)",
+    ),
+}
+VALUES = {"status": ("closed", "open"), "tags (add)": ("vip", "vip2"), "find/replace": ("refund", "refund")}   # rewrites every matching row, every run
+
+
+def seed(conn, conversations: int) -> list:
+    conn.execute(
+        """
+        insert into public.conversations (id, user_label, last_message_at)
+        select md5('c' || g)::uuid, 'user ' || g, now() - make_interval(mins => g)
+        from generate_series(1, %s) g
+        """,
+        (conversations,),
+    )
+    conn.execute(
+        """
+        insert into public.messages (conversation_id, role, content, created_at)
+        select md5('c' || (1 + g %% %s))::uuid,
+               case when g %% 2 = 0 then 'user' else 'assistant' end,
+               'hello, about my refund for order ' || g,
+               now() - make_interval(secs => g)
+        from generate_series(1, %s) g
+        """,
+        (conversations, conversations * MESSAGES_PER_CONVERSATION),
+    )
+    conn.execute("analyze")
+    return conn.execute("select public.conversation_ids()").fetchone()[0]
+
+
+def per_row(conn, sql: str, value, ids) -> tuple:
+    t0 = time.perf_counter()
+    for conv_id in ids:
+        conn.execute(sql, (value, conv_id))
+    return time.perf_counter() - t0, len(ids)
+
+
+def chunked(conn, sql: str, value, ids, chunk: int) -> tuple:
+    t0 = time.perf_counter()
+    calls = 0
+    for i in range(0, len(ids), chunk):
+        conn.execute(sql, (ids[i:i + chunk], value)).fetchone()
+        calls += 1
+    return time.perf_counter() - t0, calls
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--conversations", type=int, default=20_000)
+    ap.add_argument("--rtt-ms", type=float, default=40.0, help="round trip used for the projection")
+    args = ap.parse_args()
+
+    conn = pg.fresh_database()
+    ids = seed(conn, args.conversations)
+    rtt = args.rtt_ms / 1000
+
+    print(f"{len(ids)} conversations, {MESSAGES_PER_CONVERSATION} messages each")
+    print(f"{'op':>13}  {'strategy':>12}  {'calls':>6}  {'local s':>8}  {'conv/s':>8}  {'@rtt s':>8}")
+    for op, (row_sql, bulk_sql) in OPS.items():
+        # alternate values so every run really changes each row
+        values = VALUES[op]
+        runs = [("per row", per_row(conn, row_sql, values[0], ids))]
+        for k, chunk in enumerate(CHUNKS, 1):
+            runs.append((f"chunk {chunk}", chunked(conn, bulk_sql, values[k % 2], ids, chunk)))
+        for name, (elapsed, calls) in runs:
+            print(f"{op:>13}  {name:>12}  {calls:>6}  {elapsed:>8.2f}  {len(ids) / elapsed:>8.0f}  "
+                  f"{elapsed + calls * rtt:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""Memory and speed of a loaded thread: list of row dicts vs. thread_cache.CompactThread.
+
+    python bench/bench_compact_thread.py [--messages 50000] [--repeat 5]
+
+Rows are one synthetic conversation (datagen.py) round-tripped through JSON,
+so every string is its own object as it is when it comes off the wire.
+Retained memory is measured with tracemalloc after the build (timings are
+taken without it); "per rerun" is the admin editor's work on every script
+run: the selectbox labels of every message, finding the selected message
+and reading it.
+"""
+import argparse
+import gc
+import json
+import os
+import statistics
+import sys
+import time
+import tracemalloc
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+sys.path.insert(0, HERE)
+
+import datagen
+from thread_cache import CompactThread, estimate_bytes
+
+
+def retained(build):
+    # (value, bytes still allocated once build() returns, peak bytes during it)
+    gc.collect()
+    tracemalloc.start()
+    value = build()
+    gc.collect()
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return value, current, peak
+
+
+def timed(fn, repeat: int) -> float:
+    samples = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - t0) * 1000)
+    return statistics.median(samples)
+
+
+def dict_rerun(rows, prev_id):
+    # what admin_app did per run before: id map, label map, id list, index of the selection
+    by_id = {m["id"]: m for m in rows}
+    msg_labels = {m["id"]: f"{m['created_at'][:19]} • {m['role']} • " + m["content"][:60].replace("\n", " ")
+                  for m in rows}
+    ids = list(by_id)
+    labels = [msg_labels[i] for i in ids]
+    return labels, by_id[ids[ids.index(prev_id)]]
+
+
+def compact_rerun(thread, prev_id):
+    pos = thread.find(prev_id)
+    labels = thread.labels()
+    return labels, thread[pos]
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--messages", type=int, default=50_000)
+    ap.add_argument("--repeat", type=int, default=5)
+    args = ap.parse_args()
+
+    ds = datagen.Dataset(conversations=1, messages=args.messages)
+    payload = json.dumps(ds.messages(0, 0, ds.conversations[0]["msg_count"]))
+    rows, dict_bytes, _ = retained(lambda: json.loads(payload))
+    thread, compact_bytes, build_peak = retained(lambda: CompactThread(rows))
+    n = len(rows)
+    prev_id = rows[n // 2]["id"]
+
+    assert [m["id"] for m in thread] == [m["id"] for m in rows]
+    assert compact_rerun(thread, prev_id)[0] == dict_rerun(rows, prev_id)[0]
+
+    print(f"{n:,} messages, {len(payload) / 1e6:.1f} MB of JSON")
+    print(f"{'':>26}  {'dicts':>10}  {'compact':>10}")
+    print(f"{'retained MB':>26}  {dict_bytes / 1e6:10.1f}  {compact_bytes / 1e6:10.1f}")
+    print(f"{'ThreadCache accounting MB':>26}  {estimate_bytes(rows) / 1e6:10.1f}  {thread.nbytes / 1e6:10.1f}")
+    _, _, dict_peak = retained(lambda: dict_rerun(rows, prev_id))
+    _, _, compact_peak = retained(lambda: compact_rerun(thread, prev_id))
+    print(f"{'per rerun ms':>26}  {timed(lambda: dict_rerun(rows, prev_id), args.repeat):10.1f}  "
+          f"{timed(lambda: compact_rerun(thread, prev_id), args.repeat):10.1f}")
+    print(f"{'per rerun peak MB':>26}  {dict_peak / 1e6:10.1f}  {compact_peak / 1e6:10.1f}")
+    print(f"{'slice of 200 ms':>26}  {timed(lambda: rows[n // 2:n // 2 + 200], args.repeat):10.3f}  "
+          f"{timed(lambda: thread[n // 2:n // 2 + 200], args.repeat):10.3f}")
+    print(f"{'find by id ms':>26}  {timed(lambda: next(i for i, m in enumerate(rows) if m['id'] == prev_id), args.repeat):10.3f}  "
+          f"{timed(lambda: thread.find(prev_id), args.repeat):10.3f}")
+    print(f"build {timed(lambda: CompactThread(rows), args.repeat):.0f} ms "
+          f"(peak {build_peak / 1e6:.1f} MB on top of the rows)")
+
+
+if __name__ == "__main__":
+    main()
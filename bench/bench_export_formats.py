@@ -0,0 +1,108 @@
+"""File size and write/read time of the export formats.
+
+    python bench/bench_export_formats.py [--messages 200000] [--days 365]
+
+Threads: JSONL (plain, gzip, zstd if installed) vs Parquet with meta as a
+struct or as JSON text, written from a synthetic page source through
+export.py (write times include the source; its own cost is printed first)
+and read back into a DataFrame. Analytics: CSV (DataFrame.to_csv, as the download buttons do) vs
+export.frame_parquet, on a synthetic channel_message_counts frame.
+"""
+import argparse
+import io
+import os
+import sys
+import time
+from datetime import date, timedelta
+
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import export
+from bench_export_rss import fake_fetch_page
+
+CHANNELS = ["web", "whatsapp", "instagram", "messenger", "email", "unknown"]
+
+
+def fetch_with_conv(total: int):
+    fetch = fake_fetch_page(total)
+
+    def wrapped(conv_id, after=None, limit=500, after_id=None):
+        rows = fetch(conv_id, after=after, limit=limit)
+        for r in rows:
+            r["id"] = str(r["id"])
+            r["conversation_id"] = conv_id
+        return rows
+    return wrapped
+
+
+def read_jsonl(data: bytes, compression):
+    # what the data team does with a download: load it into a DataFrame
+    return pd.read_json(io.BytesIO(data), lines=True, compression=compression or None)
+
+
+def timed(fn):
+    t0 = time.perf_counter()
+    out = fn()
+    return out, time.perf_counter() - t0
+
+
+def report(name: str, size: int, write_s: float, read_s: float):
+    print(f"{name:>22}  {size / 1e6:9.2f} MB  {write_s:8.2f} s  {read_s:8.2f} s")
+
+
+def bench_threads(total: int):
+    fetch = fetch_with_conv(total)
+    compressions = [None, "gzip"]
+    try:
+        import zstandard  # noqa: F401
+        compressions.append("zstd")
+    except ImportError:
+        pass
+
+    print(f"\nThread of {total} messages")
+    print(f"{'format':>22}  {'size':>12}  {'write':>10}  {'read':>10}")
+    _, source_s = timed(lambda: sum(1 for _ in export.iter_thread(fetch, "bench")))
+    print(f"{'(source only)':>22}  {'':>12}  {source_s:8.2f} s")
+    for c in compressions:
+        spool, write_s = timed(lambda: export.export_thread(fetch, "bench", c))
+        data = spool.read()
+        _, read_s = timed(lambda: read_jsonl(data, c))
+        report(f"jsonl {c or ''}".strip(), len(data), write_s, read_s)
+    for meta in ("struct", "json"):
+        spool, write_s = timed(lambda: export.export_thread_parquet(fetch, "bench", meta=meta))
+        data = spool.read()
+        _, read_s = timed(lambda: pd.read_parquet(io.BytesIO(data)))
+        report(f"parquet meta={meta}", len(data), write_s, read_s)
+
+
+def bench_frame(days: int):
+    start = date(2024, 1, 1)
+    df = pd.DataFrame(
+        [{"day": (start + timedelta(days=d)).isoformat(), "channel": ch, "messages": (d * 7 + i * 13) % 500}
+         for d in range(days) for i, ch in enumerate(CHANNELS)]
+    )
+    print(f"\nchannel_message_counts, {len(df)} rows")
+    print(f"{'format':>22}  {'size':>12}  {'write':>10}  {'read':>10}")
+    csv, write_s = timed(lambda: df.to_csv(index=False).encode("utf-8"))
+    _, read_s = timed(lambda: pd.read_csv(io.BytesIO(csv)))
+    report("csv", len(csv), write_s, read_s)
+    parquet, write_s = timed(lambda: export.frame_parquet(df))
+    _, read_s = timed(lambda: pd.read_parquet(io.BytesIO(parquet)))
+    report("parquet", len(parquet), write_s, read_s)
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--messages", type=int, default=200_000)
+    ap.add_argument("--days", type=int, default=365 * 3)
+    args = ap.parse_args()
+    bench_threads(args.messages)
+    bench_frame(args.days)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""Peak RSS of the streaming JSONL export as thread length grows.
+
+    python bench/bench_export_rss.py [--compression gzip] [--page-size 500]
+
+Each size runs in a fresh subprocess (ru_maxrss is a high-water mark), against
+a synthetic page source, so only export.py's memory behaviour is measured.
+"""
+import argparse
+import os
+import resource
+import subprocess
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+SIZES = [1_000, 10_000, 100_000, 1_000_000]
+BASE = datetime(2024, 1, 1, tzinfo=timezone.utc)
+STEP = timedelta(milliseconds=1)
+
+
+def fake_fetch_page(total: int):
+    # oldest-first pages; row i is created at BASE + i ms
+    def fetch(conv_id, after=None, limit=500, after_id=None):
+        start = 0 if after is None else (datetime.fromisoformat(after) - BASE) // STEP + 1
+        end = min(start + limit, total)
+        return [
+            {
+                "id": i,
+                "role": "user" if i % 2 else "assistant",
+                "content": f"message {i} " + "lorem ipsum dolor sit amet " * 6,
+                "created_at": (BASE + i * STEP).isoformat(),
+                "meta": {"channel": "web", "tokens": i % 300},
+            }
+            for i in range(start, end)
+        ]
+    return fetch
+
+
+def run_one(total: int, compression, page_size: int):
+    import export
+    t0 = time.perf_counter()
+    spool = export.export_thread(fake_fetch_page(total), "bench", compression, page_size)
+    spool.seek(0, os.SEEK_END)
+    size = spool.tell()
+    spool.close()
+    elapsed = time.perf_counter() - t0
+    peak_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    print(f"{total:>9} msgs  {size / 1e6:9.1f} MB out  {elapsed:7.2f} s  peak RSS {peak_kb / 1024:7.1f} MB")
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--compression", choices=["gzip", "zstd"], default=None)
+    ap.add_argument("--page-size", type=int, default=500)
+    ap.add_argument("--one", type=int, help=argparse.SUPPRESS)
+    args = ap.parse_args()
+
+    if args.one:
+        run_one(args.one, args.compression, args.page_size)
+        return
+
+    for total in SIZES:
+        cmd = [sys.executable, __file__, "--one", str(total), "--page-size", str(args.page_size)]
+        if args.compression:
+            cmd += ["--compression", args.compression]
+        subprocess.run(cmd, check=True)
+
+
+if __name__ == "__main__":
+    main()
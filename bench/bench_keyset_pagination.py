@@ -0,0 +1,70 @@
+"""Conversation-list latency by page depth: keyset cursor vs. the old offset paging.
+
+    BENCH_PG_URL=postgresql://... python bench/bench_keyset_pagination.py [--pages 10000]
+
+Seeds pages * 30 conversations into a scratch database (see bench/pg.py).
+"""
+import argparse
+
+import pg
+
+LIMIT = 30
+DEPTHS = [1, 10, 100, 1_000, 10_000]
+
+KEYSET_SQL = "select * from public.list_conversations(p_limit => %s, p_after_at => %s, p_after_id => %s)"
+OFFSET_SQL = """
+  select id, last_message_at from public.conversations
+  where last_message_at is not null
+  order by last_message_at desc, id desc
+  limit %s offset %s
+"""
+
+
+def seed(conn, total: int):
+    conn.execute(
+        """
+        insert into public.conversations (user_label, last_channel, last_message, last_message_at, msg_count)
+        select 'user ' || g,
+               (array['web','whatsapp','instagram','email'])[1 + g % 4],
+               'last message ' || g,
+               now() - make_interval(secs => g * 7),
+               1 + g % 50
+        from generate_series(1, %s) g
+        """,
+        (total,),
+    )
+    conn.execute("analyze public.conversations")
+
+
+def cursor_at(conn, depth: int):
+    # the cursor a user would hold after paging to `depth`
+    if depth == 1:
+        return None, None
+    return conn.execute(
+        """
+        select last_message_at, id from public.conversations
+        order by last_message_at desc, id desc
+        offset %s limit 1
+        """,
+        ((depth - 1) * LIMIT - 1,),
+    ).fetchone()
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--pages", type=int, default=max(DEPTHS))
+    args = ap.parse_args()
+
+    conn = pg.fresh_database()
+    seed(conn, args.pages * LIMIT)
+
+    print(f"{'page':>7}  {'keyset p50/p95 ms':>20}  {'offset p50/p95 ms':>20}")
+    for depth in [d for d in DEPTHS if d <= args.pages]:
+        after_at, after_id = cursor_at(conn, depth)
+        k50, k95 = pg.timed(conn, KEYSET_SQL, (LIMIT + 1, after_at, after_id))
+        o50, o95 = pg.timed(conn, OFFSET_SQL, (LIMIT + 1, (depth - 1) * LIMIT))
+        print(f"{depth:>7}  {k50:>9.2f} / {k95:<8.2f}  {o50:>9.2f} / {o95:<8.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+"""Resolution-rate KPI: conversation_status_counts RPC vs. pulling raw rows.
+
+    BENCH_PG_URL=postgresql://... python bench/bench_kpi_aggregate.py [--conversations 500000]
+
+Seeds a scratch database (see bench/pg.py), checks that the RPC's totals and
+closed counts match the raw-row computation for each range, and times both.
+"""
+import argparse
+from datetime import datetime, timedelta, timezone
+
+import pg
+
+RANGES = [7, 30, 90]
+
+RPC_SQL = "select day, total, closed from public.conversation_status_counts(%s)"
+RAW_SQL = "select status, last_message_at from public.conversations where last_message_at >= %s"
+
+
+def seed(conn, total: int):
+    conn.execute(
+        """
+        insert into public.conversations (user_label, status, last_message_at)
+        select 'user ' || g,
+               case when g % 3 = 0 then 'closed' else 'open' end,
+               now() - make_interval(secs => (g * 120 * 86400 / %s))
+        from generate_series(1, %s) g
+        """,
+        (total, total),
+    )
+    conn.execute("analyze public.conversations")
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--conversations", type=int, default=500_000)
+    args = ap.parse_args()
+
+    conn = pg.fresh_database()
+    seed(conn, args.conversations)
+
+    for days in RANGES:
+        cutoff = (datetime.now(timezone.utc) - timedelta(days=days)).date().isoformat()
+
+        rows = conn.execute(RPC_SQL, (cutoff,)).fetchall()
+        rpc_total, rpc_closed = sum(r[1] for r in rows), sum(r[2] for r in rows)
+        raw = conn.execute(RAW_SQL, (cutoff,)).fetchall()
+        raw_total, raw_closed = len(raw), sum(1 for r in raw if r[0] == "closed")
+        assert (rpc_total, rpc_closed) == (raw_total, raw_closed), (days, rpc_total, rpc_closed, raw_total, raw_closed)
+
+        a50, a95 = pg.timed(conn, RPC_SQL, (cutoff,), repeat=10)
+        r50, r95 = pg.timed(conn, RAW_SQL, (cutoff,), repeat=10)
+        print(f"{days:>3}d  {rpc_total:>8} convs  {len(rows):>3} rows via RPC {a50:8.2f} / {a95:8.2f} ms"
+              f"   {raw_total:>8} rows raw {r50:8.2f} / {r95:8.2f} ms   counts match")
+
+
+if __name__ == "__main__":
+    main()
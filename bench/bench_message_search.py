@@ -0,0 +1,92 @@
+"""Message full-text search latency (search_messages RPC) on a large seeded table.
+
+    BENCH_PG_URL=postgresql://... python bench/bench_message_search.py [--messages 10000000] [--target-ms 100]
+
+Seeds a scratch database (see bench/pg.py) with synthetic messages drawn from
+a Zipf-ish vocabulary, so there are rare, medium and common terms, then times
+the first page and a follow-up keyset page for each query. The target is
+p95 < 100 ms for every query, common terms included: a class that misses it is
+flagged MISS and the run exits non-zero.
+"""
+import argparse
+import sys
+
+import pg
+
+CONVERSATIONS = 100_000
+QUERIES = {
+    "rare word": "zephyr",
+    "medium word": "refund",
+    "two words": "refund delivery",
+    "phrase": '"order status"',
+    "exclusion": "refund -delivery",
+    "common word": "hello",
+    "common pair": "hello thanks",
+}
+
+SEARCH_SQL = "select * from public.search_messages(%s, 21, %s, %s)"
+
+
+def seed(conn, messages: int):
+    conn.execute(
+        """
+        insert into public.conversations (id, user_label, last_message_at)
+        select md5('c' || g)::uuid, 'user ' || g, now()
+        from generate_series(1, %s) g
+        """,
+        (CONVERSATIONS,),
+    )
+    # words drawn with a skew towards the start of the list ('hello' everywhere); 'zephyr' is rare
+    conn.execute(
+        """
+        insert into public.messages (conversation_id, role, content, created_at)
+        select md5('c' || (1 + g %% %s))::uuid,
+               case when g %% 2 = 0 then 'user' else 'assistant' end,
+               (select string_agg(v.w[1 + floor(power(random(), 3) * array_length(v.w, 1))::int], ' ')
+                  from generate_series(1, 12 + (g %% 20)),
+                       (select array['hello','thanks','order','status','refund','delivery','size',
+                                     'return','payment','invoice','discount','voucher','tracking',
+                                     'exchange','warranty'] as w) v)
+                 || case when g %% 100000 = 0 then ' zephyr' else '' end,
+               now() - make_interval(secs => g)
+        from generate_series(1, %s) g
+        """,
+        (CONVERSATIONS, messages),
+    )
+    conn.execute("analyze public.messages")
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--messages", type=int, default=10_000_000)
+    ap.add_argument("--target-ms", type=float, default=100)
+    args = ap.parse_args()
+
+    conn = pg.fresh_database()
+    seed(conn, args.messages)
+
+    print(f"{'query':>12}  {'first page p50/p95 ms':>22}  {'next page p50/p95 ms':>22}  "
+          f"p95 < {args.target_ms:g} ms")
+    missed = []
+    for name, q in QUERIES.items():
+        first = conn.execute(SEARCH_SQL, (q, None, None)).fetchall()
+        f50, f95 = pg.timed(conn, SEARCH_SQL, (q, None, None), repeat=10)
+        worst = f95
+        if len(first) > 20:
+            cursor = (first[19][4], first[19][0])   # (rank, message_id) of the 20th hit
+            n50, n95 = pg.timed(conn, SEARCH_SQL, (q, *cursor), repeat=10)
+            nxt = f"{n50:>10.2f} / {n95:<9.2f}"
+            worst = max(worst, n95)
+        else:
+            nxt = f"{'(single page)':>22}"
+        ok = worst < args.target_ms
+        if not ok:
+            missed.append(name)
+        print(f"{name:>12}  {f50:>10.2f} / {f95:<9.2f}  {nxt}  {'ok' if ok else 'MISS'}")
+    if missed:
+        print(f"MISSED TARGET: {', '.join(missed)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
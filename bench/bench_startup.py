@@ -0,0 +1,82 @@
+"""Cold-start cost of each app: time to first render in a fresh process.
+
+    python bench/bench_startup.py [--runs 5]
+
+Every run starts a new interpreter (so nothing is imported or cached yet),
+imports streamlit as the server would, and runs the app once through AppTest
+against the in-process fake backend (see bench_apps.py). The supabase
+package is still imported where the app would import it, so its cost is
+counted. Reported per app (median of --runs): the first script run
+(imports, client, assets, first queries, render) and the second, warm
+rerun.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+APPS = ["app.py", "admin_app.py", "analytics_app.py"]
+
+
+def run_one(script: str):
+    t0 = time.perf_counter()
+    import streamlit  # noqa: F401  (the server has this loaded before any session)
+    import streamlit.logger
+    streamlit.logger.set_log_level("error")
+    t_streamlit = time.perf_counter() - t0
+
+    sys.path.insert(0, ROOT)
+    sys.path.insert(0, HERE)
+    import bench_apps
+    import datagen
+    from local_supabase import FakeSupabase
+
+    os.chdir(ROOT)
+    client = FakeSupabase(datagen.Dataset(conversations=500, messages=20_000))
+
+    t1 = time.perf_counter()   # from here on the app would pay it: its own imports, then the first run
+    import repository
+
+    def create_client(url, key):
+        import supabase  # noqa: F401  (charge the real client's import where the app pays it)
+        return client
+    repository.create_client = create_client
+
+    at = bench_apps.app(script)
+    bench_apps.check(at.run())
+    first = time.perf_counter() - t1
+    t2 = time.perf_counter()
+    bench_apps.check(at.run())
+    second = time.perf_counter() - t2
+    print(json.dumps({"streamlit": t_streamlit, "first": first, "second": second}))
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--runs", type=int, default=5)
+    ap.add_argument("--one", help=argparse.SUPPRESS)
+    args = ap.parse_args()
+
+    if args.one:
+        run_one(args.one)
+        return
+
+    print(f"{'app':>18}  {'first run ms':>12}  {'rerun ms':>9}  {'(streamlit import ms)':>22}")
+    for script in APPS:
+        results = []
+        for _ in range(args.runs):
+            out = subprocess.run([sys.executable, __file__, "--one", script],
+                                 check=True, capture_output=True, text=True).stdout
+            results.append(json.loads(out.strip().splitlines()[-1]))
+        med = {k: statistics.median(r[k] for r in results) for k in ("streamlit", "first", "second")}
+        print(f"{script:>18}  {med['first'] * 1000:12.0f}  {med['second'] * 1000:9.0f}  "
+              f"{med['streamlit'] * 1000:22.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+"""Merged timeline (timeline.load_window) cost per window and completeness with tied timestamps.
+
+    python bench/bench_timeline.py [--threads 20] [--messages 5000] [--windows 50] [--trials 150]
+
+Threads are kept in memory and paged the way list_messages pages them:
+newest first, below a (created_at, id) keyset. The check walks every window
+of randomized threads where several messages share a created_at (so ties
+fall on page boundaries, including one built to land exactly on one) and
+fails unless every message comes back exactly once, newest window first.
+The timing then walks --windows windows back from the newest and reports
+ms and rows read per window.
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+
+import timeline
+
+START = datetime(2026, 1, 1, tzinfo=timezone.utc)
+
+
+def make_threads(n_threads: int, n_messages: int, rng, max_tie: int = 1) -> dict:
+    """conv_id -> rows in (created_at, id) order; up to max_tie messages share each timestamp."""
+    threads = {}
+    for t in range(n_threads):
+        conv_id = f"c{t:03d}"
+        rows, ts = [], START + timedelta(seconds=rng.randrange(3600))
+        while len(rows) < n_messages:
+            for _ in range(rng.randint(1, max_tie)):
+                rows.append({"id": f"{conv_id}-{rng.getrandbits(48):012x}", "conversation_id": conv_id,
+                             "created_at": ts.isoformat()})
+            ts += timedelta(seconds=rng.randint(1, 90))
+        rows = rows[:n_messages]
+        rows.sort(key=lambda m: (m["created_at"], m["id"]))
+        threads[conv_id] = rows
+    return threads
+
+
+class Pages:
+    """fetch_pages for timeline.load_window over in-memory threads (list_messages semantics)."""
+
+    def __init__(self, threads: dict):
+        self.threads = threads
+        self.rows_read = 0
+
+    def __call__(self, requests):
+        out = []
+        for conv_id, before, limit in requests:
+            rows = self.threads[conv_id]
+            if before is not None:
+                at, before_id = before if isinstance(before, tuple) else (before, None)
+                rows = [m for m in rows if (_ts(m["created_at"]), m["id"]) < (_ts(at), before_id or "")]
+            page = rows[::-1][:limit]
+            self.rows_read += len(page)
+            out.append(page)
+        return out
+
+
+def _ts(value: str) -> datetime:
+    return datetime.fromisoformat(value)
+
+
+def walk(threads: dict, size: int, page: int = 0, windows: int = 0):
+    """Every window from the newest back (or the first `windows`); returns the windows, newest first."""
+    fetch = Pages(threads)
+    cursors, out = timeline.first_cursors(threads), []
+    while cursors and (not windows or len(out) < windows):
+        msgs, cursors = timeline.load_window(fetch, cursors, size, page)
+        out.append(msgs)
+    return out, fetch.rows_read
+
+
+def complete(threads: dict, windows: list) -> bool:
+    seen = [m["id"] for msgs in windows for m in reversed(msgs)]
+    times = [_ts(m["created_at"]) for msgs in windows for m in reversed(msgs)]
+    want = {m["id"] for rows in threads.values() for m in rows}
+    return len(seen) == len(want) and set(seen) == want and times == sorted(times, reverse=True)
+
+
+def check(trials: int) -> bool:
+    rng = random.Random(7)
+    # one thread of 5 messages on one timestamp, paged 2 at a time: every page
+    # boundary is inside the tie
+    tied = {"c000": [{"id": f"m{k}", "conversation_id": "c000", "created_at": START.isoformat()}
+                     for k in range(5)]}
+    failed = 0 if complete(tied, walk(tied, size=2, page=2)[0]) else 1
+    for _ in range(trials):
+        threads = make_threads(rng.randint(1, 5), rng.randint(1, 80), rng, max_tie=4)
+        size, page = rng.randint(1, 30), rng.randint(1, 12)
+        failed += not complete(threads, walk(threads, size, page)[0])
+    print(f"check with tied timestamps: {'ok' if not failed else 'MISMATCH'} "
+          f"({failed} of {trials + 1} trials lost or repeated messages)")
+    return not failed
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--threads", type=int, default=20)
+    ap.add_argument("--messages", type=int, default=5000, help="per thread")
+    ap.add_argument("--windows", type=int, default=50)
+    ap.add_argument("--trials", type=int, default=150)
+    args = ap.parse_args()
+
+    if not check(args.trials):
+        sys.exit(1)
+
+    threads = make_threads(args.threads, args.messages, random.Random(1))
+    t0 = time.perf_counter()
+    windows, rows_read = walk(threads, timeline.WINDOW, windows=args.windows)
+    elapsed = time.perf_counter() - t0
+    print(f"{args.threads} threads x {args.messages:,} messages: {len(windows)} windows of {timeline.WINDOW}, "
+          f"{elapsed / len(windows) * 1000:.2f} ms and {rows_read / len(windows):.0f} rows read per window")
+
+
+if __name__ == "__main__":
+    main()
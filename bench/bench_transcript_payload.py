@@ -0,0 +1,81 @@
+"""Transcript payload for a 500-message page: per-bubble st.markdown vs. the batched component.
+
+    python bench/bench_transcript_payload.py [--messages 500]
+
+Counts the Streamlit elements and the bytes of markup each approach sends over
+the websocket (element protobuf framing excluded), plus Python build time.
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import transcript  # noqa: E402
+
+PALETTE = {"NAVY": "#34345B", "FUCHSIA": "#FF3C69"}
+
+
+def synthetic_page(n: int):
+    rnd = random.Random(7)
+    base = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    return [
+        {
+            "id": i,
+            "role": "user" if i % 2 else "assistant",
+            "content": " ".join(rnd.choice(["hello", "order", "refund", "thanks", "<b>", "size", "delivery"])
+                                for _ in range(rnd.randint(5, 80))),
+            "created_at": (base + timedelta(minutes=i)).isoformat(),
+            "meta": {"channel": "web", "tokens": rnd.randint(10, 500)} if i % 3 == 0 else None,
+        }
+        for i in range(n)
+    ]
+
+
+def legacy_payload(msgs):
+    # what the old loop sent: one markdown element per bubble plus expander + st.json per meta
+    elements, size = 0, 0
+    for m in msgs:
+        role_class = "user" if m["role"] == "user" else "assistant"
+        html = f"""
+        <div class="chat-row chat-left">
+          <div>
+            <div class="bubble {role_class}">{m["content"]}</div>
+            <div class="meta">{transcript.fmt_time(m["created_at"])}</div>
+          </div>
+        </div>
+        """
+        elements += 1
+        size += len(html.encode("utf-8"))
+        if m.get("meta"):
+            elements += 2
+            size += len(b"Details") + len(json.dumps(m["meta"]).encode("utf-8"))
+    return elements, size
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--messages", type=int, default=500)
+    args = ap.parse_args()
+    msgs = synthetic_page(args.messages)
+
+    t0 = time.perf_counter()
+    old_elements, old_bytes = legacy_payload(msgs)
+    t_old = (time.perf_counter() - t0) * 1000
+
+    t0 = time.perf_counter()
+    html = transcript.build_transcript_html(msgs, PALETTE)
+    t_new = (time.perf_counter() - t0) * 1000
+
+    print(f"{args.messages} messages")
+    print(f"  per-bubble : {old_elements:5d} elements  {old_bytes / 1024:8.1f} KiB  build {t_old:6.1f} ms")
+    print(f"  batched    : {1:5d} element   {len(html.encode('utf-8')) / 1024:8.1f} KiB  build {t_new:6.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,203 @@
+"""Deterministic synthetic workspace: conversations, messages with meta, channels.
+
+Scale is set by the conversation and message counts (1k to 10M messages).
+Messages are never stored: each conversation's messages are evenly spaced in
+time and generated on demand from (conversation, index), so even a
+10M-message dataset only holds the conversation rows in memory. The same data
+can be copied into Postgres (load_postgres) to run the real RPCs.
+"""
+import hashlib
+import json
+import random
+import uuid
+from datetime import datetime, timedelta, timezone
+
+CHANNELS = ["web", "whatsapp", "instagram", "messenger", "email", None]
+WORDS = [
+    "hello", "thanks", "order", "status", "refund", "delivery", "size", "return",
+    "payment", "invoice", "discount", "voucher", "tracking", "exchange", "warranty",
+    "please", "help", "when", "arrive", "broken", "colour", "stock", "account", "password",
+]
+SENTENCES = 1000          # distinct message bodies, picked per message by index
+END = datetime(2026, 10, 1, tzinfo=timezone.utc)
+
+
+def _uuid(key: str) -> str:
+    return str(uuid.UUID(hashlib.md5(key.encode()).hexdigest()))
+
+
+def _iso(dt: datetime) -> str:
+    return dt.isoformat()
+
+
+class Dataset:
+    """`conversations` threads holding `messages` messages in total, over `days` days.
+
+    Thread lengths are skewed (a few long threads, many short ones). Message j
+    of a thread is created at first + j * gap; even j are user messages.
+    """
+
+    def __init__(self, conversations: int = 1000, messages: int = 100_000, days: int = 120, seed: int = 7):
+        rng = random.Random(seed)
+        weights = [1 / (i + 1) ** 0.8 for i in range(conversations)]
+        rng.shuffle(weights)
+        scale = messages / sum(weights)
+        counts = [max(1, int(w * scale)) for w in weights]
+        counts[counts.index(max(counts))] += max(0, messages - sum(counts))
+
+        self.sentences = [
+            " ".join(rng.choice(WORDS) for _ in range(rng.randint(4, 40))) for _ in range(SENTENCES)
+        ]
+        self.conversations = []
+        self._first, self._gap = [], []
+        for i, n in enumerate(counts):
+            gap = rng.choice([15, 60, 300, 3600])
+            last = END - timedelta(seconds=rng.randrange(days * 86400))
+            first = last - timedelta(seconds=gap * (n - 1))
+            channel = rng.choice(CHANNELS)
+            self._first.append(first)
+            self._gap.append(gap)
+            self.conversations.append({
+                "conversation_id": _uuid(f"c{i}"),
+                "user_label": f"user {i}",
+                "title": f"Conversation {i}" if i % 3 else None,
+                "status": "closed" if rng.random() < 0.3 else "open",
+                "tags": rng.sample(["vip", "bug", "billing", "shipping"], rng.randint(0, 2)),
+                "last_channel": channel,
+                "last_message": self._content(i, n - 1),
+                "last_message_at": _iso(last),
+                "msg_count": n,
+            })
+        self.index = {c["conversation_id"]: i for i, c in enumerate(self.conversations)}
+        self.total_messages = sum(counts)
+        self._stats = {}
+
+    # ---------------- Messages ----------------
+    def _content(self, i: int, j: int) -> str:
+        return self.sentences[(i * 7919 + j * 104729) % SENTENCES]
+
+    def created_at(self, i: int, j: int) -> datetime:
+        return self._first[i] + timedelta(seconds=self._gap[i] * j)
+
+    def message(self, i: int, j: int) -> dict:
+        conv = self.conversations[i]
+        user = j % 2 == 0
+        meta = {"channel": conv["last_channel"] or "unknown"}
+        if not user and j % 3 == 1:
+            meta.update({"model": "flabee-1", "tokens": (i + j) % 700, "latency_ms": 200 + (i * j) % 1800})
+        return {
+            "id": _uuid(f"m{i}-{j}"),
+            "conversation_id": conv["conversation_id"],
+            "role": "user" if user else "assistant",
+            "content": self._content(i, j),
+            "meta": meta,
+            "created_at": _iso(self.created_at(i, j)),
+        }
+
+    def messages(self, i: int, lo: int, hi: int) -> list:
+        """Messages lo..hi-1 of conversation i, oldest first."""
+        n = self.conversations[i]["msg_count"]
+        return [self.message(i, j) for j in range(max(lo, 0), min(hi, n))]
+
+    def position(self, i: int, ts) -> int:
+        """Number of messages of conversation i created before `ts` (ISO string or datetime)."""
+        if isinstance(ts, str):
+            ts = datetime.fromisoformat(ts.replace("Z", "+00:00"))
+        if ts.tzinfo is None:
+            ts = ts.replace(tzinfo=timezone.utc)
+        secs = (ts - self._first[i]).total_seconds()
+        n = self.conversations[i]["msg_count"]
+        if secs <= 0:
+            return 0
+        return min(n, int(-(-secs // self._gap[i])))   # ceil
+
+    def iter_messages(self):
+        for i, conv in enumerate(self.conversations):
+            for j in range(conv["msg_count"]):
+                yield self.message(i, j)
+
+    # ---------------- Derived stats (what conversation_stats holds) ----------------
+    def stats(self, i: int) -> dict:
+        """Row of get_conversation_stats for conversation i (messages alternate, so every reply takes one gap)."""
+        if i not in self._stats:
+            conv, n, gap_ms = self.conversations[i], self.conversations[i]["msg_count"], self._gap[i] * 1000
+            chars = [0, 0]
+            tokens = latency_sum = latency_count = 0
+            for j in range(n):
+                chars[j % 2] += len(self._content(i, j))
+                if j % 2 and j % 3 == 1:
+                    tokens += (i + j) % 700
+                    latency_sum += 200 + (i * j) % 1800
+                    latency_count += 1
+            self._stats[i] = {
+                "conversation_id": conv["conversation_id"],
+                "user_msgs": (n + 1) // 2, "assistant_msgs": n // 2, "other_msgs": 0,
+                "first_message_at": _iso(self._first[i]), "last_message_at": conv["last_message_at"],
+                "first_response_ms": gap_ms if n > 1 else None,
+                "avg_response_ms": gap_ms if n > 1 else None,
+                "median_response_ms": gap_ms if n > 1 else None,
+                "user_chars": chars[0], "assistant_chars": chars[1], "tokens": tokens,
+                "avg_latency_ms": latency_sum // latency_count if latency_count else None,
+                "stale": False,
+            }
+        return self._stats[i]
+
+    # ---------------- Aggregates (what the analytics views return) ----------------
+    def _per_day(self):
+        # (day, i, messages that day, user messages that day) for every active conversation-day
+        for i, conv in enumerate(self.conversations):
+            n, first, gap = conv["msg_count"], self._first[i], self._gap[i]
+            j = 0
+            while j < n:
+                day = self.created_at(i, j).date()
+                next_day = datetime(day.year, day.month, day.day, tzinfo=timezone.utc) + timedelta(days=1)
+                k = min(n, self.position(i, next_day))
+                users = (k + 1) // 2 - (j + 1) // 2
+                yield day.isoformat(), i, k - j, users
+                j = k
+
+    def aggregates(self) -> dict:
+        daily, channel, active = {}, {}, {}
+        for day, i, count, users in self._per_day():
+            d = daily.setdefault(day, [0, 0])
+            d[0] += count
+            d[1] += users
+            ch = self.conversations[i]["last_channel"] or "unknown"
+            channel[(day, ch)] = channel.get((day, ch), 0) + count
+            active[day] = active.get(day, 0) + 1
+        return {
+            "daily_message_counts": [
+                {"day": day, "total": t, "user_msgs": u, "assistant_msgs": t - u}
+                for day, (t, u) in sorted(daily.items())
+            ],
+            "channel_message_counts": [
+                {"day": day, "channel": ch, "cnt": n} for (day, ch), n in sorted(channel.items())
+            ],
+            "daily_active_conversations": [
+                {"day": day, "active_conversations": n} for day, n in sorted(active.items())
+            ],
+        }
+
+
+def load_postgres(conn, ds: Dataset):
+    """Copy the dataset into the bench database (see pg.py); messages are streamed."""
+    with conn.cursor() as cur:
+        with cur.copy(
+            "copy public.conversations (id, user_label, title, status, tags, last_channel, "
+            "last_message, last_message_at, msg_count) from stdin"
+        ) as copy:
+            for c in ds.conversations:
+                copy.write_row((c["conversation_id"], c["user_label"], c["title"], c["status"], c["tags"],
+                                c["last_channel"], c["last_message"], c["last_message_at"], c["msg_count"]))
+        with cur.copy(
+            "copy public.messages (id, conversation_id, role, content, meta, created_at) from stdin"
+        ) as copy:
+            for m in ds.iter_messages():
+                copy.write_row((m["id"], m["conversation_id"], m["role"], m["content"],
+                                json.dumps(m["meta"]), m["created_at"]))
+    # the insert trigger filled the running stats; compute the exact ones (medians)
+    while conn.execute("select public.refresh_conversation_stats(5000)").fetchone()[0]:
+        pass
+    while conn.execute("select public.refresh_conversation_medians(5000)").fetchone()[0]:
+        pass
+    conn.execute("analyze")
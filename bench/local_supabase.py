@@ -0,0 +1,439 @@
+"""Local stand-ins for the Supabase client, shaped like PostgREST responses.
+
+Both support what the apps use: rpc(name, params).execute().data and
+table(name).select(...).gte(...).order(...).range(...).execute().data.
+
+FakeSupabase answers from a datagen.Dataset in process (no database needed;
+rtt_ms adds a fixed delay per request, like a network round trip).
+PostgresSupabase runs the real RPCs from supabase/migrations on the bench
+database (see pg.py), converting rows the way PostgREST serializes them.
+"""
+import bisect
+import time
+from datetime import date, datetime, timezone
+from decimal import Decimal
+from uuid import UUID
+
+SEARCH_SCAN_LIMIT = 200_000   # messages the fake scans per search page at most
+
+
+class _Response:
+    def __init__(self, data):
+        self.data = data
+
+
+class _Request:
+    def __init__(self, run, rtt: float):
+        self._run = run
+        self._rtt = rtt
+
+    def execute(self):
+        if self._rtt:
+            time.sleep(self._rtt)
+        return _Response(self._run())
+
+
+class _TableQuery:
+    def __init__(self, run_query, name: str, rtt: float):
+        self._run_query = run_query
+        self._rtt = rtt
+        self.q = {"table": name, "gte": [], "order": [], "range": None}
+
+    def select(self, *columns):
+        return self
+
+    def gte(self, column, value):
+        self.q["gte"].append((column, value))
+        return self
+
+    def order(self, column, desc: bool = False):
+        self.q["order"].append((column, desc))
+        return self
+
+    def range(self, start: int, end: int):
+        self.q["range"] = (start, end)
+        return self
+
+    def execute(self):
+        if self._rtt:
+            time.sleep(self._rtt)
+        return _Response(self._run_query(self.q))
+
+
+# ---------------- In-process fake ----------------
+class FakeSupabase:
+    def __init__(self, dataset, rtt_ms: float = 0.0):
+        self.ds = dataset
+        self.rtt = rtt_ms / 1000
+        self.requests = 0
+        self._overrides = {}   # message id -> edited content
+        self._aggregates = None
+        self._changes = None   # (created_at, id, i, j) of every message, for the replica feed
+        # conversations ascending by (last_message_at, id), no messages first;
+        # pages walk it backwards
+        self._keys = sorted((_list_key(c["last_message_at"], c["conversation_id"]), i)
+                            for i, c in enumerate(dataset.conversations))
+        self._order = [i for _, i in self._keys]
+        self._keys = [key for key, _ in self._keys]
+
+    def rpc(self, fn: str, params=None, *args, **kwargs):
+        handler = getattr(self, "_rpc_" + fn, None)
+        if handler is None:
+            raise NotImplementedError(f"FakeSupabase has no RPC {fn!r}")
+        self.requests += 1
+        return _Request(lambda: handler(**(params or {})), self.rtt)
+
+    def table(self, name: str):
+        self.requests += 1
+        return _TableQuery(self._table, name, self.rtt)
+
+    # ---------------- Conversations ----------------
+    def _matches(self, c, search, channel, p_from, p_to, status=None) -> bool:
+        if search and search.lower() not in (c["user_label"] or "").lower() \
+                and search.lower() not in (c["last_message"] or "").lower():
+            return False
+        if channel and (c["last_channel"] or "unknown") != channel:
+            return False
+        if (p_from or p_to) and c["last_message_at"] is None:
+            return False
+        if p_from and c["last_message_at"] < p_from:
+            return False
+        if p_to and c["last_message_at"] >= p_to:
+            return False
+        return status is None or c["status"] == status
+
+    def _rpc_list_conversations(self, p_search=None, p_limit=30, p_channel=None, p_from=None, p_to=None,
+                                p_after_at=None, p_after_id=None):
+        end = len(self._keys)
+        if p_after_id is not None:
+            end = bisect.bisect_left(self._keys, _list_key(p_after_at, p_after_id))
+        rows = []
+        for pos in range(end - 1, -1, -1):
+            c = self.ds.conversations[self._order[pos]]
+            if self._matches(c, p_search, p_channel, p_from, p_to):
+                rows.append(dict(c))
+                if len(rows) >= p_limit:
+                    break
+        return rows
+
+    def _rpc_list_conversation_channels(self):
+        return [{"channel": ch} for ch in sorted({c["last_channel"] or "unknown" for c in self.ds.conversations})]
+
+    def _rpc_get_conversation(self, p_conversation_id):
+        i = self.ds.index.get(p_conversation_id)
+        return [dict(self.ds.conversations[i])] if i is not None else []
+
+    def _rpc_conversation_ids(self, p_search=None, p_channel=None, p_from=None, p_to=None, p_status=None):
+        return [self.ds.conversations[i]["conversation_id"] for i in reversed(self._order)
+                if self._matches(self.ds.conversations[i], p_search, p_channel, p_from, p_to, p_status)]
+
+    def _rpc_conversation_status_counts(self, p_from):
+        days = {}
+        for c in self.ds.conversations:
+            if c["last_message_at"] >= p_from:
+                d = days.setdefault(c["last_message_at"][:10], [0, 0])
+                d[0] += 1
+                d[1] += c["status"] == "closed"
+        return [{"day": day, "total": t, "closed": cl} for day, (t, cl) in sorted(days.items())]
+
+    def _update(self, ids, fn) -> int:
+        n = 0
+        for conv_id in ids:
+            i = self.ds.index.get(conv_id)
+            if i is not None:
+                fn(self.ds.conversations[i])
+                n += 1
+        return n
+
+    def _rpc_rename_conversation(self, p_conversation_id, p_title):
+        self._update([p_conversation_id], lambda c: c.update(title=p_title))
+
+    def _rpc_set_conversation_status(self, p_conversation_id, p_status):
+        self._update([p_conversation_id], lambda c: c.update(status=p_status))
+
+    def _rpc_set_conversation_tags(self, p_conversation_id, p_tags):
+        self._update([p_conversation_id], lambda c: c.update(tags=list(p_tags)))
+
+    def _rpc_update_conversations(self, p_updates):
+        n = 0
+        for u in p_updates:
+            fields = {k: (list(v) if k == "tags" else v) for k, v in u.items() if k in ("title", "status", "tags")}
+            n += self._update([u["id"]], lambda c: c.update(fields))
+        return n
+
+    def _bulk_update(self, ids, fields, dry_run) -> int:
+        # like the SQL: only conversations that change are written and counted
+        n = 0
+        for conv_id in ids:
+            i = self.ds.index.get(conv_id)
+            if i is None:
+                continue
+            c = self.ds.conversations[i]
+            new = fields(c)
+            if any(c.get(k) != v for k, v in new.items()):
+                n += 1
+                if not dry_run:
+                    c.update(new)
+        return n
+
+    def _rpc_bulk_set_conversation_status(self, p_conversation_ids, p_status, p_dry_run=False):
+        return self._bulk_update(p_conversation_ids, lambda c: {"status": p_status}, p_dry_run)
+
+    def _rpc_bulk_set_conversation_tags(self, p_conversation_ids, p_tags, p_mode="replace", p_dry_run=False):
+        def fields(c):
+            old = c["tags"] or []
+            if p_mode == "add":
+                tags = old + [t for t in p_tags if t not in old]
+            elif p_mode == "remove":
+                tags = [t for t in old if t not in p_tags]
+            else:
+                tags = list(p_tags)
+            return {"tags": tags} if tags != old else {}
+        return self._bulk_update(p_conversation_ids, fields, p_dry_run)
+
+    # ---------------- Replica change feeds ----------------
+    # nothing is updated after generation, so updated_at is last_message_at / created_at
+    def _rpc_replica_conversations(self, p_since=None, p_after_id=None, p_limit=1000):
+        rows = sorted((dict(c, updated_at=c["last_message_at"]) for c in self.ds.conversations),
+                      key=lambda c: (c["updated_at"], c["conversation_id"]))
+        if p_since is not None:
+            rows = [c for c in rows if (c["updated_at"], c["conversation_id"]) > (p_since, p_after_id or "")]
+        return rows[:p_limit]
+
+    def _rpc_replica_horizon(self):
+        # no transactions are ever in flight here
+        return datetime.now(timezone.utc).isoformat()
+
+    def _change_log(self):
+        # every message as (created_at, id, i, j), in (created_at, id) order
+        if self._changes is None:
+            self._changes = sorted(
+                (self.ds.created_at(i, j).isoformat(), self.ds.message(i, j)["id"], i, j)
+                for i, c in enumerate(self.ds.conversations) for j in range(c["msg_count"]))
+        return self._changes
+
+    def _rpc_replica_messages(self, p_since=None, p_after_id=None, p_limit=1000):
+        changes = self._change_log()
+        lo = 0 if p_since is None else bisect.bisect_right(changes, (p_since, p_after_id or "", 1 << 62))
+        rows = []
+        for _, _, i, j in changes[lo:lo + p_limit]:
+            m = self._messages(i, j, j + 1)[0]
+            rows.append(dict(m, updated_at=m["created_at"]))
+        return rows
+
+    # ---------------- Raw analytics pages ----------------
+    def _rpc_analytics_message_page(self, p_from, p_after_at=None, p_after_id=None, p_limit=50000):
+        changes = self._change_log()
+        if p_after_at is None:
+            lo = bisect.bisect_left(changes, (p_from,))
+        else:
+            lo = bisect.bisect_right(changes, (p_after_at, p_after_id, 1 << 62))
+        page = changes[lo:lo + p_limit]
+        return {
+            "conversation_id": [self.ds.conversations[i]["conversation_id"] for _, _, i, _ in page],
+            "role": ["user" if j % 2 == 0 else "assistant" for _, _, _, j in page],
+            "created_at": [int(self.ds.created_at(i, j).timestamp() * 1000) for _, _, i, j in page],
+            "next": {"at": page[-1][0], "id": page[-1][1]} if page else None,
+        }
+
+    def _rpc_analytics_conversations(self, p_from):
+        convs = [c for c in self.ds.conversations if c["last_message_at"] >= p_from]
+        return {
+            "channel": [c["last_channel"] or "unknown" for c in convs],
+            "status": [c["status"] or "open" for c in convs],
+            "msg_count": [c["msg_count"] for c in convs],
+        }
+
+    # ---------------- Derived stats ----------------
+    def _rpc_get_conversation_stats(self, p_conversation_ids):
+        return [dict(self.ds.stats(self.ds.index[c])) for c in p_conversation_ids if c in self.ds.index]
+
+    def _rpc_conversation_stats_daily(self, p_from):
+        groups = {}
+        for i, c in enumerate(self.ds.conversations):
+            if c["last_message_at"] < p_from:
+                continue
+            row = self.ds.stats(i)
+            g = groups.setdefault((c["last_message_at"][:10], c["last_channel"] or "unknown"), [])
+            g.append(row)
+        rows = []
+        for (day, channel), stats in sorted(groups.items()):
+            firsts = sorted(row["first_response_ms"] for row in stats if row["first_response_ms"] is not None)
+            rows.append({
+                "day": day, "channel": channel, "conversations": len(stats),
+                "user_msgs": sum(row["user_msgs"] for row in stats),
+                "assistant_msgs": sum(row["assistant_msgs"] for row in stats),
+                "responses": sum(row["assistant_msgs"] for row in stats),
+                "response_ms_sum": sum(row["assistant_msgs"] * (row["avg_response_ms"] or 0) for row in stats),
+                "p50_first_response_ms": firsts[(len(firsts) - 1) // 2] if firsts else None,
+                "user_chars": sum(row["user_chars"] for row in stats),
+                "assistant_chars": sum(row["assistant_chars"] for row in stats),
+                "tokens": sum(row["tokens"] for row in stats),
+            })
+        return rows
+
+    # ---------------- Messages ----------------
+    def _messages(self, i, lo, hi):
+        rows = self.ds.messages(i, lo, hi)
+        if self._overrides:
+            for m in rows:
+                if m["id"] in self._overrides:
+                    m["content"] = self._overrides[m["id"]]
+        return rows
+
+    def _rpc_list_messages(self, p_conversation_id, p_before=None, p_limit=50, p_before_id=None):
+        i = self.ds.index[p_conversation_id]
+        if p_before is None:
+            hi = self.ds.conversations[i]["msg_count"]
+        elif p_before_id is None:
+            hi = self.ds.position(i, p_before)
+        else:
+            hi = self._after(i, p_before, p_before_id, below=True)
+        return list(reversed(self._messages(i, hi - max(p_limit, 1), hi)))
+
+    def _rpc_list_messages_after(self, p_conversation_id, p_after=None, p_limit=500, p_until=None,
+                                 p_after_id=None):
+        i = self.ds.index[p_conversation_id]
+        n = self.ds.conversations[i]["msg_count"]
+        lo = 0 if p_after is None else self._after(i, p_after, p_after_id)
+        hi = n if p_until is None else self._after(i, p_until)
+        return self._messages(i, lo, min(hi, lo + p_limit))
+
+    def _after(self, i, ts, after_id=None, below=False) -> int:
+        # index of the first message after ts, or after the (ts, after_id) keyset;
+        # with below, of the first one not below the keyset
+        pos = self.ds.position(i, ts)
+        n = self.ds.conversations[i]["msg_count"]
+        while pos < n:
+            m = self.ds.message(i, pos)
+            if m["created_at"] != ts or (after_id is not None and (m["id"] >= after_id if below
+                                                                   else m["id"] > after_id)):
+                break
+            pos += 1
+        return pos
+
+    def _rpc_list_messages_around(self, p_conversation_id, p_at=None, p_message_id=None, p_before=25, p_after=25,
+                                  p_after_anchor=False):
+        i = self.ds.index[p_conversation_id]
+        n = self.ds.conversations[i]["msg_count"]
+        if p_message_id is None:
+            anchor = self.ds.position(i, p_at)
+        elif p_at is not None:
+            anchor = self._after(i, p_at, p_message_id, below=True)
+        else:
+            anchor = next((j for j in range(n) if self.ds.message(i, j)["id"] == p_message_id), n)
+        start = anchor
+        if p_after_anchor and p_message_id is not None and anchor < n \
+                and self.ds.message(i, anchor)["id"] == p_message_id:
+            start += 1
+        return self._messages(i, anchor - max(p_before, 0), anchor) + self._messages(i, start, start + max(p_after, 0))
+
+    def _rpc_update_message(self, p_message_id, p_content):
+        self._overrides[p_message_id] = p_content
+
+    def _rpc_update_messages(self, p_updates):
+        for u in p_updates:
+            self._overrides[u["id"]] = u["content"]
+        return len(p_updates)
+
+    def _rpc_search_messages(self, p_query, p_limit=20, p_after_rank=None, p_after_id=None):
+        # every hit ranks 1.0, so the keyset is effectively the message id order of the scan
+        words = [w.strip('"').lower() for w in p_query.split() if not w.startswith("-")]
+        hits, scanned, skipping = [], 0, p_after_id is not None
+        for i, conv in enumerate(self.ds.conversations):
+            for j in range(conv["msg_count"]):
+                scanned += 1
+                if scanned > SEARCH_SCAN_LIMIT:
+                    return hits
+                m = self.ds.message(i, j)
+                if skipping:
+                    skipping = m["id"] != p_after_id
+                    continue
+                if all(w in m["content"] for w in words):
+                    hits.append({
+                        "message_id": m["id"], "conversation_id": m["conversation_id"], "role": m["role"],
+                        "created_at": m["created_at"], "rank": 1.0,
+                        "snippet": m["content"][:120].replace(words[0], f"\x02{words[0]}\x03") if words else "",
+                        "user_label": conv["user_label"], "title": conv["title"],
+                    })
+                    if len(hits) >= p_limit:
+                        return hits
+        return hits
+
+    # ---------------- Aggregate views ----------------
+    def _table(self, q):
+        if self._aggregates is None:
+            self._aggregates = self.ds.aggregates()
+        rows = self._aggregates.get(q["table"])
+        if rows is None:
+            raise NotImplementedError(f"FakeSupabase has no table {q['table']!r}")
+        for column, value in q["gte"]:
+            rows = [r for r in rows if r[column] >= value]
+        for column, desc in reversed(q["order"]):
+            rows = sorted(rows, key=lambda r: r[column], reverse=desc)
+        if q["range"]:
+            start, end = q["range"]
+            rows = rows[start:end + 1]
+        return [dict(r) for r in rows]
+
+
+# ---------------- Real Postgres ----------------
+def _list_key(last_message_at, conv_id):
+    # list order key: conversations without messages sort before every dated one
+    return (last_message_at is not None, last_message_at or "", conv_id)
+
+
+def _json_value(v):
+    if isinstance(v, datetime):
+        return v.isoformat()
+    if isinstance(v, date):
+        return v.isoformat()
+    if isinstance(v, UUID):
+        return str(v)
+    if isinstance(v, Decimal):
+        return float(v)
+    if isinstance(v, list):
+        return [_json_value(x) for x in v]
+    return v
+
+
+class PostgresSupabase:
+    """Runs rpc()/table() against a psycopg connection with the migrations applied."""
+
+    def __init__(self, conn, rtt_ms: float = 0.0):
+        self.conn = conn
+        self.rtt = rtt_ms / 1000
+        self.requests = 0
+
+    def rpc(self, fn: str, params=None, *args, **kwargs):
+        self.requests += 1
+        return _Request(lambda: self._call(fn, params or {}), self.rtt)
+
+    def table(self, name: str):
+        self.requests += 1
+        return _TableQuery(self._query, name, self.rtt)
+
+    def _call(self, fn: str, params: dict):
+        args = ", ".join(f"{k} => %({k})s" for k in params)
+        cur = self.conn.execute(f"select * from public.{fn}({args})", params)
+        cols = [d.name for d in cur.description]
+        rows = [{c: _json_value(v) for c, v in zip(cols, row)} for row in cur.fetchall()]
+        if cols == [fn]:
+            # scalar function: PostgREST returns the bare value
+            return rows[0][fn] if rows else None
+        return rows
+
+    def _query(self, q):
+        sql = f"select * from public.{q['table']}"
+        params = []
+        if q["gte"]:
+            sql += " where " + " and ".join(f"{c} >= %s" for c, _ in q["gte"])
+            params += [v for _, v in q["gte"]]
+        if q["order"]:
+            sql += " order by " + ", ".join(f"{c} {'desc' if d else 'asc'}" for c, d in q["order"])
+        if q["range"]:
+            start, end = q["range"]
+            sql += f" offset {int(start)} limit {int(end - start + 1)}"
+        cur = self.conn.execute(sql, params)
+        cols = [d.name for d in cur.description]
+        return [{c: _json_value(v) for c, v in zip(cols, row)} for row in cur.fetchall()]
@@ -0,0 +1,204 @@
+import gzip
+import json
+import tempfile
+
+# ---------------- Settings ----------------
+EXPORT_PAGE_SIZE = 500
+SPOOL_MAX_BYTES = 8 * 1024 * 1024   # spill to disk above this
+COMPRESSIONS = {
+    None:   ("jsonl", "application/jsonl"),
+    "gzip": ("jsonl.gz", "application/gzip"),
+    "zstd": ("jsonl.zst", "application/zstd"),
+}
+PARQUET_MIME = "application/vnd.apache.parquet"
+PARQUET_COMPRESSION = "zstd"
+PARQUET_ROW_GROUP = 10_000
+DICTIONARY_COLUMNS = ("role", "channel")   # low-cardinality text columns
+
+
+# ---------------- Streaming ----------------
+def iter_thread(fetch_page, conv_id, page_size: int = EXPORT_PAGE_SIZE, after=None):
+    """Yield every message of a thread oldest-first, one page in memory at a time.
+
+    `fetch_page(conv_id, after, limit, after_id)` must return an oldest-first
+    page of messages after the (created_at, id) keyset (after, after_id), or
+    created after `after` when after_id is None (see
+    repository.list_messages_after). Pass `after` to start past a timestamp
+    instead of at the first message.
+    """
+    cursor, cursor_id = after, None
+    while True:
+        page = fetch_page(conv_id, after=cursor, limit=page_size, after_id=cursor_id)
+        if not page:
+            return
+        yield from page
+        if len(page) < page_size:
+            return
+        cursor, cursor_id = page[-1]["created_at"], page[-1]["id"]
+
+
+def open_writer(fileobj, compression):
+    # compressing binary writer over fileobj; close() it to flush, fileobj stays open
+    if compression is None:
+        return fileobj
+    if compression == "gzip":
+        return gzip.GzipFile(fileobj=fileobj, mode="wb")
+    if compression == "zstd":
+        try:
+            import zstandard
+        except ImportError as e:
+            raise RuntimeError("zstd export needs the 'zstandard' package (pip install zstandard)") from e
+        return zstandard.ZstdCompressor().stream_writer(fileobj, closefd=False)
+    raise ValueError(f"Unknown compression: {compression!r}")
+
+
+def write_jsonl(rows, fileobj, compression=None) -> int:
+    """Write rows as JSON lines into a binary file object; returns the row count."""
+    writer = open_writer(fileobj, compression)
+    n = 0
+    for r in rows:
+        if n:
+            writer.write(b"\n")
+        writer.write(json.dumps(r, ensure_ascii=False).encode("utf-8"))
+        n += 1
+    if writer is not fileobj:
+        writer.close()   # flush the compressor trailer; leaves fileobj open
+    return n
+
+
+def export_thread(fetch_page, conv_id, compression=None, page_size: int = EXPORT_PAGE_SIZE):
+    """Stream a whole thread into a spooled temp file, rewound and ready to read."""
+    spool = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_BYTES, mode="w+b")
+    write_jsonl(iter_thread(fetch_page, conv_id, page_size), spool, compression)
+    spool.seek(0)
+    return spool
+
+
+# ---------------- Parquet ----------------
+def messages_table(rows, meta: str = "json"):
+    """Messages as an Arrow table; pyarrow is imported on first use.
+
+    role is dictionary-encoded. meta="json" keeps meta as JSON text, so every
+    table has the same schema (archives write many files); meta="struct"
+    infers a nested struct from these rows, falling back to JSON text when
+    the shapes don't unify.
+    """
+    import pyarrow as pa
+
+    metas = [r.get("meta") for r in rows]
+    meta_col = _struct_array(metas) if meta == "struct" else None
+    if meta_col is None:
+        meta_col = _json_array(metas)
+    return pa.table({
+        "id": pa.array([r["id"] for r in rows], pa.string()),
+        "conversation_id": pa.array([r["conversation_id"] for r in rows], pa.string()),
+        "role": pa.array([r.get("role") for r in rows], pa.dictionary(pa.int8(), pa.string())),
+        "content": pa.array([r.get("content") for r in rows], pa.string()),
+        "meta": meta_col,
+        # Arrow parses the ISO strings itself, far faster than datetime.fromisoformat per row
+        "created_at": pa.array([r["created_at"] for r in rows], pa.string()).cast(pa.timestamp("us", tz="UTC")),
+    })
+
+
+def _json_array(metas):
+    import pyarrow as pa
+
+    return pa.array([json.dumps(m, ensure_ascii=False) if m is not None else None for m in metas], pa.string())
+
+
+def _struct_array(metas):
+    # None if the values don't infer to a storable struct
+    import pyarrow as pa
+
+    try:
+        arr = pa.array(metas)
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        return None   # e.g. the same key holding a number in one row and text in another
+    if pa.types.is_null(arr.type):
+        return arr    # no meta in this chunk; merges with any struct
+    if not pa.types.is_struct(arr.type) or arr.type.num_fields == 0:
+        return None   # scalars, or only empty objects: Parquet can't store an empty struct
+    return arr
+
+
+def _concat_struct_tables(tables):
+    # chunks may infer different structs; merge them, or fall back to JSON text for all
+    import pyarrow as pa
+
+    try:
+        return pa.concat_tables(tables, promote_options="permissive")
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        out = []
+        for t in tables:
+            i = t.schema.get_field_index("meta")
+            if not pa.types.is_string(t.schema.field(i).type):
+                t = t.set_column(i, "meta", _json_array(t.column(i).to_pylist()))
+            out.append(t)
+        return pa.concat_tables(out)
+
+
+def _chunks(rows, size: int):
+    chunk = []
+    for r in rows:
+        chunk.append(r)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def export_thread_parquet(fetch_page, conv_id, meta: str = "struct",
+                          compression: str = PARQUET_COMPRESSION, page_size: int = EXPORT_PAGE_SIZE):
+    """A whole thread as one Parquet file in a spooled temp file, rewound and ready to read.
+
+    With meta="json" row groups are written as pages arrive. A struct column
+    needs one type for the whole file, so meta="struct" collects the thread as
+    Arrow tables first (far smaller than the message dicts) and merges them.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    spool = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_BYTES, mode="w+b")
+    rows = iter_thread(fetch_page, conv_id, page_size)
+    tables = (messages_table(chunk, meta) for chunk in _chunks(rows, PARQUET_ROW_GROUP))
+    if meta == "struct":
+        table = _concat_struct_tables(list(tables) or [messages_table([])])
+        pq.write_table(table, spool, compression=compression, row_group_size=PARQUET_ROW_GROUP)
+    else:
+        writer = None
+        for table in tables:
+            if writer is None:
+                writer = pq.ParquetWriter(spool, table.schema, compression=compression)
+            writer.write_table(table)
+        if writer is None:
+            pq.write_table(messages_table([]), spool, compression=compression)
+        else:
+            writer.close()
+    spool.seek(0)
+    return spool
+
+
+def frame_parquet(df, compression: str = PARQUET_COMPRESSION) -> bytes:
+    """An analytics DataFrame as Parquet bytes: `day` as a date, role/channel dictionary-encoded."""
+    import io
+    import pandas as pd
+
+    df = df.copy()
+    if "day" in df.columns:
+        df["day"] = pd.to_datetime(df["day"]).dt.date
+    for col in DICTIONARY_COLUMNS:
+        if col in df.columns:
+            df[col] = df[col].astype("category")
+    buf = io.BytesIO()
+    df.to_parquet(buf, index=False, compression=compression)
+    return buf.getvalue()
+
+
+def export_filename(conv_id, compression=None, fmt: str = "jsonl") -> str:
+    ext = "parquet" if fmt == "parquet" else COMPRESSIONS[compression][0]
+    return f"conversation-{conv_id}.{ext}"
+
+
+def export_mime(compression=None, fmt: str = "jsonl") -> str:
+    return PARQUET_MIME if fmt == "parquet" else COMPRESSIONS[compression][1]
@@ -0,0 +1,70 @@
+import asyncio
+import threading
+
+# ---------------- Settings ----------------
+CHANNEL = "flabee-messages"
+WATCH_INTERVAL = 2        # seconds between feed checks in the apps
+
+
+class MessageFeed:
+    """Process-wide stream of message inserts/updates.
+
+    Sources call publish(); every hook is then run with the row (the
+    repository uses this to patch its caches in place), and the per-
+    conversation version is bumped so sessions know to rerun. A feed with no
+    source attached is the local stand-in: call publish() yourself.
+    """
+
+    def __init__(self):
+        self._versions = {}
+        self._hooks = []
+        self.error = None         # set if the realtime source died
+        self._lock = threading.Lock()
+
+    def add_hook(self, fn):
+        self._hooks.append(fn)
+
+    def publish(self, row: dict, kind: str = "INSERT"):
+        conv_id = row.get("conversation_id")
+        if conv_id is None:
+            return
+        for fn in self._hooks:
+            fn(row, kind)
+        with self._lock:
+            self._versions[conv_id] = self._versions.get(conv_id, 0) + 1
+
+    def version(self, conv_id) -> int:
+        with self._lock:
+            return self._versions.get(conv_id, 0)
+
+
+def start_supabase_listener(feed: MessageFeed, url: str, key: str) -> threading.Thread:
+    """Subscribe to INSERT/UPDATE on public.messages via Supabase Realtime in a daemon thread."""
+    def run():
+        try:
+            asyncio.run(_listen(feed, url, key))
+        except Exception as e:
+            feed.error = e
+
+    thread = threading.Thread(target=run, name="realtime-messages", daemon=True)
+    thread.start()
+    return thread
+
+
+async def _listen(feed: MessageFeed, url: str, key: str):
+    from supabase import acreate_client
+
+    client = await acreate_client(url, key)
+
+    def on_change(payload):
+        data = payload.get("data", payload)
+        row = data.get("record") or data.get("new")
+        if row:
+            feed.publish(row, data.get("type") or data.get("eventType") or "INSERT")
+
+    channel = client.channel(CHANNEL)
+    for event in ("INSERT", "UPDATE"):
+        channel.on_postgres_changes(event, schema="public", table="messages", callback=on_change)
+    await channel.subscribe()
+    while True:
+        await asyncio.sleep(3600)
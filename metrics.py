@@ -0,0 +1,297 @@
+import json
+import os
+import threading
+import time
+from collections import deque
+
+# ---------------- Settings ----------------
+HISTORY = 2000            # call records kept per process (newest last)
+RUN_HISTORY = 200         # finished reruns kept per process
+REPEAT_WARN = 5           # same call this often in one rerun -> flag a possible N+1
+LOG_PATH = os.environ.get("FLABEE_METRICS_LOG")   # append every record as JSONL when set
+PARAM_CHARS = 80          # longer strings in recorded params are cut
+PARAM_ITEMS = 10          # longer lists in recorded params are cut
+REDACTED = {"content", "p_find", "p_replace"}     # param keys holding message text; never recorded
+
+
+class Recorder:
+    """Process-wide record of Supabase calls and script reruns.
+
+    Calls made on a script thread are tagged with that thread's current run
+    (see begin_run); calls from worker threads (thread loader, listeners) are
+    recorded with run=None. Totals per call name are kept for the process
+    lifetime and exposed in Prometheus text format. Params are recorded
+    shortened, with message text redacted; response sizes are measured only
+    while logging or on a rerun begun with debug=True.
+    """
+
+    def __init__(self, log_path: str = LOG_PATH):
+        self.log_path = log_path
+        self._calls = deque(maxlen=HISTORY)
+        self._runs = deque(maxlen=RUN_HISTORY)
+        self._totals = {}         # (kind, name) -> [calls, seconds, rows, bytes, errors]
+        self._run_totals = {}     # app -> [runs, seconds]
+        self._local = threading.local()
+        self._seq = 0
+        self._lock = threading.Lock()
+
+    # ---------------- Reruns ----------------
+    def begin_run(self, app: str, debug: bool = False) -> dict:
+        with self._lock:
+            self._seq += 1
+            run = {"run": self._seq, "app": app, "started": time.time(), "_t0": time.perf_counter(),
+                   "_debug": debug}
+        self._local.run = run
+        return run
+
+    def end_run(self, run: dict) -> dict:
+        if "ms" not in run:
+            run["ms"] = (time.perf_counter() - run["_t0"]) * 1000
+            with self._lock:
+                self._runs.append(run)
+                t = self._run_totals.setdefault(run["app"], [0, 0.0])
+                t[0] += 1
+                t[1] += run["ms"] / 1000
+            self._log({"type": "run", **_public(run)})
+        return run
+
+    # ---------------- Calls ----------------
+    def record(self, name: str, params=None, rows=None, nbytes=None, ms: float = 0.0, error=None,
+               kind: str = "call"):
+        run = getattr(self._local, "run", None)
+        call = {
+            "run": run["run"] if run else None,
+            "kind": kind,
+            "name": name,
+            "params": _short(params),
+            "rows": rows,
+            "bytes": nbytes,
+            "ms": ms,
+            "error": error,
+            "at": time.time(),
+        }
+        with self._lock:
+            self._calls.append(call)
+            t = self._totals.setdefault((kind, name), [0, 0.0, 0, 0, 0])
+            t[0] += 1
+            t[1] += ms / 1000
+            t[2] += rows or 0
+            t[3] += nbytes or 0
+            t[4] += error is not None
+        self._log({"type": "call", **call})
+
+    def measuring(self) -> bool:
+        """Whether calls on this thread should be sized (serializing a response isn't free)."""
+        run = getattr(self._local, "run", None)
+        return bool(self.log_path) or bool(run and run["_debug"])
+
+    def span(self, name: str, params=None):
+        """Time a block of app code (e.g. load_data) as a call record."""
+        return _Span(self, name, params)
+
+    def calls(self, run=None) -> list:
+        with self._lock:
+            if run is None:
+                return list(self._calls)
+            return [c for c in self._calls if c["run"] == run["run"]]
+
+    def runs(self) -> list:
+        with self._lock:
+            return [_public(r) for r in self._runs]
+
+    # ---------------- Export ----------------
+    def prometheus(self) -> str:
+        with self._lock:
+            totals = {k: list(v) for k, v in self._totals.items()}
+            run_totals = {k: list(v) for k, v in self._run_totals.items()}
+        lines = []
+        metrics = [
+            ("flabee_supabase_calls_total", "Supabase calls by name.", 0),
+            ("flabee_supabase_seconds_total", "Time spent in Supabase calls.", 1),
+            ("flabee_supabase_rows_total", "Rows returned by Supabase calls.", 2),
+            ("flabee_supabase_bytes_total", "JSON payload bytes returned by sized Supabase calls.", 3),
+            ("flabee_supabase_errors_total", "Supabase calls that raised.", 4),
+        ]
+        metrics += [
+            ("flabee_span_calls_total", "Timed app code blocks by name.", 0),
+            ("flabee_span_seconds_total", "Time spent in timed app code blocks.", 1),
+        ]
+        for metric, help_text, i in metrics:
+            kind = "span" if metric.startswith("flabee_span") else "call"
+            lines += [f"# HELP {metric} {help_text}", f"# TYPE {metric} counter"]
+            lines += [f'{metric}{{name="{_label(name)}"}} {t[i]:g}'
+                      for (k, name), t in sorted(totals.items()) if k == kind]
+        for metric, help_text, i in [
+            ("flabee_script_runs_total", "Streamlit script reruns by app.", 0),
+            ("flabee_script_seconds_total", "Streamlit script time by app.", 1),
+        ]:
+            lines += [f"# HELP {metric} {help_text}", f"# TYPE {metric} counter"]
+            lines += [f'{metric}{{app="{_label(app)}"}} {t[i]:g}' for app, t in sorted(run_totals.items())]
+        return "\n".join(lines) + "\n"
+
+    def jsonl(self) -> str:
+        with self._lock:
+            calls = list(self._calls)
+        return "".join(json.dumps(c, default=str) + "\n" for c in calls)
+
+    def _log(self, entry: dict):
+        if not self.log_path:
+            return
+        line = json.dumps(entry, default=str) + "\n"
+        with self._lock, open(self.log_path, "a", encoding="utf-8") as f:
+            f.write(line)
+
+
+class _Span:
+    def __init__(self, recorder: Recorder, name: str, params):
+        self.recorder, self.name, self.params = recorder, name, params
+
+    def __enter__(self):
+        self._t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        ms = (time.perf_counter() - self._t0) * 1000
+        self.recorder.record(self.name, self.params, ms=ms, error=repr(exc) if exc else None, kind="span")
+
+
+def _public(run: dict) -> dict:
+    return {k: v for k, v in run.items() if not k.startswith("_")}
+
+
+def _label(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"')
+
+
+# ---------------- Client tracing ----------------
+def traced(client, recorder: Recorder):
+    """Wrap a Supabase client so every execute() of rpc()/table() queries is recorded."""
+    return _TracedClient(client, recorder)
+
+
+class _TracedClient:
+    def __init__(self, client, recorder: Recorder):
+        self._client = client
+        self._recorder = recorder
+
+    def rpc(self, fn: str, *args, **kwargs):
+        params = args[0] if args else kwargs.get("params")
+        return _TracedQuery(self._client.rpc(fn, *args, **kwargs), self._recorder, fn, params)
+
+    def table(self, name: str):
+        return _TracedQuery(self._client.table(name), self._recorder, f"table:{name}", None)
+
+    def __getattr__(self, attr):
+        return getattr(self._client, attr)
+
+
+class _TracedQuery:
+    # proxies a postgrest query builder through any chain of filters up to execute()
+    def __init__(self, builder, recorder: Recorder, name: str, params):
+        self._builder = builder
+        self._recorder = recorder
+        self._name = name
+        self._params = params
+
+    def __getattr__(self, attr):
+        value = getattr(self._builder, attr)
+        if not callable(value):
+            return value
+
+        def chained(*args, **kwargs):
+            out = value(*args, **kwargs)
+            if hasattr(out, "execute"):
+                params = self._params
+                if self._name.startswith("table:"):
+                    params = (params or []) + [f"{attr}{_short_args(args, kwargs)}"]
+                return _TracedQuery(out, self._recorder, self._name, params)
+            return out
+        return chained
+
+    def execute(self):
+        t0 = time.perf_counter()
+        try:
+            resp = self._builder.execute()
+        except Exception as e:
+            self._recorder.record(self._name, self._params, ms=(time.perf_counter() - t0) * 1000, error=repr(e))
+            raise
+        ms = (time.perf_counter() - t0) * 1000
+        data = resp.data
+        rows = len(data) if isinstance(data, list) else (0 if data is None else 1)
+        nbytes = None
+        if self._recorder.measuring():
+            nbytes = len(json.dumps(data, default=str))   # re-serialized size, close to the wire payload
+        self._recorder.record(self._name, self._params, rows, nbytes, ms)
+        return resp
+
+
+def _short_args(args, kwargs) -> str:
+    parts = [repr(_short(a)) for a in args] + [f"{k}={_short(v)!r}" for k, v in kwargs.items()]
+    return "(" + ", ".join(parts) + ")"
+
+
+def _short(value):
+    # params as recorded: message text redacted, long strings and lists cut,
+    # so records neither leak content into the log nor hold whole id lists
+    if isinstance(value, str):
+        return value if len(value) <= PARAM_CHARS else value[:PARAM_CHARS] + "…"
+    if isinstance(value, dict):
+        return {k: f"<{len(v)} chars>" if k in REDACTED and isinstance(v, str) else _short(v)
+                for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        items = [_short(v) for v in value[:PARAM_ITEMS]]
+        return items + [f"… {len(value)} items"] if len(value) > PARAM_ITEMS else items
+    return value
+
+
+# ---------------- Debug panel ----------------
+def debug_enabled() -> bool:
+    import streamlit as st
+    return st.query_params.get("debug") == "1" or bool(st.secrets.get("DEBUG_PANEL", False))
+
+
+def render_panel(recorder: Recorder, run: dict):
+    """Finish the rerun and, with ?debug=1 (or DEBUG_PANEL in secrets), show its cost in the sidebar."""
+    recorder.end_run(run)
+    if not debug_enabled():
+        return
+    import streamlit as st
+
+    calls = recorder.calls(run)
+    rpc = [c for c in calls if c["kind"] == "call"]
+    with st.sidebar.expander("Performance", expanded=True):
+        st.caption(
+            f"Rerun #{run['run']}: script {run['ms']:.0f} ms • {len(rpc)} Supabase calls • "
+            f"{sum(c['ms'] for c in rpc):.0f} ms • {sum(c['bytes'] or 0 for c in rpc) / 1024:.0f} KB"
+        )
+        counts = {}
+        for c in rpc:
+            counts[c["name"]] = counts.get(c["name"], 0) + 1
+        for name, n in counts.items():
+            if n >= REPEAT_WARN:
+                st.warning(f"{name} called {n}× in one rerun (N+1?)")
+        if calls:
+            st.dataframe(
+                [
+                    {
+                        "call": c["name"] if c["kind"] == "call" else f"[{c['name']}]",
+                        "params": json.dumps(c["params"], default=str)[:120] if c["params"] else "",
+                        "rows": c["rows"],
+                        "KB": round((c["bytes"] or 0) / 1024, 1),
+                        "ms": round(c["ms"], 1),
+                        "error": c["error"] or "",
+                    }
+                    for c in calls
+                ],
+                hide_index=True,
+                use_container_width=True,
+            )
+        else:
+            st.caption("No Supabase calls this rerun (all cached).")
+        d1, d2 = st.columns(2)
+        with d1:
+            st.download_button("metrics.prom", recorder.prometheus(), "metrics.prom", "text/plain",
+                               use_container_width=True)
+        with d2:
+            st.download_button("calls.jsonl", recorder.jsonl(), "calls.jsonl", "application/jsonl",
+                               use_container_width=True)
@@ -0,0 +1,110 @@
+import threading
+from collections import deque
+
+# ---------------- Settings ----------------
+WORKERS = 2               # background reads at a time, for every session together
+QUEUE_MAX = 64            # queued jobs kept; the oldest are dropped beyond this
+
+
+class Cancelled(Exception):
+    """Raised by check() inside a job whose owner has scheduled newer work."""
+
+
+class Prefetcher:
+    """Runs speculative reads on a few background threads.
+
+    Each owner (a browser session) has at most one batch of jobs: schedule()
+    replaces the owner's queued jobs, and jobs of the old batch already
+    running stop at their next check(). Jobs are plain callables, run in
+    order; what they read is kept by the caller (see repository.PageCache's
+    prefetch tier), so this class only schedules, cancels and counts. An
+    owner is forgotten once none of its jobs is queued or running.
+    """
+
+    def __init__(self, workers: int = WORKERS, queue_max: int = QUEUE_MAX):
+        self.queue_max = queue_max
+        self.scheduled = 0
+        self.completed = 0
+        self.cancelled = 0
+        self.errors = 0
+        self.last_error = None
+        self._queue = deque()           # (owner, generation, job)
+        self._generations = {}          # owner -> generation of its current batch
+        self._pending = {}              # owner -> its jobs queued or running, any batch
+        self._local = threading.local()
+        self._cond = threading.Condition()
+        for i in range(workers):
+            threading.Thread(target=self._run, name=f"prefetch-{i}", daemon=True).start()
+
+    def schedule(self, owner, jobs):
+        with self._cond:
+            generation = self._generations.get(owner, 0) + 1
+            self._generations[owner] = generation
+            kept = deque(item for item in self._queue if item[0] != owner)
+            dropped = len(self._queue) - len(kept)
+            self.cancelled += dropped
+            self._pending[owner] = self._pending.get(owner, 0) + len(jobs)
+            kept.extend((owner, generation, job) for job in jobs)
+            while len(kept) > self.queue_max:
+                self._release(kept.popleft()[0])
+                self.cancelled += 1
+            self._queue = kept
+            self.scheduled += len(jobs)
+            self._release(owner, dropped)
+            self._cond.notify_all()
+
+    def cancel(self, owner):
+        self.schedule(owner, [])
+
+    def active(self) -> bool:
+        """True on a prefetch thread while it runs a job."""
+        return getattr(self._local, "job", None) is not None
+
+    def check(self):
+        # called by jobs between reads; stops work nobody is going to look at
+        owner, generation = self._local.job
+        with self._cond:
+            if self._generations.get(owner) != generation:
+                raise Cancelled()
+
+    def stats(self) -> dict:
+        with self._cond:
+            return {
+                "scheduled": self.scheduled, "completed": self.completed, "cancelled": self.cancelled,
+                "errors": self.errors, "queued": len(self._queue), "last_error": self.last_error,
+            }
+
+    def _release(self, owner, n: int = 1):
+        # n of the owner's jobs left the queue for good; with none left, forget
+        # the owner (its next batch starts over, as no old job can still check)
+        left = self._pending.get(owner, 0) - n
+        if left > 0:
+            self._pending[owner] = left
+        else:
+            self._pending.pop(owner, None)
+            self._generations.pop(owner, None)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._queue:
+                    self._cond.wait()
+                owner, generation, job = self._queue.popleft()
+            self._local.job = (owner, generation)
+            error = None
+            try:
+                self.check()
+                job()
+            except Exception as e:   # Cancelled included
+                error = e
+            finally:
+                self._local.job = None
+            with self._cond:
+                self._release(owner)
+                if error is None:
+                    self.completed += 1
+                elif isinstance(error, Cancelled):
+                    self.cancelled += 1
+                else:
+                    self.errors += 1
+                    self.last_error = f"{type(error).__name__}: {error}"
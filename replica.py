@@ -0,0 +1,344 @@
+"""Local SQLite replica of conversations and messages for read-heavy viewing.
+
+    python replica.py --db replica.sqlite3 [--interval 60] [--full]
+
+sync() pulls the rows changed since the last watermark through the
+replica_conversations / replica_messages RPCs, in (updated_at, id) pages,
+and upserts them. Each sync re-reads SYNC_OVERLAP behind the watermark, so
+rows whose transaction committed after a later row was already seen are
+still picked up. Deletions are not mirrored; --full rebuilds the file.
+
+ReplicaClient answers the viewer's read RPCs from the file, in the same
+shapes PostgREST returns, and passes every other call (search, stats,
+writes) to the live client. Credentials for the CLI come from
+.streamlit/secrets.toml, as for `streamlit run`.
+"""
+import argparse
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+# ---------------- Settings ----------------
+SYNC_PAGE = 1000
+SYNC_INTERVAL = 60        # seconds between background syncs
+SYNC_OVERLAP = timedelta(seconds=30)   # margin for clock skew between database sessions
+ZERO_UUID = "00000000-0000-0000-0000-000000000000"
+
+SCHEMA = """
+create table if not exists conversations (
+  conversation_id text primary key,
+  user_label text,
+  title text,
+  status text,
+  tags text,
+  last_channel text,
+  last_message text,
+  last_message_at text,
+  msg_count integer,
+  updated_at text
+);
+create index if not exists conversations_last_message_at_idx
+  on conversations (last_message_at desc, conversation_id desc);
+create index if not exists conversations_channel_idx
+  on conversations (coalesce(last_channel, 'unknown'), last_message_at desc, conversation_id desc);
+
+create table if not exists messages (
+  id text primary key,
+  conversation_id text not null,
+  role text,
+  content text,
+  meta text,
+  created_at text not null,
+  updated_at text
+);
+create index if not exists messages_conversation_created_idx
+  on messages (conversation_id, created_at);
+
+create table if not exists sync_state (
+  name text primary key,
+  value text
+);
+"""
+CONVERSATION_COLUMNS = ("conversation_id", "user_label", "title", "status", "tags", "last_channel",
+                        "last_message", "last_message_at", "msg_count")
+MESSAGE_COLUMNS = ("id", "conversation_id", "role", "content", "meta", "created_at")
+
+
+def _ts(value):
+    # one fixed-width UTC form, so timestamps compare correctly as text
+    if value is None:
+        return None
+    dt = datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return dt.astimezone(timezone.utc).isoformat(timespec="microseconds")
+
+
+def _json(value):
+    return None if value is None else json.dumps(value, ensure_ascii=False)
+
+
+# ---------------- Replica ----------------
+class Replica:
+    """The replica file; safe to share between threads (one connection per thread)."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        self._write_lock = threading.Lock()
+        self._conn().executescript(SCHEMA)
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("pragma journal_mode=wal")   # readers never wait for the syncer
+            conn.execute("pragma synchronous=normal")
+            conn.row_factory = sqlite3.Row
+            self._local.conn = conn
+        return conn
+
+    # ---------------- Sync state ----------------
+    def _state(self, name: str):
+        row = self._conn().execute("select value from sync_state where name = ?", (name,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def _set_state(self, conn, name: str, value):
+        conn.execute("insert into sync_state (name, value) values (?, ?) "
+                     "on conflict (name) do update set value = excluded.value", (name, json.dumps(value)))
+
+    def freshness(self) -> dict:
+        """{"synced_at": iso or None, "age_s": seconds since the last good sync, "error": last error}."""
+        synced_at, error = self._state("synced_at"), self._state("error")
+        age = None
+        if synced_at:
+            age = (datetime.now(timezone.utc) - datetime.fromisoformat(synced_at)).total_seconds()
+        return {"synced_at": synced_at, "age_s": age, "error": error}
+
+    # ---------------- Sync ----------------
+    def sync(self, client, page: int = SYNC_PAGE) -> int:
+        """Pull every change since the watermarks; returns the number of rows upserted."""
+        try:
+            n = self._pull(client, "replica_conversations", "conversations", self.upsert_conversations, page)
+            n += self._pull(client, "replica_messages", "messages", self.upsert_messages, page)
+        except Exception as e:
+            with self._write_lock, self._conn() as conn:
+                self._set_state(conn, "error", f"{type(e).__name__}: {e}")
+            raise
+        with self._write_lock, self._conn() as conn:
+            self._set_state(conn, "synced_at", datetime.now(timezone.utc).isoformat())
+            self._set_state(conn, "error", None)
+        return n
+
+    def _pull(self, client, rpc: str, table: str, upsert, page: int) -> int:
+        mark = self._state(f"watermark:{table}")
+        since = _ts(datetime.fromisoformat(mark) - SYNC_OVERLAP) if mark else None
+        # rows of transactions still in flight will commit stamped at or after
+        # the horizon, so the stored watermark never goes past it
+        horizon = _ts(client.rpc("replica_horizon").execute().data)
+        after_id, n = None, 0
+        while True:
+            rows = client.rpc(rpc, {"p_since": since, "p_after_id": after_id, "p_limit": page}).execute().data or []
+            if not rows:
+                return n
+            last = rows[-1]
+            since, after_id = last["updated_at"], last["id" if table == "messages" else "conversation_id"]
+            # rows and watermark commit together, so an interrupted sync resumes from here
+            upsert(rows, watermark=(table, min(_ts(since), horizon)))
+            n += len(rows)
+            if len(rows) < page:
+                return n
+
+    def upsert_conversations(self, rows, watermark=None):
+        data = [(r["conversation_id"], r.get("user_label"), r.get("title"), r.get("status"), _json(r.get("tags")),
+                 r.get("last_channel"), r.get("last_message"), _ts(r.get("last_message_at")),
+                 r.get("msg_count"), _ts(r.get("updated_at"))) for r in rows]
+        with self._write_lock, self._conn() as conn:
+            conn.executemany(
+                "insert or replace into conversations (conversation_id, user_label, title, status, tags, "
+                "last_channel, last_message, last_message_at, msg_count, updated_at) "
+                "values (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", data)
+            if watermark:
+                self._set_state(conn, f"watermark:{watermark[0]}", watermark[1])
+
+    def upsert_messages(self, rows, watermark=None):
+        data = [(r["id"], r["conversation_id"], r.get("role"), r.get("content"), _json(r.get("meta")),
+                 _ts(r["created_at"]), _ts(r.get("updated_at"))) for r in rows]
+        with self._write_lock, self._conn() as conn:
+            conn.executemany(
+                "insert or replace into messages (id, conversation_id, role, content, meta, created_at, updated_at) "
+                "values (?, ?, ?, ?, ?, ?, ?)", data)
+            if watermark:
+                self._set_state(conn, f"watermark:{watermark[0]}", watermark[1])
+
+    # ---------------- Reads (same arguments and row shapes as the RPCs) ----------------
+    def _conversations(self, where: str, params: list, tail: str = "") -> list:
+        sql = f"select {', '.join(CONVERSATION_COLUMNS)} from conversations where {where} {tail}"
+        rows = []
+        for r in self._conn().execute(sql, params):
+            row = dict(r)
+            row["tags"] = json.loads(row["tags"]) if row["tags"] else []
+            rows.append(row)
+        return rows
+
+    def _messages(self, sql: str, params: list) -> list:
+        rows = []
+        for r in self._conn().execute(f"select {', '.join(MESSAGE_COLUMNS)} from messages m {sql}", params):
+            row = dict(r)
+            row["meta"] = json.loads(row["meta"]) if row["meta"] else None
+            rows.append(row)
+        return rows
+
+    def rpc_list_conversations(self, p_search=None, p_limit=30, p_channel=None, p_from=None, p_to=None,
+                               p_after_at=None, p_after_id=None):
+        where, params = ["1"], []
+        if p_search:
+            where.append("(lower(user_label) like ? or lower(last_message) like ?)")
+            params += [f"%{p_search.lower()}%"] * 2
+        if p_channel:
+            where.append("coalesce(last_channel, 'unknown') = ?")
+            params.append(p_channel)
+        if p_from:
+            where.append("last_message_at >= ?")
+            params.append(_ts(p_from))
+        if p_to:
+            where.append("last_message_at < ?")
+            params.append(_ts(p_to))
+        # conversations without messages come last (see list_conversations)
+        if p_after_at:
+            where.append("((last_message_at, conversation_id) < (?, ?) or last_message_at is null)")
+            params += [_ts(p_after_at), p_after_id]
+        elif p_after_id:
+            where.append("last_message_at is null and conversation_id < ?")
+            params.append(p_after_id)
+        params.append(max(p_limit, 1))
+        return self._conversations(" and ".join(where), params,
+                                   "order by last_message_at desc nulls last, conversation_id desc limit ?")
+
+    def rpc_list_conversation_channels(self):
+        rows = self._conn().execute(
+            "select distinct coalesce(last_channel, 'unknown') as channel from conversations order by 1")
+        return [dict(r) for r in rows]
+
+    def rpc_get_conversation(self, p_conversation_id):
+        return self._conversations("conversation_id = ?", [p_conversation_id])
+
+    def rpc_list_messages(self, p_conversation_id, p_before=None, p_limit=50, p_before_id=None):
+        if p_before is not None and p_before_id is not None:
+            before, params = "(created_at, id) < (?, ?)", [_ts(p_before), p_before_id]
+        else:
+            before, params = "(? is null or created_at < ?)", [_ts(p_before), _ts(p_before)]
+        return self._messages(
+            f"where conversation_id = ? and {before} order by created_at desc, id desc limit ?",
+            [p_conversation_id, *params, max(p_limit, 1)])
+
+    def rpc_list_messages_after(self, p_conversation_id, p_after=None, p_limit=500, p_until=None, p_after_id=None):
+        if p_after is not None and p_after_id is not None:
+            after, params = "(created_at, id) > (?, ?)", [_ts(p_after), p_after_id]
+        else:
+            after, params = "(? is null or created_at > ?)", [_ts(p_after), _ts(p_after)]
+        return self._messages(
+            f"where conversation_id = ? and {after} and (? is null or created_at <= ?) "
+            "order by created_at, id limit ?",
+            [p_conversation_id, *params, _ts(p_until), _ts(p_until), max(p_limit, 1)])
+
+    def rpc_list_messages_around(self, p_conversation_id, p_at=None, p_message_id=None, p_before=25, p_after=25,
+                                 p_after_anchor=False):
+        at = _ts(p_at)
+        if at is None:
+            row = self._conn().execute("select created_at from messages where id = ? and conversation_id = ?",
+                                       (p_message_id, p_conversation_id)).fetchone()
+            if row is None:
+                return []
+            at = row[0]
+        # split at the (created_at, id) keyset of p_message_id when given (see list_messages_around)
+        if p_message_id is None:
+            key, params = "created_at", [at]
+        else:
+            key, params = "(created_at, id)", [at, p_message_id]
+        marks = "?" if p_message_id is None else "(?, ?)"
+        newer_op = ">" if p_after_anchor and p_message_id is not None else ">="
+        older = self._messages(
+            f"where conversation_id = ? and {key} < {marks} order by created_at desc, id desc limit ?",
+            [p_conversation_id, *params, max(p_before, 0)])
+        newer = self._messages(
+            f"where conversation_id = ? and {key} {newer_op} {marks} order by created_at, id limit ?",
+            [p_conversation_id, *params, max(p_after, 0)])
+        return older[::-1] + newer
+
+
+# ---------------- Client ----------------
+class _Response:
+    def __init__(self, data):
+        self.data = data
+
+
+class _LocalRequest:
+    def __init__(self, run):
+        self._run = run
+
+    def execute(self):
+        return _Response(self._run())
+
+
+class ReplicaClient:
+    """Supabase-client lookalike: replica-backed RPCs locally, everything else live."""
+
+    def __init__(self, replica: Replica, live):
+        self.replica = replica
+        self.live = live
+
+    def rpc(self, fn: str, params=None, *args, **kwargs):
+        handler = getattr(self.replica, "rpc_" + fn, None)
+        if handler is None:
+            return self.live.rpc(fn, params, *args, **kwargs)
+        return _LocalRequest(lambda: handler(**(params or {})))
+
+    def table(self, name: str):
+        return self.live.table(name)
+
+
+def start_sync(replica: Replica, client, interval: float = SYNC_INTERVAL) -> threading.Thread:
+    """Sync now and then every `interval` seconds on a daemon thread; failures are kept in freshness()."""
+    def loop():
+        while True:
+            try:
+                replica.sync(client)
+            except Exception:
+                pass   # recorded by sync(); the replica keeps serving what it has
+            time.sleep(interval)
+
+    thread = threading.Thread(target=loop, name="replica-sync", daemon=True)
+    thread.start()
+    return thread
+
+
+# ---------------- CLI ----------------
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Mirror conversations and messages into a local SQLite replica.")
+    ap.add_argument("--db", required=True, help="replica file")
+    ap.add_argument("--interval", type=float, default=0, help="keep syncing every N seconds (default: once)")
+    ap.add_argument("--full", action="store_true", help="rebuild from scratch (picks up deletions)")
+    args = ap.parse_args(argv)
+
+    import repository as repo   # streamlit is only needed for the credentials and the client
+    if args.full:
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(args.db + suffix):
+                os.remove(args.db + suffix)
+    replica = Replica(args.db)
+    while True:
+        t0 = time.perf_counter()
+        n = replica.sync(repo.get_client())
+        print(f"Synced {n} rows into {args.db} in {time.perf_counter() - t0:.1f}s", file=sys.stderr)
+        if not args.interval:
+            return
+        time.sleep(args.interval)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,679 @@
+import json
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+
+import streamlit as st
+
+import live
+import metrics
+import replica as replica_db
+import write_queue as writes
+from prefetch import Prefetcher
+from thread_cache import ThreadCache
+
+# ---------------- Client ----------------
+def create_client(url: str, key: str):
+    # supabase (httpx, postgrest, realtime...) is the slowest import here; pay it
+    # on the first get_client() call instead of when the module is imported
+    from supabase import create_client as _create_client
+    return _create_client(url, key)
+
+
+@st.cache_resource
+def metrics_recorder():
+    # Supabase call timings and rerun costs, shared by every session
+    return metrics.Recorder()
+
+
+@st.cache_resource
+def get_client():
+    # one client (and its HTTP connection pool) per server process; every call is timed
+    client = create_client(st.secrets["SUPABASE_URL"], st.secrets["SUPABASE_SERVICE_KEY"])
+    return metrics.traced(client, metrics_recorder())
+
+
+# ---------------- Local replica ----------------
+_reads = threading.local()
+
+
+@st.cache_resource
+def replica():
+    # optional SQLite mirror (REPLICA_PATH), kept fresh by a background sync; None when not configured
+    path = st.secrets.get("REPLICA_PATH")
+    if not path:
+        return None
+    db = replica_db.Replica(path)
+    interval = st.secrets.get("REPLICA_SYNC_SECONDS", replica_db.SYNC_INTERVAL)
+    if interval:
+        replica_db.start_sync(db, get_client(), interval)
+    return db
+
+
+def use_replica(enabled: bool = True):
+    """Serve this script run's reads from the local replica, if one is configured.
+
+    Called at the top of every run (like metrics_recorder().begin_run); other
+    threads and apps that don't opt in keep reading live.
+    """
+    _reads.replica = replica() if enabled else None
+
+
+def _reading_replica() -> bool:
+    return getattr(_reads, "replica", None) is not None
+
+
+def _reader():
+    # client for read RPCs; the replica passes what it doesn't hold (search, stats) to the live client
+    if _reading_replica():
+        return replica_db.ReplicaClient(_reads.replica, get_client())
+    return get_client()
+
+
+def replica_freshness():
+    """replica.Replica.freshness() for this run's replica, or None when reading live."""
+    return _reads.replica.freshness() if _reading_replica() else None
+
+
+# ---------------- Page cache ----------------
+_MISS = object()
+
+
+class PageCache:
+    """Thread-safe TTL + LRU cache for RPC result pages.
+
+    Pages read ahead of need (put_ahead) wait in a separate byte-bounded tier
+    and only join the LRU when a get() asks for them, so speculative reads
+    can't push out pages that were actually viewed. invalidate() and update()
+    apply to both tiers.
+    """
+
+    def __init__(self, maxsize: int = 256, ttl: float = 60.0, ahead_bytes: int = 0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.ahead_bytes = ahead_bytes
+        self.hits = 0
+        self.misses = 0
+        self.prefetched = 0       # pages put ahead
+        self.prefetch_hits = 0    # ...later asked for
+        self.prefetch_wasted = 0  # ...dropped unread (expired, evicted or invalidated)
+        self._data = OrderedDict()
+        self._ahead = OrderedDict()   # key -> (expires, value, size)
+        self._ahead_size = 0
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None or item[0] < time.monotonic():
+                self._data.pop(key, None)
+                ahead = self._pop_ahead(key)
+                if ahead is not None and ahead[0] >= time.monotonic():
+                    self._insert(key, ahead[:2])
+                    self.hits += 1
+                    self.prefetch_hits += 1
+                    return ahead[1]
+                if ahead is not None:
+                    self.prefetch_wasted += 1
+                self.misses += 1
+                return _MISS
+            self._data.move_to_end(key)
+            self.hits += 1
+            return item[1]
+
+    def peek(self, key):
+        # value from either tier without touching LRU order or stats
+        with self._lock:
+            item = self._data.get(key) or self._ahead.get(key)
+            if item is None or item[0] < time.monotonic():
+                return _MISS
+            return item[1]
+
+    def put(self, key, value):
+        with self._lock:
+            self._insert(key, (time.monotonic() + self.ttl, value))
+
+    def put_ahead(self, key, value):
+        size = _value_bytes(value)
+        with self._lock:
+            if key in self._data or size > self.ahead_bytes:
+                return
+            self._pop_ahead(key)
+            self._ahead[key] = (time.monotonic() + self.ttl, value, size)
+            self._ahead_size += size
+            self.prefetched += 1
+            while self._ahead_size > self.ahead_bytes:
+                self._pop_ahead(next(iter(self._ahead)))
+                self.prefetch_wasted += 1
+
+    def invalidate(self, predicate=None):
+        # drop every key (predicate=None) or only the keys matching predicate(key)
+        with self._lock:
+            for key in [k for k in self._ahead if predicate is None or predicate(k)]:
+                self._pop_ahead(key)
+                self.prefetch_wasted += 1
+            if predicate is None:
+                self._data.clear()
+                return
+            for key in [k for k in self._data if predicate(k)]:
+                del self._data[key]
+
+    def update(self, predicate, fn):
+        # replace the value of every live key matching predicate(key) with fn(key, value)
+        with self._lock:
+            for key, (expires, value) in list(self._data.items()):
+                if predicate(key):
+                    self._data[key] = (expires, fn(key, value))
+            for key, (expires, value, size) in list(self._ahead.items()):
+                if predicate(key):
+                    self._ahead[key] = (expires, fn(key, value), size)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "entries": len(self._data), "hits": self.hits, "misses": self.misses,
+                "ahead": len(self._ahead), "ahead_bytes": self._ahead_size, "prefetched": self.prefetched,
+                "prefetch_hits": self.prefetch_hits, "prefetch_wasted": self.prefetch_wasted,
+            }
+
+    def _insert(self, key, item):
+        self._data[key] = item
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def _pop_ahead(self, key):
+        item = self._ahead.pop(key, None)
+        if item is not None:
+            self._ahead_size -= item[2]
+        return item
+
+
+def _value_bytes(value) -> int:
+    # rough in-memory size of an RPC result: Python objects take ~3x their JSON
+    return len(json.dumps(value, default=str)) * 3
+
+
+@st.cache_resource
+def _caches():
+    # ahead_bytes caps the pages prefetch() may hold unread
+    return {
+        "conversations": PageCache(maxsize=256, ttl=60, ahead_bytes=8 * 1024 * 1024),
+        "messages": PageCache(maxsize=512, ttl=60, ahead_bytes=32 * 1024 * 1024),
+        "search": PageCache(maxsize=128, ttl=60),
+    }
+
+
+@st.cache_resource
+def thread_cache():
+    # fully loaded threads for the admin editor, shared by every session
+    return ThreadCache()
+
+
+@st.cache_resource
+def message_feed():
+    # realtime inserts/updates patch every cache in place instead of forcing refetches
+    feed = live.MessageFeed()
+    pages, threads = _caches()["messages"], thread_cache()
+
+    def apply(row, kind):
+        conv_id = row["conversation_id"]
+        pages.update(lambda key: key[0] == conv_id, lambda key, page: _patch_page(key, page, row))
+        threads.apply(conv_id, row)
+
+    feed.add_hook(apply)
+    db = replica()
+    if db is not None:
+        # realtime rows land in the replica right away instead of at the next sync
+        feed.add_hook(lambda row, kind: db.upsert_messages([row]))
+    if st.secrets.get("REALTIME_ENABLED", True):
+        live.start_supabase_listener(feed, st.secrets["SUPABASE_URL"], st.secrets["SUPABASE_SERVICE_KEY"])
+    return feed
+
+
+def _patch_page(key, page, row):
+    # newest pages (before=None, newest-first) take new messages; other pages
+    # and windows only take in-place updates
+    _, before, limit = key
+    for i, m in enumerate(page):
+        if m["id"] == row["id"]:
+            return page[:i] + [row] + page[i + 1:]
+    if before is None and (not page or _parse_ts(row["created_at"]) >= _parse_ts(page[0]["created_at"])):
+        return ([row] + page)[:limit]
+    return page
+
+
+def _parse_ts(ts) -> datetime:
+    # rows from live events and RPCs may differ in offset and precision
+    # ("...+00:00" vs "...Z", 3 vs 6 fractional digits), so compare instants
+    dt = datetime.fromisoformat(str(ts).replace("Z", "+00:00"))
+    return dt if dt.tzinfo else dt.replace(tzinfo=timezone.utc)
+
+
+def page_cache_stats() -> dict:
+    return {name: cache.stats() for name, cache in _caches().items()}
+
+
+def _cached(cache_name: str, key, fetch, replicated: bool = True):
+    if replicated and _reading_replica():
+        return fetch()   # local reads take milliseconds; caching would only add staleness
+    cache = _caches()[cache_name]
+    ahead = prefetcher()
+    if ahead.active():
+        # reading ahead: leave cached pages alone, park new ones in the prefetch tier
+        ahead.check()
+        value = cache.peek(key)
+        if value is _MISS:
+            value = fetch()
+            cache.put_ahead(key, value)
+        return value
+    value = cache.get(key)
+    if value is _MISS:
+        value = fetch()
+        cache.put(key, value)
+    return value
+
+
+# ---------------- Prefetch ----------------
+@st.cache_resource
+def prefetcher():
+    # background read-ahead threads shared by every session
+    return Prefetcher()
+
+
+def prefetch(search, limit: int, cursors: list, conv_ids: list, message_limit: int, **filters):
+    """Read ahead, in the background, what the next click most likely needs.
+
+    conv_ids: threads whose newest page of message_limit messages to load
+    (list_messages); cursors: `after` cursors of the conversation pages to
+    load (list_conversations with search / limit / filters), with their
+    stats. Results wait in the page caches' prefetch tier. Each call cancels
+    the session's previous read-ahead; nothing is read ahead from the replica.
+    """
+    from streamlit.runtime.scriptrunner import get_script_run_ctx
+    ctx = get_script_run_ctx()
+    if ctx is None or _reading_replica():
+        return
+
+    def thread_job(conv_id):
+        return lambda: list_messages(conv_id, before=None, limit=message_limit)
+
+    def page_job(cursor):
+        def job():
+            rows, _ = list_conversations(search, limit, after=cursor, **filters)
+            conversation_stats(r["conversation_id"] for r in rows)
+        return job
+
+    prefetcher().schedule(ctx.session_id, [thread_job(c) for c in conv_ids] + [page_job(c) for c in cursors])
+
+
+def prefetch_stats() -> dict:
+    """Read-ahead totals: jobs run / cancelled, and prefetched pages used vs wasted."""
+    stats = prefetcher().stats()
+    pages = [c.stats() for c in _caches().values() if c.ahead_bytes]
+    stats.update({k: sum(p[k] for p in pages) for k in ("prefetched", "prefetch_hits", "prefetch_wasted", "ahead_bytes")})
+    misses = sum(p["misses"] for p in pages)
+    stats["hit_rate"] = stats["prefetch_hits"] / (stats["prefetch_hits"] + misses) if stats["prefetch_hits"] + misses else 0.0
+    return stats
+
+
+# ---------------- Reads ----------------
+def list_conversations(search: str, limit: int, after=None,
+                       channel=None, date_from=None, date_to=None):
+    """Return (rows, next_cursor) for one keyset page of conversations.
+
+    `after` is the cursor of the previous page: a (last_message_at,
+    conversation_id) tuple, or None for the first page. Conversations without
+    messages come last, with last_message_at None in their cursor. next_cursor
+    is None once the listing reaches the end.
+    channel: exact last_channel ('unknown' = none); date_from/date_to: inclusive dates.
+    """
+    search = search or None
+    p_from, p_to = _date_params(date_from, date_to)
+    after_at, after_id = after or (None, None)
+
+    def fetch():
+        # one extra row tells us whether there is a next page
+        rows = _reader().rpc(
+            "list_conversations",
+            {
+                "p_search": search, "p_limit": limit + 1,
+                "p_channel": channel, "p_from": p_from, "p_to": p_to,
+                "p_after_at": after_at, "p_after_id": after_id,
+            },
+        ).execute().data or []
+        rows, more = rows[:limit], len(rows) > limit
+        next_cursor = conversation_cursor(rows[-1]) if more else None
+        return rows, next_cursor
+
+    rows, next_cursor = _cached("conversations", (search, limit, after, channel, p_from, p_to), fetch)
+    return _with_pending_conversations(rows), next_cursor
+
+
+def _date_params(date_from, date_to):
+    # inclusive dates -> half-open [p_from, p_to) timestamps
+    p_from = date_from.isoformat() if date_from else None
+    p_to = (date_to + timedelta(days=1)).isoformat() if date_to else None
+    return p_from, p_to
+
+
+def conversation_cursor(row):
+    return (row["last_message_at"], row["conversation_id"])
+
+
+def list_channels():
+    def fetch():
+        rows = _reader().rpc("list_conversation_channels", {}).execute().data or []
+        return [r["channel"] for r in rows]
+
+    return _cached("conversations", ("channels",), fetch)
+
+
+def get_conversation(conv_id):
+    def fetch():
+        rows = _reader().rpc("get_conversation", {"p_conversation_id": conv_id}).execute().data or []
+        return rows[0] if rows else None
+
+    row = _cached("conversations", ("conversation", conv_id), fetch)
+    return _with_pending_conversations([row])[0] if row else row
+
+
+def conversation_stats(conv_ids) -> dict:
+    """conversation_id -> derived stats row for a page of conversations, in one call.
+
+    Rows come from the trigger-maintained conversation_stats table: role
+    counts, first/median/avg response ms, chars, tokens, avg model latency.
+    `stale` rows are awaiting the batch refresh; the median of other rows
+    lags new responses until the slower median refresh.
+    """
+    ids = tuple(conv_ids)
+    if not ids:
+        return {}
+
+    def fetch():
+        rows = _reader().rpc("get_conversation_stats", {"p_conversation_ids": list(ids)}).execute().data or []
+        return {r["conversation_id"]: r for r in rows}
+
+    return _cached("conversations", ("stats", ids), fetch, replicated=False)
+
+
+def search_messages(query: str, limit: int = 20, after=None):
+    """Return (hits, next_cursor) for one page of ranked full-text message hits.
+
+    `after` is the (rank, message_id) cursor of the previous page. Snippets
+    mark matches with \x02 ... \x03 (see transcript.snippet_html).
+    """
+    after_rank, after_id = after or (None, None)
+
+    def fetch():
+        rows = _reader().rpc(
+            "search_messages",
+            {"p_query": query, "p_limit": limit + 1, "p_after_rank": after_rank, "p_after_id": after_id},
+        ).execute().data or []
+        rows, more = rows[:limit], len(rows) > limit
+        next_cursor = (rows[-1]["rank"], rows[-1]["message_id"]) if more else None
+        return rows, next_cursor
+
+    return _cached("search", (query, limit, after), fetch, replicated=False)
+
+
+def list_messages(conv_id, before=None, limit=100):
+    # newest-first page of messages older than `before`: a timestamp, or the
+    # (created_at, id) keyset of the oldest row already read, so messages
+    # sharing a timestamp across a page boundary are not skipped
+    before_at, before_id = before if isinstance(before, tuple) else (before, None)
+
+    def fetch():
+        return _reader().rpc(
+            "list_messages",
+            {"p_conversation_id": conv_id, "p_before": before_at, "p_limit": limit, "p_before_id": before_id},
+        ).execute().data or []
+
+    return _with_pending_messages(conv_id, _cached("messages", (conv_id, before, limit), fetch))
+
+
+PAGE_WORKERS = 8          # list_messages pages of different threads read at once
+
+
+@st.cache_resource
+def page_readers():
+    # shared by every session; bounds the concurrent page reads of the whole process
+    return ThreadPoolExecutor(max_workers=PAGE_WORKERS, thread_name_prefix="page-reader")
+
+
+def list_messages_pages(pages: list) -> list:
+    """list_messages for several (conv_id, before, limit) at once, in request order.
+
+    Pages of different threads are read concurrently; cached pages cost no
+    round trip, and reads from the local replica stay on this thread.
+    """
+    if len(pages) < 2 or _reading_replica():
+        return [list_messages(conv_id, before=before, limit=limit) for conv_id, before, limit in pages]
+    return list(page_readers().map(lambda p: list_messages(p[0], before=p[1], limit=p[2]), pages))
+
+
+def list_messages_window(conv_id, at=None, message_id=None, n_before: int = 25, n_after: int = 25,
+                         after_anchor: bool = False):
+    # oldest-first window of messages around a timestamp, a message id, or the
+    # (at, message_id) keyset of a message; after_anchor leaves that message out
+    def fetch():
+        return _reader().rpc(
+            "list_messages_around",
+            {
+                "p_conversation_id": conv_id, "p_at": at, "p_message_id": message_id,
+                "p_before": n_before, "p_after": n_after, "p_after_anchor": after_anchor,
+            },
+        ).execute().data or []
+
+    window = ("around", at, message_id, n_before, n_after, after_anchor)
+    return _with_pending_messages(conv_id, _cached("messages", (conv_id, window, n_before + n_after), fetch))
+
+
+def list_messages_after(conv_id, after=None, limit=500, until=None, after_id=None):
+    # oldest-first page of messages in (after, until]; uncached, used for bulk streaming.
+    # With after_id, `after` is the (created_at, id) keyset of the last row already read.
+    rows = _reader().rpc(
+        "list_messages_after",
+        {"p_conversation_id": conv_id, "p_after": after, "p_limit": limit, "p_until": until,
+         "p_after_id": after_id},
+    ).execute().data or []
+    return _with_pending_messages(conv_id, rows)
+
+
+# ---------------- Writes (admin) ----------------
+def invalidate_conversations():
+    _caches()["conversations"].invalidate()
+
+
+def invalidate_messages(conv_id):
+    _caches()["messages"].invalidate(lambda key: key[0] == conv_id)
+
+
+# ---------------- Queued writes (admin) ----------------
+# Edits are applied to every cache at once and sent by a background queue:
+# repeated edits of one record within the debounce window collapse into one
+# write, and due writes go out in batches (update_conversations /
+# update_messages). Until a write lands, reads overlay the queued values so a
+# refetch can't briefly show the old ones.
+# Writes still queued when the process exits (or the resource is cleared) are
+# flushed, and what can't be sent is kept in WRITE_QUEUE_JOURNAL, if set, for
+# the next start. An update that matches no row is reported as failed.
+@st.cache_resource(on_release=lambda queue: queue.close())
+def write_queue():
+    client, caches = get_client(), _caches()
+
+    def send(kind, items):
+        if kind == "message":
+            updates = [{"id": key[1], "content": value["content"]} for key, value in items]
+            updated = client.rpc("update_messages", {"p_updates": updates}).execute().data
+            caches["search"].invalidate()
+        else:
+            # one element per conversation, with every field queued for it
+            merged = {}
+            for (_, conv_id, field), value in items:
+                merged.setdefault(conv_id, {"id": conv_id})[field] = value
+            updates = list(merged.values())
+            updated = client.rpc("update_conversations", {"p_updates": updates}).execute().data
+        # list pages show status, tags and the last message
+        caches["conversations"].invalidate()
+        if updated < len(updates):
+            raise writes.Rejected(f"{len(updates) - updated} of {len(updates)} {kind}s no longer exist")
+
+    return writes.WriteQueue(send, debounce=st.secrets.get("WRITE_DEBOUNCE_SECONDS", writes.DEBOUNCE),
+                             journal=st.secrets.get("WRITE_QUEUE_JOURNAL"))
+
+
+def _conversation_key(conv_id, field: str):
+    return ("conversation", conv_id, field)
+
+
+def _message_key(message_id):
+    return ("message", message_id)
+
+
+def queue_conversation_update(conv_id, **fields):
+    """Queue title / status / tags changes of a conversation and show them right away."""
+    queue = write_queue()
+    for field, value in fields.items():
+        queue.submit("conversation", _conversation_key(conv_id, field), value)
+    _caches()["conversations"].update(lambda key: True, lambda key, value: _patch_conversation(value, conv_id, fields))
+
+
+def queue_message_update(conv_id, message: dict, content: str):
+    """Queue a message edit and patch the cached thread and pages with it."""
+    write_queue().submit("message", _message_key(message["id"]), {"conversation_id": conv_id, "content": content})
+    row = {**message, "content": content}
+    _caches()["messages"].update(lambda key: key[0] == conv_id, lambda key, page: _patch_page(key, page, row))
+    thread_cache().apply(conv_id, row)
+
+
+def _patch_conversation(value, conv_id, fields):
+    # conversation cache values: list pages (rows, cursor), single rows, channel lists, stats dicts
+    if isinstance(value, tuple) and value and isinstance(value[0], list):
+        rows, cursor = value
+        return [{**r, **fields} if r["conversation_id"] == conv_id else r for r in rows], cursor
+    if isinstance(value, dict) and value.get("conversation_id") == conv_id:
+        return {**value, **fields}
+    return value
+
+
+def _with_pending_conversations(rows):
+    pending = write_queue().pending("conversation")
+    if not pending:
+        return rows
+    fields = {}
+    for (_, conv_id, field), value in pending.items():
+        fields.setdefault(conv_id, {})[field] = value
+    return [{**r, **fields[r["conversation_id"]]} if r["conversation_id"] in fields else r for r in rows]
+
+
+def _with_pending_messages(conv_id, rows):
+    pending = {key[1]: v["content"] for key, v in write_queue().pending("message").items()
+               if v["conversation_id"] == conv_id}
+    if not pending:
+        return rows
+    return [{**m, "content": pending[m["id"]]} if m["id"] in pending else m for m in rows]
+
+
+def conversation_write_status(conv_id, field: str):
+    """None once saved, else write_queue.WriteQueue.status() of the queued change."""
+    return write_queue().status(_conversation_key(conv_id, field))
+
+
+def message_write_status(message_id):
+    return write_queue().status(_message_key(message_id))
+
+
+def pending_writes(conv_id) -> dict:
+    """key -> pending/failed state of every queued write touching the conversation or its messages."""
+    queue, states = write_queue(), {}
+    for key, value in queue.pending().items():
+        if key[1] == conv_id or (key[0] == "message" and value["conversation_id"] == conv_id):
+            status = queue.status(key)
+            if status is not None:
+                states[key] = status["state"]
+    return states
+
+
+def retry_write(key):
+    write_queue().retry(key)
+
+
+def discard_write(key):
+    """Drop a queued (usually failed) write and let the caches reload the saved value."""
+    status = write_queue().status(key)
+    write_queue().discard(key)
+    if status is None:
+        return
+    if key[0] == "message":
+        conv_id = status["value"]["conversation_id"]
+        invalidate_messages(conv_id)
+        thread_cache().invalidate(conv_id)
+    else:
+        invalidate_conversations()
+
+
+def write_queue_stats() -> dict:
+    return write_queue().counts()
+
+
+# ---------------- Bulk writes (admin) ----------------
+BULK_CHUNK = 500          # conversation ids per RPC call; each call is one transaction
+
+
+def conversation_ids(search=None, channel=None, date_from=None, date_to=None, status=None) -> list:
+    """Every conversation id matching the list filters (and status), newest first. Uncached."""
+    p_from, p_to = _date_params(date_from, date_to)
+    return get_client().rpc(
+        "conversation_ids",
+        {"p_search": search or None, "p_channel": channel, "p_from": p_from, "p_to": p_to, "p_status": status},
+    ).execute().data or []
+
+
+def _bulk(rpc: str, ids: list, params: dict, chunk: int, progress) -> int:
+    # one RPC per chunk of ids; returns the summed affected-row counts.
+    # progress(done, total) is called after every chunk.
+    affected = 0
+    for i in range(0, len(ids), chunk):
+        part = ids[i:i + chunk]
+        affected += get_client().rpc(rpc, {"p_conversation_ids": part, **params}).execute().data or 0
+        if progress:
+            progress(i + len(part), len(ids))
+    return affected
+
+
+def bulk_set_status(ids: list, status: str, dry_run: bool = False,
+                    chunk: int = BULK_CHUNK, progress=None) -> int:
+    """Set the status of `ids`; returns how many changed (with dry_run, would change)."""
+    n = _bulk("bulk_set_conversation_status", ids, {"p_status": status, "p_dry_run": dry_run}, chunk, progress)
+    if not dry_run:
+        invalidate_conversations()
+    return n
+
+
+def bulk_set_tags(ids: list, tags: list, mode: str = "replace", dry_run: bool = False,
+                  chunk: int = BULK_CHUNK, progress=None) -> int:
+    """Set, add or remove tags on `ids` (mode: "replace" | "add" | "remove"); returns how many changed."""
+    n = _bulk("bulk_set_conversation_tags", ids,
+              {"p_tags": tags, "p_mode": mode, "p_dry_run": dry_run}, chunk, progress)
+    if not dry_run:
+        invalidate_conversations()
+    return n
+
+
+def bulk_replace_content(ids: list, find: str, replace: str, dry_run: bool = True,
+                         chunk: int = BULK_CHUNK, progress=None) -> int:
+    """Literal find/replace in the messages of `ids`; with dry_run only count the matches."""
+    n = _bulk("bulk_replace_message_content", ids,
+              {"p_find": find, "p_replace": replace, "p_dry_run": dry_run}, chunk, progress)
+    if not dry_run and n:
+        touched = set(ids)
+        _caches()["messages"].invalidate(lambda key: key[0] in touched)
+        threads = thread_cache()
+        for conv_id in ids:
+            threads.invalidate(conv_id)
+        _caches()["search"].invalidate()
+        invalidate_conversations()
+    return n
@@ -0,0 +1,21 @@
+-- Forward (oldest-first) paging over a thread, used by the streaming exporter.
+-- Mirrors list_messages, which pages newest-first with p_before.
+create or replace function public.list_messages_after(
+  p_conversation_id uuid,
+  p_after timestamptz default null,
+  p_limit int default 500
+)
+returns setof public.messages
+language sql
+stable
+as $$
+  select m.*
+  from public.messages m
+  where m.conversation_id = p_conversation_id
+    and (p_after is null or m.created_at > p_after)
+  order by m.created_at asc
+  limit greatest(p_limit, 1);
+$$;
+
+create index if not exists messages_conversation_created_at_idx
+  on public.messages (conversation_id, created_at);
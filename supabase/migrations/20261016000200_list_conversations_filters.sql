@@ -0,0 +1,60 @@
+-- Server-side channel and date filtering for the conversation list.
+-- Replaces list_conversations(p_search, p_limit, p_offset) with a version that
+-- also takes p_channel / p_from / p_to, so each page is a full page of matches.
+-- p_channel = 'unknown' matches conversations without a last_channel.
+drop function if exists public.list_conversations(text, int, int);
+
+create or replace function public.list_conversations(
+  p_search text default null,
+  p_limit int default 30,
+  p_offset int default 0,
+  p_channel text default null,
+  p_from timestamptz default null,
+  p_to timestamptz default null
+)
+returns table (
+  conversation_id uuid,
+  user_label text,
+  title text,
+  status text,
+  tags text[],
+  last_channel text,
+  last_message text,
+  last_message_at timestamptz,
+  msg_count bigint
+)
+language sql
+stable
+as $$
+  select c.id, c.user_label, c.title, c.status, c.tags, c.last_channel,
+         c.last_message, c.last_message_at, c.msg_count
+  from public.conversations c
+  where (p_search is null
+         or c.user_label ilike '%' || p_search || '%'
+         or c.last_message ilike '%' || p_search || '%')
+    and (p_channel is null
+         or (p_channel = 'unknown' and c.last_channel is null)
+         or c.last_channel = p_channel)
+    and (p_from is null or c.last_message_at >= p_from)
+    and (p_to is null or c.last_message_at < p_to)
+  order by c.last_message_at desc nulls last
+  limit greatest(p_limit, 1)
+  offset greatest(p_offset, 0);
+$$;
+
+-- Distinct channels for the sidebar selectbox (not just the current page's).
+create or replace function public.list_conversation_channels()
+returns table (channel text)
+language sql
+stable
+as $$
+  select distinct coalesce(c.last_channel, 'unknown')
+  from public.conversations c
+  order by 1;
+$$;
+
+create index if not exists conversations_last_message_at_idx
+  on public.conversations (last_message_at desc);
+
+create index if not exists conversations_last_channel_last_message_at_idx
+  on public.conversations (last_channel, last_message_at desc);
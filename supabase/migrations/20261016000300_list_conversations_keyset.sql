@@ -0,0 +1,55 @@
+-- Keyset pagination for the conversation list.
+-- Pages are ordered by (last_message_at desc, id desc); the cursor is the
+-- (last_message_at, conversation_id) of the last row on the previous page.
+-- Replaces the p_offset variant, whose deep pages scanned and discarded rows.
+drop function if exists public.list_conversations(text, int, int, text, timestamptz, timestamptz);
+
+create or replace function public.list_conversations(
+  p_search text default null,
+  p_limit int default 30,
+  p_channel text default null,
+  p_from timestamptz default null,
+  p_to timestamptz default null,
+  p_after_at timestamptz default null,
+  p_after_id uuid default null
+)
+returns table (
+  conversation_id uuid,
+  user_label text,
+  title text,
+  status text,
+  tags text[],
+  last_channel text,
+  last_message text,
+  last_message_at timestamptz,
+  msg_count bigint
+)
+language sql
+stable
+as $$
+  select c.id, c.user_label, c.title, c.status, c.tags, c.last_channel,
+         c.last_message, c.last_message_at, c.msg_count
+  from public.conversations c
+  where c.last_message_at is not null
+    and (p_search is null
+         or c.user_label ilike '%' || p_search || '%'
+         or c.last_message ilike '%' || p_search || '%')
+    and (p_channel is null
+         or (p_channel = 'unknown' and c.last_channel is null)
+         or c.last_channel = p_channel)
+    and (p_from is null or c.last_message_at >= p_from)
+    and (p_to is null or c.last_message_at < p_to)
+    and (p_after_at is null or (c.last_message_at, c.id) < (p_after_at, p_after_id))
+  order by c.last_message_at desc, c.id desc
+  limit greatest(p_limit, 1);
+$$;
+
+-- The keyset needs the tie-breaker in the index to seek instead of sort.
+drop index if exists public.conversations_last_message_at_idx;
+drop index if exists public.conversations_last_channel_last_message_at_idx;
+
+create index if not exists conversations_last_message_at_id_idx
+  on public.conversations (last_message_at desc, id desc);
+
+create index if not exists conversations_last_channel_last_message_at_id_idx
+  on public.conversations (last_channel, last_message_at desc, id desc);
@@ -0,0 +1,20 @@
+-- Resolution-rate KPI computed in the database: per-day conversation totals and
+-- closed counts (by UTC day of last_message_at), instead of shipping every
+-- conversation row to the analytics app.
+create or replace function public.conversation_status_counts(p_from timestamptz)
+returns table (day date, total bigint, closed bigint)
+language sql
+stable
+as $$
+  select (c.last_message_at at time zone 'utc')::date as day,
+         count(*) as total,
+         count(*) filter (where c.status = 'closed') as closed
+  from public.conversations c
+  where c.last_message_at >= p_from
+  group by 1
+  order by 1;
+$$;
+
+-- Lets the aggregate run as an index-only scan.
+create index if not exists conversations_last_message_at_status_idx
+  on public.conversations (last_message_at) include (status);
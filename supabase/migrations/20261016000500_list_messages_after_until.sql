@@ -0,0 +1,22 @@
+-- Adds an inclusive upper bound to list_messages_after so a thread can be split
+-- into time windows (p_after, p_until] and the windows fetched in parallel.
+drop function if exists public.list_messages_after(uuid, timestamptz, int);
+
+create or replace function public.list_messages_after(
+  p_conversation_id uuid,
+  p_after timestamptz default null,
+  p_limit int default 500,
+  p_until timestamptz default null
+)
+returns setof public.messages
+language sql
+stable
+as $$
+  select m.*
+  from public.messages m
+  where m.conversation_id = p_conversation_id
+    and (p_after is null or m.created_at > p_after)
+    and (p_until is null or m.created_at <= p_until)
+  order by m.created_at asc
+  limit greatest(p_limit, 1);
+$$;
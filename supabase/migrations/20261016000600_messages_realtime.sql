@@ -0,0 +1,2 @@
+-- Publish message inserts/updates to Supabase Realtime (live transcript updates).
+alter publication supabase_realtime add table public.messages;
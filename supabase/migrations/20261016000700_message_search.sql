@@ -0,0 +1,76 @@
+-- Full-text search over message bodies.
+-- 'simple' config: chats are multilingual, so no stemming / stop words.
+alter table public.messages
+  add column if not exists content_tsv tsvector
+  generated always as (to_tsvector('simple', coalesce(content, ''))) stored;
+
+create index if not exists messages_content_tsv_idx
+  on public.messages using gin (content_tsv);
+
+-- Ranked hits with snippets, keyset-paged on (rank desc, id desc).
+-- Snippet matches are wrapped in chr(2) / chr(3) so the client can escape the
+-- text first and then turn the markers into <mark> tags.
+create or replace function public.search_messages(
+  p_query text,
+  p_limit int default 20,
+  p_after_rank real default null,
+  p_after_id uuid default null
+)
+returns table (
+  message_id uuid,
+  conversation_id uuid,
+  role text,
+  created_at timestamptz,
+  rank real,
+  snippet text,
+  user_label text,
+  title text
+)
+language sql
+stable
+as $$
+  with q as (
+    select websearch_to_tsquery('simple', p_query) as query
+  ),
+  page as (
+    select m.id, m.conversation_id, m.role, m.created_at, m.content,
+           ts_rank_cd(m.content_tsv, q.query) as rank
+    from public.messages m, q
+    where m.content_tsv @@ q.query
+      and (p_after_rank is null
+           or (ts_rank_cd(m.content_tsv, q.query), m.id) < (p_after_rank, p_after_id))
+    order by rank desc, m.id desc
+    limit greatest(p_limit, 1)
+  )
+  -- headlines only for the rows on this page
+  select p.id, p.conversation_id, p.role, p.created_at, p.rank,
+         ts_headline('simple', p.content, q.query,
+                     format('StartSel=%s, StopSel=%s, MaxWords=24, MinWords=10, MaxFragments=2', chr(2), chr(3))),
+         c.user_label, c.title
+  from page p
+  cross join q
+  join public.conversations c on c.id = p.conversation_id
+  order by p.rank desc, p.id desc;
+$$;
+
+-- Single conversation in the list_conversations row shape (search results jump here).
+create or replace function public.get_conversation(p_conversation_id uuid)
+returns table (
+  conversation_id uuid,
+  user_label text,
+  title text,
+  status text,
+  tags text[],
+  last_channel text,
+  last_message text,
+  last_message_at timestamptz,
+  msg_count bigint
+)
+language sql
+stable
+as $$
+  select c.id, c.user_label, c.title, c.status, c.tags, c.last_channel,
+         c.last_message, c.last_message_at, c.msg_count
+  from public.conversations c
+  where c.id = p_conversation_id;
+$$;
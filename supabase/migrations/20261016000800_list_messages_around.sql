@@ -0,0 +1,41 @@
+-- Windowed loading around any point of a thread in one round trip:
+-- up to p_before messages older than the anchor and up to p_after messages at
+-- or after it, returned oldest-first. The anchor is p_at, or the created_at of
+-- p_message_id when p_at is null. p_before = 0 / p_after = 0 give one-sided
+-- pages ("Load earlier" / "Load newer").
+create or replace function public.list_messages_around(
+  p_conversation_id uuid,
+  p_at timestamptz default null,
+  p_message_id uuid default null,
+  p_before int default 25,
+  p_after int default 25
+)
+returns setof public.messages
+language sql
+stable
+as $$
+  with anchor as (
+    select coalesce(
+      p_at,
+      (select m.created_at from public.messages m
+        where m.id = p_message_id and m.conversation_id = p_conversation_id)
+    ) as at
+  )
+  select w.*
+  from (
+    (select m.*
+       from public.messages m, anchor a
+      where m.conversation_id = p_conversation_id
+        and m.created_at < a.at
+      order by m.created_at desc
+      limit greatest(p_before, 0))
+    union all
+    (select m.*
+       from public.messages m, anchor a
+      where m.conversation_id = p_conversation_id
+        and m.created_at >= a.at
+      order by m.created_at asc
+      limit greatest(p_after, 0))
+  ) w
+  order by w.created_at asc;
+$$;
@@ -0,0 +1,105 @@
+-- Bulk admin operations. Each call is a single statement, so every chunk the
+-- client sends is applied atomically; the return value is the affected row count.
+
+-- Every conversation id matching the list filters (plus status), as one array
+-- so the result isn't cut off by PostgREST's max-rows.
+create or replace function public.conversation_ids(
+  p_search text default null,
+  p_channel text default null,
+  p_from timestamptz default null,
+  p_to timestamptz default null,
+  p_status text default null
+)
+returns uuid[]
+language sql
+stable
+as $$
+  select coalesce(array_agg(c.id order by c.last_message_at desc nulls last, c.id desc), '{}')
+  from public.conversations c
+  where (p_search is null
+         or c.user_label ilike '%' || p_search || '%'
+         or c.last_message ilike '%' || p_search || '%')
+    and (p_channel is null
+         or (p_channel = 'unknown' and c.last_channel is null)
+         or c.last_channel = p_channel)
+    and (p_from is null or c.last_message_at >= p_from)
+    and (p_to is null or c.last_message_at < p_to)
+    and (p_status is null or coalesce(c.status, 'open') = p_status);
+$$;
+
+create or replace function public.bulk_set_conversation_status(
+  p_conversation_ids uuid[],
+  p_status text
+)
+returns int
+language sql
+as $$
+  with u as (
+    update public.conversations c
+       set status = p_status
+     where c.id = any(p_conversation_ids)
+       and c.status is distinct from p_status
+    returning 1
+  )
+  select count(*)::int from u;
+$$;
+
+-- p_mode: 'replace' (set exactly p_tags), 'add' (append missing), 'remove'.
+create or replace function public.bulk_set_conversation_tags(
+  p_conversation_ids uuid[],
+  p_tags text[],
+  p_mode text default 'replace'
+)
+returns int
+language plpgsql
+as $$
+declare
+  n int;
+begin
+  if p_mode not in ('replace', 'add', 'remove') then
+    raise exception 'unknown tag mode: %', p_mode;
+  end if;
+  update public.conversations c
+     set tags = case p_mode
+       when 'add' then coalesce(c.tags, '{}')
+                       || array(select t from unnest(p_tags) t where t <> all(coalesce(c.tags, '{}')))
+       when 'remove' then array(select t from unnest(coalesce(c.tags, '{}')) t where t <> all(p_tags))
+       else p_tags
+     end
+   where c.id = any(p_conversation_ids);
+  get diagnostics n = row_count;
+  return n;
+end;
+$$;
+
+-- Literal (not regex) find/replace over message content; p_dry_run only counts.
+create or replace function public.bulk_replace_message_content(
+  p_conversation_ids uuid[],
+  p_find text,
+  p_replace text,
+  p_dry_run boolean default true
+)
+returns int
+language plpgsql
+as $$
+declare
+  n int;
+begin
+  if coalesce(p_find, '') = '' then
+    raise exception 'p_find must not be empty';
+  end if;
+  if p_dry_run then
+    select count(*) into n
+      from public.messages m
+     where m.conversation_id = any(p_conversation_ids)
+       and strpos(m.content, p_find) > 0;
+  else
+    update public.messages m
+       set content = replace(m.content, p_find, p_replace)
+     where m.conversation_id = any(p_conversation_ids)
+       and strpos(m.content, p_find) > 0;
+    get diagnostics n = row_count;
+  end if;
+  return n;
+end;
+$$;
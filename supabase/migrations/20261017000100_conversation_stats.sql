@@ -0,0 +1,324 @@
+-- Per-conversation derived stats, so lists and analytics never have to load
+-- messages to show role splits, response times or token totals.
+--
+-- Maintained in two layers:
+--   * an insert trigger updates counts, timestamps, char/token totals and the
+--     running response-time sums in O(1) per message (messages arrive in
+--     created_at order, so the pending user turn is enough state);
+--   * refresh_conversation_stats() recomputes rows flagged `stale` exactly,
+--     including the median response gap, which no running sum can give.
+--     Inserts flag the row (the median moved); edits, deletes and
+--     out-of-order inserts flag it too, since the running sums may be off.
+--
+-- A "response" is the first assistant message after one or more user
+-- messages; its gap is measured from the first of those user messages.
+-- Tokens and latency come from numeric meta.tokens / meta.latency_ms.
+
+create table if not exists public.conversation_stats (
+  conversation_id uuid primary key references public.conversations (id) on delete cascade,
+  user_msgs bigint not null default 0,
+  assistant_msgs bigint not null default 0,
+  other_msgs bigint not null default 0,
+  first_message_at timestamptz,
+  last_message_at timestamptz,
+  first_response_ms bigint,
+  response_count bigint not null default 0,
+  response_ms_sum bigint not null default 0,
+  median_response_ms bigint,
+  user_chars bigint not null default 0,
+  assistant_chars bigint not null default 0,
+  tokens bigint not null default 0,
+  latency_ms_sum bigint not null default 0,
+  latency_count bigint not null default 0,
+  pending_user_at timestamptz,          -- first unanswered user message
+  stale boolean not null default true,
+  updated_at timestamptz not null default now()
+);
+
+create index if not exists conversation_stats_stale_idx
+  on public.conversation_stats (updated_at) where stale;
+
+create or replace function public._meta_number(p_meta jsonb, p_key text)
+returns numeric
+language sql
+immutable
+as $$
+  select case when jsonb_typeof(p_meta -> p_key) = 'number' then (p_meta ->> p_key)::numeric end;
+$$;
+
+create or replace function public._interval_ms(p_interval interval)
+returns bigint
+language sql
+immutable
+as $$
+  select (extract(epoch from p_interval) * 1000)::bigint;
+$$;
+
+-- ---------------- Incremental layer ----------------
+create or replace function public.conversation_stats_on_insert()
+returns trigger
+language plpgsql
+as $$
+declare
+  v_user boolean := new.role = 'user';
+  v_assistant boolean := new.role = 'assistant';
+  v_chars bigint := coalesce(length(new.content), 0);
+  v_tokens bigint := coalesce(public._meta_number(new.meta, 'tokens'), 0);
+  v_latency numeric := public._meta_number(new.meta, 'latency_ms');
+begin
+  insert into public.conversation_stats as s (
+    conversation_id, user_msgs, assistant_msgs, other_msgs, first_message_at, last_message_at,
+    user_chars, assistant_chars, tokens, latency_ms_sum, latency_count, pending_user_at
+  ) values (
+    new.conversation_id, v_user::int, v_assistant::int, (not v_user and not v_assistant)::int,
+    new.created_at, new.created_at,
+    case when v_user then v_chars else 0 end, case when v_assistant then v_chars else 0 end,
+    v_tokens, coalesce(v_latency, 0)::bigint, (v_latency is not null)::int,
+    case when v_user then new.created_at end
+  )
+  on conflict (conversation_id) do update set
+    user_msgs = s.user_msgs + excluded.user_msgs,
+    assistant_msgs = s.assistant_msgs + excluded.assistant_msgs,
+    other_msgs = s.other_msgs + excluded.other_msgs,
+    first_message_at = least(s.first_message_at, excluded.first_message_at),
+    last_message_at = greatest(s.last_message_at, excluded.last_message_at),
+    first_response_ms = case
+      when v_assistant and s.pending_user_at is not null and s.first_response_ms is null
+        then public._interval_ms(new.created_at - s.pending_user_at)
+      else s.first_response_ms end,
+    response_count = s.response_count + (v_assistant and s.pending_user_at is not null)::int,
+    response_ms_sum = s.response_ms_sum + case
+      when v_assistant and s.pending_user_at is not null
+        then public._interval_ms(new.created_at - s.pending_user_at)
+      else 0 end,
+    user_chars = s.user_chars + excluded.user_chars,
+    assistant_chars = s.assistant_chars + excluded.assistant_chars,
+    tokens = s.tokens + excluded.tokens,
+    latency_ms_sum = s.latency_ms_sum + excluded.latency_ms_sum,
+    latency_count = s.latency_count + excluded.latency_count,
+    pending_user_at = case
+      when v_user then coalesce(s.pending_user_at, new.created_at)
+      when v_assistant then null
+      else s.pending_user_at end,
+    stale = true,
+    updated_at = now();
+  return null;
+end;
+$$;
+
+create or replace function public.conversation_stats_mark_stale()
+returns trigger
+language plpgsql
+as $$
+begin
+  update public.conversation_stats s
+     set stale = true, updated_at = now()
+   where s.conversation_id in (select conversation_id from changed) and not s.stale;
+  return null;
+end;
+$$;
+
+drop trigger if exists conversation_stats_insert on public.messages;
+create trigger conversation_stats_insert
+  after insert on public.messages
+  for each row execute function public.conversation_stats_on_insert();
+
+drop trigger if exists conversation_stats_update on public.messages;
+create trigger conversation_stats_update
+  after update on public.messages
+  referencing old table as changed
+  for each statement execute function public.conversation_stats_mark_stale();
+
+drop trigger if exists conversation_stats_delete on public.messages;
+create trigger conversation_stats_delete
+  after delete on public.messages
+  referencing old table as changed
+  for each statement execute function public.conversation_stats_mark_stale();
+
+-- ---------------- Batch layer ----------------
+-- Recompute up to p_limit stale rows (oldest first); returns how many.
+-- Safe to run concurrently: rows being refreshed elsewhere are skipped.
+create or replace function public.refresh_conversation_stats(p_limit int default 500)
+returns int
+language sql
+as $$
+  with target as (
+    select s.conversation_id
+    from public.conversation_stats s
+    where s.stale
+    order by s.updated_at
+    limit greatest(p_limit, 1)
+    for update skip locked
+  ),
+  msgs as (
+    select m.conversation_id, m.role, m.created_at,
+           coalesce(length(m.content), 0) as chars,
+           public._meta_number(m.meta, 'tokens') as tokens,
+           public._meta_number(m.meta, 'latency_ms') as latency,
+           -- assistant messages before this one: user messages with turn k
+           -- are answered by the assistant message with turn k
+           coalesce(sum((m.role = 'assistant')::int) over (
+             partition by m.conversation_id order by m.created_at, m.id
+             rows between unbounded preceding and 1 preceding), 0) as turn
+    from public.messages m
+    join target t using (conversation_id)
+  ),
+  turns as (
+    select conversation_id, turn,
+           min(created_at) filter (where role = 'user') as asked_at,
+           min(created_at) filter (where role = 'assistant') as answered_at
+    from msgs
+    group by 1, 2
+  ),
+  gaps as (
+    select conversation_id,
+           public._interval_ms(answered_at - asked_at) as ms,
+           row_number() over (partition by conversation_id order by turn) as n
+    from turns
+    where asked_at is not null and answered_at is not null
+  ),
+  gap_stats as (
+    select conversation_id,
+           min(ms) filter (where n = 1) as first_response_ms,
+           count(*) as response_count,
+           sum(ms) as response_ms_sum,
+           percentile_disc(0.5) within group (order by ms) as median_response_ms
+    from gaps
+    group by 1
+  ),
+  msg_stats as (
+    select conversation_id,
+           count(*) filter (where role = 'user') as user_msgs,
+           count(*) filter (where role = 'assistant') as assistant_msgs,
+           count(*) filter (where role not in ('user', 'assistant')) as other_msgs,
+           min(created_at) as first_message_at,
+           max(created_at) as last_message_at,
+           coalesce(sum(chars) filter (where role = 'user'), 0) as user_chars,
+           coalesce(sum(chars) filter (where role = 'assistant'), 0) as assistant_chars,
+           coalesce(sum(tokens), 0) as tokens,
+           coalesce(sum(latency), 0) as latency_ms_sum,
+           count(latency) as latency_count
+    from msgs
+    group by 1
+  ),
+  pending as (
+    -- user messages after the last assistant message are still waiting
+    select m.conversation_id, min(m.created_at) as pending_user_at
+    from msgs m
+    join msg_stats ms using (conversation_id)
+    where m.role = 'user' and m.turn = ms.assistant_msgs
+    group by 1
+  ),
+  u as (
+    update public.conversation_stats s set
+      user_msgs = coalesce(ms.user_msgs, 0),
+      assistant_msgs = coalesce(ms.assistant_msgs, 0),
+      other_msgs = coalesce(ms.other_msgs, 0),
+      first_message_at = ms.first_message_at,
+      last_message_at = ms.last_message_at,
+      first_response_ms = gs.first_response_ms,
+      response_count = coalesce(gs.response_count, 0),
+      response_ms_sum = coalesce(gs.response_ms_sum, 0),
+      median_response_ms = gs.median_response_ms,
+      user_chars = coalesce(ms.user_chars, 0),
+      assistant_chars = coalesce(ms.assistant_chars, 0),
+      tokens = coalesce(ms.tokens, 0),
+      latency_ms_sum = coalesce(ms.latency_ms_sum, 0),
+      latency_count = coalesce(ms.latency_count, 0),
+      pending_user_at = p.pending_user_at,
+      stale = false,
+      updated_at = now()
+    from target t
+    left join msg_stats ms using (conversation_id)
+    left join gap_stats gs using (conversation_id)
+    left join pending p using (conversation_id)
+    where s.conversation_id = t.conversation_id
+    returning 1
+  )
+  select count(*)::int from u;
+$$;
+
+-- Backfill: one stale row per existing conversation; the batch job fills them in.
+insert into public.conversation_stats (conversation_id)
+select c.id from public.conversations c
+on conflict (conversation_id) do nothing;
+
+-- With pg_cron available, refresh every minute; otherwise call
+-- refresh_conversation_stats() from any scheduler until it returns 0.
+do $$
+begin
+  if exists (select 1 from pg_extension where extname = 'pg_cron') then
+    perform cron.schedule('refresh-conversation-stats', '* * * * *',
+                          'select public.refresh_conversation_stats(2000)');
+  end if;
+end;
+$$;
+
+-- ---------------- Reads ----------------
+-- Stats for a page of conversations (the sidebar asks once per page).
+create or replace function public.get_conversation_stats(p_conversation_ids uuid[])
+returns table (
+  conversation_id uuid,
+  user_msgs bigint,
+  assistant_msgs bigint,
+  other_msgs bigint,
+  first_message_at timestamptz,
+  last_message_at timestamptz,
+  first_response_ms bigint,
+  avg_response_ms bigint,
+  median_response_ms bigint,
+  user_chars bigint,
+  assistant_chars bigint,
+  tokens bigint,
+  avg_latency_ms bigint,
+  stale boolean
+)
+language sql
+stable
+as $$
+  select s.conversation_id, s.user_msgs, s.assistant_msgs, s.other_msgs,
+         s.first_message_at, s.last_message_at, s.first_response_ms,
+         (s.response_ms_sum / nullif(s.response_count, 0))::bigint,
+         s.median_response_ms, s.user_chars, s.assistant_chars, s.tokens,
+         (s.latency_ms_sum / nullif(s.latency_count, 0))::bigint,
+         s.stale
+  from public.conversation_stats s
+  where s.conversation_id = any(p_conversation_ids);
+$$;
+
+-- Per day (of the last message) and channel, summed so any range can be
+-- re-aggregated client-side; p50 first response is per day.
+create or replace function public.conversation_stats_daily(p_from timestamptz)
+returns table (
+  day text,
+  channel text,
+  conversations bigint,
+  user_msgs bigint,
+  assistant_msgs bigint,
+  responses bigint,
+  response_ms_sum bigint,
+  p50_first_response_ms bigint,
+  user_chars bigint,
+  assistant_chars bigint,
+  tokens bigint
+)
+language sql
+stable
+as $$
+  select (s.last_message_at at time zone 'utc')::date::text,
+         coalesce(c.last_channel, 'unknown'),
+         count(*),
+         sum(s.user_msgs)::bigint,
+         sum(s.assistant_msgs)::bigint,
+         sum(s.response_count)::bigint,
+         sum(s.response_ms_sum)::bigint,
+         percentile_disc(0.5) within group (order by s.first_response_ms),
+         sum(s.user_chars)::bigint,
+         sum(s.assistant_chars)::bigint,
+         sum(s.tokens)::bigint
+  from public.conversation_stats s
+  join public.conversations c on c.id = s.conversation_id
+  where s.last_message_at >= p_from
+  group by 1, 2
+  order by 1, 2;
+$$;
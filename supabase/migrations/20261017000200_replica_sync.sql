@@ -0,0 +1,90 @@
+-- Change feeds for the local read replica (replica.py).
+-- Every insert or update stamps updated_at; the replica pages through rows in
+-- (updated_at, id) order from its last watermark and upserts them locally.
+-- Existing rows share the migration's timestamp, so the first sync takes
+-- everything and the id tie-breaker keeps the pages stable.
+
+alter table public.conversations add column if not exists updated_at timestamptz not null default now();
+alter table public.messages add column if not exists updated_at timestamptz not null default now();
+
+create or replace function public.touch_updated_at()
+returns trigger
+language plpgsql
+as $$
+begin
+  new.updated_at := now();
+  return new;
+end;
+$$;
+
+drop trigger if exists conversations_touch_updated_at on public.conversations;
+create trigger conversations_touch_updated_at
+  before update on public.conversations
+  for each row execute function public.touch_updated_at();
+
+drop trigger if exists messages_touch_updated_at on public.messages;
+create trigger messages_touch_updated_at
+  before update on public.messages
+  for each row execute function public.touch_updated_at();
+
+create index if not exists conversations_updated_at_id_idx
+  on public.conversations (updated_at, id);
+
+create index if not exists messages_updated_at_id_idx
+  on public.messages (updated_at, id);
+
+-- Rows changed after the (p_since, p_after_id) keyset, oldest change first.
+-- p_after_id null means "everything at or after p_since".
+create or replace function public.replica_conversations(
+  p_since timestamptz default null,
+  p_after_id uuid default null,
+  p_limit int default 1000
+)
+returns table (
+  conversation_id uuid,
+  user_label text,
+  title text,
+  status text,
+  tags text[],
+  last_channel text,
+  last_message text,
+  last_message_at timestamptz,
+  msg_count bigint,
+  updated_at timestamptz
+)
+language sql
+stable
+as $$
+  select c.id, c.user_label, c.title, c.status, c.tags, c.last_channel,
+         c.last_message, c.last_message_at, c.msg_count, c.updated_at
+  from public.conversations c
+  where p_since is null
+     or (c.updated_at, c.id) > (p_since, coalesce(p_after_id, '00000000-0000-0000-0000-000000000000'::uuid))
+  order by c.updated_at, c.id
+  limit greatest(p_limit, 1);
+$$;
+
+create or replace function public.replica_messages(
+  p_since timestamptz default null,
+  p_after_id uuid default null,
+  p_limit int default 1000
+)
+returns table (
+  id uuid,
+  conversation_id uuid,
+  role text,
+  content text,
+  meta jsonb,
+  created_at timestamptz,
+  updated_at timestamptz
+)
+language sql
+stable
+as $$
+  select m.id, m.conversation_id, m.role, m.content, m.meta, m.created_at, m.updated_at
+  from public.messages m
+  where p_since is null
+     or (m.updated_at, m.id) > (p_since, coalesce(p_after_id, '00000000-0000-0000-0000-000000000000'::uuid))
+  order by m.updated_at, m.id
+  limit greatest(p_limit, 1);
+$$;
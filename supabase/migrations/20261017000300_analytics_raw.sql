@@ -0,0 +1,53 @@
+-- Bulk, column-projected reads for analytics_engine.py.
+-- Each call returns one JSON object of parallel arrays (no per-row keys, and
+-- not subject to PostgREST's max-rows), plus the keyset cursor of the page.
+
+-- Messages created at or after p_from in (created_at, id) order, after the
+-- (p_after_at, p_after_id) cursor. created_at is epoch milliseconds.
+create or replace function public.analytics_message_page(
+  p_from timestamptz,
+  p_after_at timestamptz default null,
+  p_after_id uuid default null,
+  p_limit int default 50000
+)
+returns jsonb
+language sql
+stable
+as $$
+  with page as (
+    select m.id, m.conversation_id, m.role, m.created_at
+    from public.messages m
+    where m.created_at >= p_from
+      and (p_after_at is null or (m.created_at, m.id) > (p_after_at, p_after_id))
+    order by m.created_at, m.id
+    limit greatest(p_limit, 1)
+  ),
+  last_row as (
+    select created_at, id from page order by created_at desc, id desc limit 1
+  )
+  select jsonb_build_object(
+    'conversation_id', coalesce((select jsonb_agg(conversation_id order by created_at, id) from page), '[]'),
+    'role', coalesce((select jsonb_agg(role order by created_at, id) from page), '[]'),
+    'created_at', coalesce((select jsonb_agg((extract(epoch from created_at) * 1000)::bigint
+                                             order by created_at, id) from page), '[]'),
+    'next', (select jsonb_build_object('at', created_at, 'id', id) from last_row)
+  );
+$$;
+
+-- Conversations whose last message is at or after p_from.
+create or replace function public.analytics_conversations(p_from timestamptz)
+returns jsonb
+language sql
+stable
+as $$
+  select jsonb_build_object(
+    'channel', coalesce(jsonb_agg(coalesce(c.last_channel, 'unknown') order by c.id), '[]'),
+    'status', coalesce(jsonb_agg(coalesce(c.status, 'open') order by c.id), '[]'),
+    'msg_count', coalesce(jsonb_agg(c.msg_count order by c.id), '[]')
+  )
+  from public.conversations c
+  where c.last_message_at >= p_from;
+$$;
+
+create index if not exists messages_created_at_id_idx
+  on public.messages (created_at, id);
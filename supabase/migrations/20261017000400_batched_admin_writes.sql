@@ -0,0 +1,38 @@
+-- Batched admin edits for the background write queue (write_queue.py).
+-- Each call is one statement, so a batch is applied atomically; the return
+-- value is the number of rows updated.
+
+-- p_updates: [{"id": <message uuid>, "content": "..."}, ...]
+create or replace function public.update_messages(p_updates jsonb)
+returns int
+language sql
+as $$
+  with u as (
+    update public.messages m
+       set content = x.content
+      from jsonb_to_recordset(p_updates) as x(id uuid, content text)
+     where m.id = x.id
+    returning 1
+  )
+  select count(*)::int from u;
+$$;
+
+-- p_updates: [{"id": <conversation uuid>, "title"?: "...", "status"?: "...", "tags"?: [...]}, ...]
+-- Only the keys present in an element are changed.
+create or replace function public.update_conversations(p_updates jsonb)
+returns int
+language sql
+as $$
+  with u as (
+    update public.conversations c
+       set title = case when x ? 'title' then x ->> 'title' else c.title end,
+           status = case when x ? 'status' then x ->> 'status' else c.status end,
+           tags = case when x ? 'tags'
+                       then array(select jsonb_array_elements_text(x -> 'tags'))
+                       else c.tags end
+      from jsonb_array_elements(p_updates) as x
+     where c.id = (x ->> 'id')::uuid
+    returning 1
+  )
+  select count(*)::int from u;
+$$;
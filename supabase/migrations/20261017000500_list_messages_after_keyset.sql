@@ -0,0 +1,31 @@
+-- Pages list_messages_after by (created_at, id) instead of created_at alone, so
+-- messages sharing a timestamp across a page boundary are no longer skipped
+-- (same keyset as analytics_message_page). Without p_after_id, p_after is
+-- still an exclusive timestamp bound, as used for time windows and --incremental.
+drop function if exists public.list_messages_after(uuid, timestamptz, int, timestamptz);
+
+create or replace function public.list_messages_after(
+  p_conversation_id uuid,
+  p_after timestamptz default null,
+  p_limit int default 500,
+  p_until timestamptz default null,
+  p_after_id uuid default null
+)
+returns setof public.messages
+language sql
+stable
+as $$
+  select m.*
+  from public.messages m
+  where m.conversation_id = p_conversation_id
+    and (p_after is null
+         or (p_after_id is null and m.created_at > p_after)
+         or (p_after_id is not null and (m.created_at, m.id) > (p_after, p_after_id)))
+    and (p_until is null or m.created_at <= p_until)
+  order by m.created_at asc, m.id asc
+  limit greatest(p_limit, 1);
+$$;
+
+drop index if exists public.messages_conversation_created_at_idx;
+create index if not exists messages_conversation_created_at_id_idx
+  on public.messages (conversation_id, created_at, id);
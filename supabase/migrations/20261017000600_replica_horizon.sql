@@ -0,0 +1,19 @@
+-- Sync horizon for the local read replica (replica.py).
+-- updated_at is now(), the start time of the writing transaction, so a long
+-- transaction commits rows stamped earlier than rows a sync may already have
+-- read. replica_horizon() is the start of the oldest transaction that has
+-- written anything and is still in flight (or now() if there is none). A
+-- sync never moves its watermark past the horizon taken before it read, so
+-- those rows are still above the watermark once they commit.
+-- security definer: pg_stat_activity hides other roles' transactions otherwise.
+create or replace function public.replica_horizon()
+returns timestamptz
+language sql
+stable
+security definer
+set search_path = pg_catalog, public
+as $$
+  select least(now(), min(a.xact_start))
+  from pg_stat_activity a
+  where a.backend_xid is not null;
+$$;
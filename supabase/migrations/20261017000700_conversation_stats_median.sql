@@ -0,0 +1,150 @@
+-- Stop the insert trigger from flagging every row it touches.
+--
+-- In-order inserts keep the running sums exact, so they no longer set
+-- `stale`: only edits, deletes and out-of-order inserts (created_at before
+-- the thread's last message) still queue a full recompute. The median is
+-- the one figure an insert can move that no running sum gives; a new
+-- response sets `median_stale` instead, and refresh_conversation_medians()
+-- recomputes just that column, on a slower schedule.
+
+alter table public.conversation_stats
+  add column if not exists median_stale boolean not null default false;
+
+create index if not exists conversation_stats_median_stale_idx
+  on public.conversation_stats (updated_at) where median_stale;
+
+-- ---------------- Incremental layer ----------------
+create or replace function public.conversation_stats_on_insert()
+returns trigger
+language plpgsql
+as $$
+declare
+  v_user boolean := new.role = 'user';
+  v_assistant boolean := new.role = 'assistant';
+  v_chars bigint := coalesce(length(new.content), 0);
+  v_tokens bigint := coalesce(public._meta_number(new.meta, 'tokens'), 0);
+  v_latency numeric := public._meta_number(new.meta, 'latency_ms');
+begin
+  insert into public.conversation_stats as s (
+    conversation_id, user_msgs, assistant_msgs, other_msgs, first_message_at, last_message_at,
+    user_chars, assistant_chars, tokens, latency_ms_sum, latency_count, pending_user_at,
+    stale, median_stale
+  ) values (
+    new.conversation_id, v_user::int, v_assistant::int, (not v_user and not v_assistant)::int,
+    new.created_at, new.created_at,
+    case when v_user then v_chars else 0 end, case when v_assistant then v_chars else 0 end,
+    v_tokens, coalesce(v_latency, 0)::bigint, (v_latency is not null)::int,
+    case when v_user then new.created_at end,
+    false, false
+  )
+  on conflict (conversation_id) do update set
+    user_msgs = s.user_msgs + excluded.user_msgs,
+    assistant_msgs = s.assistant_msgs + excluded.assistant_msgs,
+    other_msgs = s.other_msgs + excluded.other_msgs,
+    first_message_at = least(s.first_message_at, excluded.first_message_at),
+    last_message_at = greatest(s.last_message_at, excluded.last_message_at),
+    first_response_ms = case
+      when v_assistant and s.pending_user_at is not null and s.first_response_ms is null
+        then public._interval_ms(new.created_at - s.pending_user_at)
+      else s.first_response_ms end,
+    response_count = s.response_count + (v_assistant and s.pending_user_at is not null)::int,
+    response_ms_sum = s.response_ms_sum + case
+      when v_assistant and s.pending_user_at is not null
+        then public._interval_ms(new.created_at - s.pending_user_at)
+      else 0 end,
+    user_chars = s.user_chars + excluded.user_chars,
+    assistant_chars = s.assistant_chars + excluded.assistant_chars,
+    tokens = s.tokens + excluded.tokens,
+    latency_ms_sum = s.latency_ms_sum + excluded.latency_ms_sum,
+    latency_count = s.latency_count + excluded.latency_count,
+    pending_user_at = case
+      when v_user then coalesce(s.pending_user_at, new.created_at)
+      when v_assistant then null
+      else s.pending_user_at end,
+    -- the running sums assume created_at order; an older message breaks it
+    stale = s.stale or new.created_at < s.last_message_at,
+    median_stale = s.median_stale or (v_assistant and s.pending_user_at is not null),
+    updated_at = now();
+  return null;
+end;
+$$;
+
+-- ---------------- Batch layer ----------------
+-- Recompute the median of up to p_limit rows with a new response (oldest
+-- first); returns how many. Stale rows are left to refresh_conversation_stats(),
+-- which recomputes the median with everything else.
+create or replace function public.refresh_conversation_medians(p_limit int default 500)
+returns int
+language sql
+as $$
+  with target as (
+    select s.conversation_id
+    from public.conversation_stats s
+    where s.median_stale and not s.stale
+    order by s.updated_at
+    limit greatest(p_limit, 1)
+    for update skip locked
+  ),
+  msgs as (
+    select m.conversation_id, m.role, m.created_at,
+           coalesce(sum((m.role = 'assistant')::int) over (
+             partition by m.conversation_id order by m.created_at, m.id
+             rows between unbounded preceding and 1 preceding), 0) as turn
+    from public.messages m
+    join target t using (conversation_id)
+  ),
+  turns as (
+    select conversation_id, turn,
+           min(created_at) filter (where role = 'user') as asked_at,
+           min(created_at) filter (where role = 'assistant') as answered_at
+    from msgs
+    group by 1, 2
+  ),
+  medians as (
+    select conversation_id,
+           percentile_disc(0.5) within group (
+             order by public._interval_ms(answered_at - asked_at)) as median_response_ms
+    from turns
+    where asked_at is not null and answered_at is not null
+    group by 1
+  ),
+  u as (
+    update public.conversation_stats s set
+      median_response_ms = md.median_response_ms,
+      median_stale = false
+    from target t
+    left join medians md using (conversation_id)
+    where s.conversation_id = t.conversation_id
+    returning 1
+  )
+  select count(*)::int from u;
+$$;
+
+-- A full refresh recomputes the median too; clear the flag it leaves behind.
+create or replace function public.conversation_stats_clear_median()
+returns trigger
+language plpgsql
+as $$
+begin
+  if old.stale and not new.stale then
+    new.median_stale := false;
+  end if;
+  return new;
+end;
+$$;
+
+drop trigger if exists conversation_stats_refreshed on public.conversation_stats;
+create trigger conversation_stats_refreshed
+  before update on public.conversation_stats
+  for each row execute function public.conversation_stats_clear_median();
+
+-- With pg_cron available, refresh medians every 15 minutes; otherwise call
+-- refresh_conversation_medians() from any scheduler until it returns 0.
+do $$
+begin
+  if exists (select 1 from pg_extension where extname = 'pg_cron') then
+    perform cron.schedule('refresh-conversation-medians', '*/15 * * * *',
+                          'select public.refresh_conversation_medians(2000)');
+  end if;
+end;
+$$;
@@ -0,0 +1,80 @@
+-- Dry runs for the bulk status and tag writes: with p_dry_run the functions
+-- count the conversations that would change instead of writing them, so the
+-- admin preview shows a real number. Tag writes now skip (and no longer count)
+-- conversations whose tags would not change, matching the status write.
+
+drop function if exists public.bulk_set_conversation_status(uuid[], text);
+drop function if exists public.bulk_set_conversation_tags(uuid[], text[], text);
+
+create or replace function public.bulk_set_conversation_status(
+  p_conversation_ids uuid[],
+  p_status text,
+  p_dry_run boolean default false
+)
+returns int
+language plpgsql
+as $$
+declare
+  n int;
+begin
+  if p_dry_run then
+    select count(*) into n
+      from public.conversations c
+     where c.id = any(p_conversation_ids)
+       and c.status is distinct from p_status;
+  else
+    update public.conversations c
+       set status = p_status
+     where c.id = any(p_conversation_ids)
+       and c.status is distinct from p_status;
+    get diagnostics n = row_count;
+  end if;
+  return n;
+end;
+$$;
+
+-- Tags of a conversation after a bulk tag write in p_mode.
+create or replace function public._bulk_tags(p_old text[], p_tags text[], p_mode text)
+returns text[]
+language sql
+immutable
+as $$
+  select case p_mode
+    when 'add' then coalesce(p_old, '{}')
+                    || array(select t from unnest(p_tags) t where t <> all(coalesce(p_old, '{}')))
+    when 'remove' then array(select t from unnest(coalesce(p_old, '{}')) t where t <> all(p_tags))
+    else p_tags
+  end;
+$$;
+
+-- p_mode: 'replace' (set exactly p_tags), 'add' (append missing), 'remove'.
+create or replace function public.bulk_set_conversation_tags(
+  p_conversation_ids uuid[],
+  p_tags text[],
+  p_mode text default 'replace',
+  p_dry_run boolean default false
+)
+returns int
+language plpgsql
+as $$
+declare
+  n int;
+begin
+  if p_mode not in ('replace', 'add', 'remove') then
+    raise exception 'unknown tag mode: %', p_mode;
+  end if;
+  if p_dry_run then
+    select count(*) into n
+      from public.conversations c
+     where c.id = any(p_conversation_ids)
+       and coalesce(c.tags, '{}') is distinct from public._bulk_tags(c.tags, p_tags, p_mode);
+  else
+    update public.conversations c
+       set tags = public._bulk_tags(c.tags, p_tags, p_mode)
+     where c.id = any(p_conversation_ids)
+       and coalesce(c.tags, '{}') is distinct from public._bulk_tags(c.tags, p_tags, p_mode);
+    get diagnostics n = row_count;
+  end if;
+  return n;
+end;
+$$;
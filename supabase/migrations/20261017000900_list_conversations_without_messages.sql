@@ -0,0 +1,70 @@
+-- Keep conversations without messages in the list. The keyset variant
+-- filtered out last_message_at is null; those rows now follow every dated
+-- one as a trailing segment, ordered by id desc (the old offset variant's
+-- "nulls last"). A cursor inside that segment has p_after_at null and
+-- p_after_id set; the first page passes neither.
+-- Each segment is read with its own index seek and limit.
+
+create or replace function public.list_conversations(
+  p_search text default null,
+  p_limit int default 30,
+  p_channel text default null,
+  p_from timestamptz default null,
+  p_to timestamptz default null,
+  p_after_at timestamptz default null,
+  p_after_id uuid default null
+)
+returns table (
+  conversation_id uuid,
+  user_label text,
+  title text,
+  status text,
+  tags text[],
+  last_channel text,
+  last_message text,
+  last_message_at timestamptz,
+  msg_count bigint
+)
+language sql
+stable
+as $$
+  with matching as not materialized (   -- inlined into both segments
+    select c.*
+    from public.conversations c
+    where (p_search is null
+           or c.user_label ilike '%' || p_search || '%'
+           or c.last_message ilike '%' || p_search || '%')
+      and (p_channel is null
+           or (p_channel = 'unknown' and c.last_channel is null)
+           or c.last_channel = p_channel)
+      and (p_from is null or c.last_message_at >= p_from)
+      and (p_to is null or c.last_message_at < p_to)
+  ),
+  dated as (
+    select * from matching c
+    where c.last_message_at is not null
+      and (p_after_id is null or (c.last_message_at, c.id) < (p_after_at, p_after_id))
+    order by c.last_message_at desc, c.id desc
+    limit greatest(p_limit, 1)
+  ),
+  undated as (
+    select * from matching c
+    where c.last_message_at is null
+      and (p_after_id is null or p_after_at is not null or c.id < p_after_id)
+    order by c.id desc
+    limit greatest(p_limit, 1)
+  ),
+  page as (
+    select * from dated
+    union all
+    select * from undated
+  )
+  select c.id, c.user_label, c.title, c.status, c.tags, c.last_channel,
+         c.last_message, c.last_message_at, c.msg_count
+  from page c
+  order by c.last_message_at desc nulls last, c.id desc
+  limit greatest(p_limit, 1);
+$$;
+
+create index if not exists conversations_without_messages_id_idx
+  on public.conversations (id desc) where last_message_at is null;
@@ -0,0 +1,56 @@
+-- Search on an expression index instead of a stored tsvector column.
+-- content_tsv was a real column of public.messages, so every RPC returning
+-- messages rows (list_messages, list_messages_after, list_messages_around),
+-- realtime change records and the exports carried it. The GIN index on the
+-- same expression serves search_messages without widening the rows.
+
+drop index if exists public.messages_content_tsv_idx;
+alter table public.messages drop column if exists content_tsv;
+
+create index if not exists messages_content_search_idx
+  on public.messages using gin (to_tsvector('simple', coalesce(content, '')));
+
+-- As before; matches on the indexed expression (it must be written the same).
+create or replace function public.search_messages(
+  p_query text,
+  p_limit int default 20,
+  p_after_rank real default null,
+  p_after_id uuid default null
+)
+returns table (
+  message_id uuid,
+  conversation_id uuid,
+  role text,
+  created_at timestamptz,
+  rank real,
+  snippet text,
+  user_label text,
+  title text
+)
+language sql
+stable
+as $$
+  with q as (
+    select websearch_to_tsquery('simple', p_query) as query
+  ),
+  page as (
+    select m.id, m.conversation_id, m.role, m.created_at, m.content,
+           ts_rank_cd(to_tsvector('simple', coalesce(m.content, '')), q.query) as rank
+    from public.messages m, q
+    where to_tsvector('simple', coalesce(m.content, '')) @@ q.query
+      and (p_after_rank is null
+           or (ts_rank_cd(to_tsvector('simple', coalesce(m.content, '')), q.query), m.id)
+              < (p_after_rank, p_after_id))
+    order by rank desc, m.id desc
+    limit greatest(p_limit, 1)
+  )
+  -- headlines only for the rows on this page
+  select p.id, p.conversation_id, p.role, p.created_at, p.rank,
+         ts_headline('simple', p.content, q.query,
+                     format('StartSel=%s, StopSel=%s, MaxWords=24, MinWords=10, MaxFragments=2', chr(2), chr(3))),
+         c.user_label, c.title
+  from page p
+  cross join q
+  join public.conversations c on c.id = p.conversation_id
+  order by p.rank desc, p.id desc;
+$$;
@@ -0,0 +1,25 @@
+-- Pages list_messages by (created_at, id) as well, like list_messages_after:
+-- with p_before_id the page starts below the (p_before, p_before_id) keyset,
+-- so messages sharing a timestamp across a page boundary are no longer
+-- skipped. Without it, p_before is still an exclusive timestamp bound.
+drop function if exists public.list_messages(uuid, timestamptz, int);
+
+create or replace function public.list_messages(
+  p_conversation_id uuid,
+  p_before timestamptz default null,
+  p_limit int default 50,
+  p_before_id uuid default null
+)
+returns setof public.messages
+language sql
+stable
+as $$
+  select m.*
+  from public.messages m
+  where m.conversation_id = p_conversation_id
+    and (p_before is null
+         or (p_before_id is null and m.created_at < p_before)
+         or (p_before_id is not null and (m.created_at, m.id) < (p_before, p_before_id)))
+  order by m.created_at desc, m.id desc
+  limit greatest(p_limit, 1);
+$$;
@@ -0,0 +1,49 @@
+-- Anchors list_messages_around on a (created_at, id) keyset. With both p_at
+-- and p_message_id the window splits at that message: older rows are below
+-- the keyset, newer ones at or (p_after_anchor) strictly after it. Windows
+-- paged from a message at their edge no longer drop or repeat the messages
+-- that share its timestamp. Without p_message_id, p_at splits on created_at
+-- alone as before (date jumps); with p_message_id alone its created_at is
+-- looked up.
+drop function if exists public.list_messages_around(uuid, timestamptz, uuid, int, int);
+
+create or replace function public.list_messages_around(
+  p_conversation_id uuid,
+  p_at timestamptz default null,
+  p_message_id uuid default null,
+  p_before int default 25,
+  p_after int default 25,
+  p_after_anchor boolean default false
+)
+returns setof public.messages
+language sql
+stable
+as $$
+  with anchor as (
+    select coalesce(
+      p_at,
+      (select m.created_at from public.messages m
+        where m.id = p_message_id and m.conversation_id = p_conversation_id)
+    ) as at
+  )
+  select w.*
+  from (
+    (select m.*
+       from public.messages m, anchor a
+      where m.conversation_id = p_conversation_id
+        and (case when p_message_id is null then m.created_at < a.at
+                  else (m.created_at, m.id) < (a.at, p_message_id) end)
+      order by m.created_at desc, m.id desc
+      limit greatest(p_before, 0))
+    union all
+    (select m.*
+       from public.messages m, anchor a
+      where m.conversation_id = p_conversation_id
+        and (case when p_message_id is null then m.created_at >= a.at
+                  when p_after_anchor then (m.created_at, m.id) > (a.at, p_message_id)
+                  else (m.created_at, m.id) >= (a.at, p_message_id) end)
+      order by m.created_at asc, m.id asc
+      limit greatest(p_after, 0))
+  ) w
+  order by w.created_at asc, w.id asc;
+$$;
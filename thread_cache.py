@@ -0,0 +1,367 @@
+import copy
+import json
+import sys
+import threading
+from array import array
+from bisect import bisect_right
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from itertools import accumulate
+
+# ---------------- Settings ----------------
+MAX_BYTES = 256 * 1024 * 1024
+ROW_OVERHEAD = 400        # rough per-message cost of the dict, keys and small values
+TAIL_MAX = 256            # messages added after a build, kept as dicts until the next compaction
+LABEL_WIDTH = 60          # content characters in a message label
+
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+_US = timedelta(microseconds=1)
+_NO_TS = -2 ** 63
+_encode_json = json.JSONEncoder(ensure_ascii=False).encode
+_TIMESTAMPS = ("created_at", "updated_at")
+_CORE = ("id", "role", "content", "meta") + _TIMESTAMPS
+
+
+def estimate_bytes(rows) -> int:
+    if isinstance(rows, CompactThread):
+        return rows.nbytes
+    size = 0
+    for m in rows:
+        size += ROW_OVERHEAD + len(m.get("content") or "") * 2
+        if m.get("meta"):
+            size += len(json.dumps(m["meta"])) * 3
+    return size
+
+
+# ---------------- Compact thread ----------------
+def _to_us(ts) -> int:
+    if ts is None:
+        return _NO_TS
+    dt = datetime.fromisoformat(str(ts).replace("Z", "+00:00"))
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return (dt - _EPOCH) // _US
+
+
+def _from_us(us: int):
+    return None if us == _NO_TS else (_EPOCH + us * _US).isoformat()
+
+
+def _utc_seconds(ts, us: int) -> str:
+    # 'YYYY-MM-DDTHH:MM:SS' in UTC; PostgREST already sends UTC, so usually a plain slice
+    if ts is None:
+        return " " * 19
+    if str(ts).endswith(("+00:00", "Z")) and len(ts) >= 19:
+        return ts[:19]
+    return _from_us(us)[:19]
+
+
+class _Texts:
+    """Strings packed into one UTF-8 buffer with offsets; None is told apart from ''."""
+
+    def __init__(self, values):
+        values = list(values)
+        encoded = [b"" if v is None else v.encode("utf-8") for v in values]
+        self.buf = b"".join(encoded)
+        self.offsets = array("q", [0])
+        self.offsets.extend(accumulate(map(len, encoded)))
+        self.nulls = bytearray(v is None for v in values) if None in values else None
+
+    def __getitem__(self, i: int):
+        if self.nulls is not None and self.nulls[i]:
+            return None
+        return self.buf[self.offsets[i]:self.offsets[i + 1]].decode("utf-8")
+
+    def find(self, value: str) -> int:
+        target = value.encode("utf-8")
+        pos = self.buf.find(target)
+        while pos >= 0:
+            i = bisect_right(self.offsets, pos) - 1
+            if self.offsets[i] == pos and self.offsets[i + 1] - pos == len(target):
+                return i
+            pos = self.buf.find(target, pos + 1)
+        return -1
+
+    @property
+    def nbytes(self) -> int:
+        return len(self.buf) + self.offsets.itemsize * len(self.offsets) + len(self.nulls or b"")
+
+
+class CompactThread:
+    """A loaded thread (oldest -> newest) in a few flat buffers instead of one dict per message.
+
+    Ids, contents and meta (kept as JSON text, decoded only when a row is
+    read) are packed into UTF-8 buffers with offsets, roles are one byte
+    each against a small vocabulary, and created_at / updated_at are int64
+    microseconds, parsed once. Other columns are plain lists with repeated
+    values shared. Rows are materialized as dicts on access (t[i], t[a:b],
+    iteration), so callers see the RPC row shape; timestamps come back in
+    one normalized ISO form.
+
+    An instance never changes once built, so sessions can read a cached
+    thread without locks: with_row() returns a new thread with one message
+    patched or appended, sharing the buffers; such rows are held as dicts
+    until TAIL_MAX of them pile up, then folded into new buffers.
+    """
+
+    def __init__(self, rows=()):
+        rows = list(rows)
+        self._keys = list(rows[0]) if rows else list(_CORE)
+        self._n = len(rows)
+        self._ids = _Texts(r["id"] for r in rows)
+        self._content = _Texts(r.get("content") for r in rows)
+        self._meta = _Texts(None if r.get("meta") is None else _encode_json(r["meta"]) for r in rows)
+        codes = {}
+        self._roles = bytearray(codes.setdefault(r.get("role"), len(codes)) for r in rows)
+        self._role_names = list(codes)
+        self._ts = {k: array("q", (_to_us(r.get(k)) for r in rows)) for k in _TIMESTAMPS if k in self._keys}
+        # created_at to the second as fixed-width UTC text, for labels
+        self._seconds = b"".join(_utc_seconds(r.get("created_at"), us).encode()
+                                 for r, us in zip(rows, self._ts.get("created_at", ())))
+        shared = {}
+        self._extra = {k: [_shared(shared, r.get(k)) for r in rows] for k in self._keys if k not in _CORE}
+        self._patched = {}    # position -> row dict edited since the build
+        self._tail = []       # rows added since the build, in created_at order
+        self._base_bytes = self._ids.nbytes + self._content.nbytes + self._meta.nbytes + len(self._roles)
+        self._base_bytes += len(self._seconds)
+        self._base_bytes += sum(a.itemsize * len(a) for a in self._ts.values())
+        for values in self._extra.values():
+            self._base_bytes += 8 * len(values) + sum(sys.getsizeof(v) for v in {id(v): v for v in values}.values())
+
+    # ---------------- Sequence ----------------
+    def __len__(self) -> int:
+        return self._n + len(self._tail)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self.row(j) for j in range(*i.indices(len(self)))]
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError(i)
+        return self.row(i)
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self.row(i)
+
+    def row(self, i: int) -> dict:
+        if i >= self._n:
+            return dict(self._tail[i - self._n])
+        if i in self._patched:
+            return dict(self._patched[i])
+        out = {}
+        for k in self._keys:
+            if k == "id":
+                out[k] = self._ids[i]
+            elif k == "role":
+                out[k] = self._role_names[self._roles[i]]
+            elif k == "content":
+                out[k] = self._content[i]
+            elif k == "meta":
+                meta = self._meta[i]
+                out[k] = None if meta is None else json.loads(meta)
+            elif k in self._ts:
+                out[k] = _from_us(self._ts[k][i])
+            else:
+                out[k] = self._extra[k][i]
+        return out
+
+    # ---------------- Lookups ----------------
+    def find(self, message_id) -> int:
+        """Position of the message, or -1."""
+        if message_id is None:
+            return -1
+        i = self._ids.find(str(message_id))
+        if i >= 0:
+            return i
+        for j, m in enumerate(self._tail):
+            if m["id"] == message_id:
+                return self._n + j
+        return -1
+
+    def created_at_us(self, i: int) -> int:
+        if i >= self._n:
+            return _to_us(self._tail[i - self._n]["created_at"])
+        return self._ts["created_at"][i]
+
+    def labels(self, width: int = LABEL_WIDTH) -> list:
+        """'<created_at to the second> • <role> • <start of content>' for every message, without building rows."""
+        names, roles, seconds = self._role_names, self._roles, self._seconds
+        buf, offsets, limit = self._content.buf, self._content.offsets, width * 4
+        out = []
+        for i in range(self._n):
+            start = offsets[i]
+            text = buf[start:min(offsets[i + 1], start + limit)].decode("utf-8", "ignore")[:width]
+            out.append(f"{seconds[i * 19:i * 19 + 19].decode()} • {names[roles[i]]} • " + text.replace("\n", " "))
+        for i in list(self._patched) + list(range(self._n, len(self))):
+            m = self.row(i)
+            label = f"{(m['created_at'] or '')[:19]} • {m['role']} • " + (m["content"] or "")[:width].replace("\n", " ")
+            if i < self._n:
+                out[i] = label
+            else:
+                out.append(label)
+        return out
+
+    # ---------------- Updates ----------------
+    def with_row(self, row: dict) -> "CompactThread":
+        """A copy with one message replaced (same id) or inserted; this thread is left as it is."""
+        i = self.find(row["id"])
+        if i < 0 and len(self) and _to_us(row["created_at"]) < self.created_at_us(len(self) - 1):
+            return self._folded([row])   # an older message: rebuild to keep created_at order
+        new = copy.copy(self)
+        new._patched, new._tail = dict(self._patched), list(self._tail)
+        if i >= self._n:
+            new._tail[i - self._n] = dict(row)
+        elif i >= 0:
+            new._patched[i] = dict(row)
+        else:
+            new._tail.append(dict(row))
+        if len(new._tail) + len(new._patched) > TAIL_MAX:
+            return new._folded()
+        return new
+
+    def _folded(self, extra=()) -> "CompactThread":
+        rows = list(self) + list(extra)
+        rows.sort(key=lambda m: _to_us(m["created_at"]))
+        return CompactThread(rows)
+
+    @property
+    def nbytes(self) -> int:
+        return self._base_bytes + estimate_bytes(self._tail) + estimate_bytes(self._patched.values())
+
+
+def _shared(seen: dict, value):
+    # one object per distinct hashable value (conversation ids, channels...)
+    try:
+        return seen.setdefault(value, value)
+    except TypeError:
+        return value
+
+
+# ---------------- Cache ----------------
+
+
+class ThreadCache:
+    """Process-wide, byte-bounded LRU of fully loaded threads (CompactThread, oldest -> newest).
+
+    Entries are keyed by (conversation_id, version). invalidate() bumps the
+    conversation's version, so every session misses on its next read and the
+    stale entry is dropped. In-flight loads are shared the same way, so two
+    sessions opening the same thread start one load between them.
+    """
+
+    def __init__(self, max_bytes: int = MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()   # (conv_id, version) -> (rows, size)
+        self._versions = {}
+        self._loads = {}                # (conv_id, version) -> in-flight load
+        self._lock = threading.Lock()
+
+    def version(self, conv_id) -> int:
+        with self._lock:
+            return self._versions.get(conv_id, 0)
+
+    def cached(self, conv_id) -> bool:
+        # like get() without counting a hit or miss
+        with self._lock:
+            return (conv_id, self._versions.get(conv_id, 0)) in self._entries
+
+    def get(self, conv_id):
+        with self._lock:
+            key = (conv_id, self._versions.get(conv_id, 0))
+            item = self._entries.get(key)
+            if item is None:
+                if key not in self._loads:   # polls of an in-flight load aren't new misses
+                    self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return item[0]
+
+    def put(self, conv_id, rows, version: int = None):
+        rows = rows if isinstance(rows, CompactThread) else CompactThread(rows)
+        size = rows.nbytes
+        with self._lock:
+            current = self._versions.get(conv_id, 0)
+            if version is not None and version != current:
+                return   # invalidated while loading; don't cache stale rows
+            key = (conv_id, current)
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.bytes -= old[1]
+            if size > self.max_bytes:
+                return
+            self._entries[key] = (rows, size)
+            self.bytes += size
+            while self.bytes > self.max_bytes:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self.bytes -= evicted
+                self.evictions += 1
+
+    def apply(self, conv_id, row: dict):
+        """Swap a cached thread for a copy with an inserted or updated message.
+
+        The copy is built outside the lock (a fold rebuilds the buffers), and
+        swapped in only if the entry wasn't replaced meanwhile; sessions still
+        holding the old thread keep reading it unchanged.
+        """
+        while True:
+            with self._lock:
+                key = (conv_id, self._versions.get(conv_id, 0))
+                item = self._entries.get(key)
+                if item is None:
+                    return
+            rows, size = item
+            new = rows.with_row(row)
+            new_size = new.nbytes
+            with self._lock:
+                if self._entries.get(key) is not item:
+                    continue   # replaced, invalidated or evicted meanwhile: start over
+                self._entries[key] = (new, new_size)
+                self.bytes += new_size - size
+                return
+
+    def invalidate(self, conv_id):
+        with self._lock:
+            version = self._versions.get(conv_id, 0)
+            item = self._entries.pop((conv_id, version), None)
+            if item is not None:
+                self.bytes -= item[1]
+            self._loads.pop((conv_id, version), None)
+            self._versions[conv_id] = version + 1
+
+    def load(self, conv_id, start):
+        """Return (load, version) for the thread, calling start() only if none is in flight."""
+        with self._lock:
+            version = self._versions.get(conv_id, 0)
+            key = (conv_id, version)
+            load = self._loads.get(key)
+        if load is None:
+            # start outside the lock: it does a network round trip
+            load = start()
+            with self._lock:
+                load = self._loads.setdefault(key, load)
+        return load, version
+
+    def finish_load(self, conv_id, version: int):
+        with self._lock:
+            self._loads.pop((conv_id, version), None)
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "threads": len(self._entries),
+                "bytes": self.bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "loading": len(self._loads),
+            }
@@ -0,0 +1,101 @@
+import math
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+# ---------------- Settings ----------------
+PAGE_SIZE = 200
+MAX_WORKERS = 8
+
+_EXECUTOR = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix="thread-loader")
+
+
+def _parse(ts: str) -> datetime:
+    return datetime.fromisoformat(ts.replace("Z", "+00:00"))
+
+
+class ThreadLoad:
+    """A full-thread load in progress: the newest page now, older windows as they finish."""
+
+    def __init__(self, newest: list, futures: list):
+        self.newest = newest          # oldest -> newest
+        self._futures = futures       # one per time window, oldest window first
+
+    @property
+    def total(self) -> int:
+        return len(self._futures) + 1
+
+    @property
+    def loaded(self) -> int:
+        return 1 + sum(f.done() for f in self._futures)
+
+    @property
+    def done(self) -> bool:
+        return all(f.done() for f in self._futures)
+
+    @property
+    def error(self):
+        for f in self._futures:
+            if f.done() and f.exception() is not None:
+                return f.exception()
+        return None
+
+    def rows(self) -> list:
+        """Messages oldest -> newest loaded so far.
+
+        Only windows contiguous with the newest page are included, so the list
+        never has gaps; rows shared by adjacent windows are dropped by id.
+        """
+        parts = [self.newest]
+        for f in reversed(self._futures):
+            if not f.done() or f.exception() is not None:
+                break
+            parts.append(f.result())
+        out, seen = [], set()
+        for part in reversed(parts):
+            for m in part:
+                if m["id"] not in seen:
+                    seen.add(m["id"])
+                    out.append(m)
+        return out
+
+
+def start_load(fetch_newest, fetch_range, conv_id, msg_count: int = 0,
+               page_size: int = PAGE_SIZE, workers: int = MAX_WORKERS) -> ThreadLoad:
+    """Fetch the newest page synchronously and schedule the rest in parallel windows.
+
+    `fetch_newest(conv_id, before, limit)` returns a newest-first page
+    (repository.list_messages); `fetch_range(conv_id, after, limit, until, after_id)`
+    returns an oldest-first page within (after, until], resuming after the
+    (created_at, id) keyset (after, after_id) when after_id is given
+    (repository.list_messages_after). The history between the oldest message
+    and the newest page is split into equal time windows, each paged on its
+    own worker.
+    """
+    newest = fetch_newest(conv_id, before=None, limit=page_size)
+    if len(newest) < page_size:
+        return ThreadLoad(list(reversed(newest)), [])
+
+    oldest = fetch_range(conv_id, after=None, limit=1)
+    hi_ts = newest[-1]["created_at"]
+    lo, hi = _parse(oldest[0]["created_at"]), _parse(hi_ts)
+
+    remaining = max(msg_count - len(newest), page_size)
+    n = max(1, min(workers * 2, math.ceil(remaining / page_size)))
+    edges = [(lo + (hi - lo) * i / n).isoformat() for i in range(1, n)]
+    bounds = list(zip([None] + edges, edges + [hi_ts]))
+
+    futures = [
+        _EXECUTOR.submit(_fetch_window, fetch_range, conv_id, after, until, page_size)
+        for after, until in bounds
+    ]
+    return ThreadLoad(list(reversed(newest)), futures)
+
+
+def _fetch_window(fetch_range, conv_id, after, until, page_size: int) -> list:
+    rows, cursor, cursor_id = [], after, None
+    while True:
+        page = fetch_range(conv_id, after=cursor, limit=page_size, until=until, after_id=cursor_id)
+        rows.extend(page)
+        if len(page) < page_size:
+            return rows
+        cursor, cursor_id = page[-1]["created_at"], page[-1]["id"]
@@ -0,0 +1,85 @@
+import heapq
+from datetime import datetime
+from itertools import islice
+from operator import itemgetter
+
+# ---------------- Settings ----------------
+WINDOW = 50               # merged messages per screen
+MIN_PAGE = 20             # smallest page read from one thread while merging
+
+
+def _parse(ts: str) -> datetime:
+    return datetime.fromisoformat(ts.replace("Z", "+00:00"))
+
+
+class _Source:
+    __slots__ = ("conv_id", "before", "skip", "rows", "pages", "more")
+
+    def __init__(self, conv_id, cursor):
+        self.conv_id = conv_id
+        self.before, self.skip = cursor   # next page to read, and its rows already shown
+        self.rows = []            # (created_at, index, row), newest first
+        self.pages = []           # (before, skip, index of its first row) of every page read
+        self.more = True
+
+    def cursor(self, n: int):
+        # cursor of the thread's messages after its first n rows read; always
+        # a page already read (plus rows to skip), so the next window's first
+        # read of this thread is the same page-cache entry
+        if n == len(self.rows):
+            return self.before, self.skip
+        for before, skip, start in reversed(self.pages):
+            if start <= n:
+                return before, skip + n - start
+        return self.before, self.skip
+
+
+def first_cursors(conv_ids) -> dict:
+    """Cursors of the newest window: every thread from its newest message."""
+    return {conv_id: (None, 0) for conv_id in conv_ids}
+
+
+def load_window(fetch_pages, cursors: dict, size: int = WINDOW, page: int = 0):
+    """One screen of several threads merged by created_at: the `size` newest messages below `cursors`.
+
+    fetch_pages([(conv_id, before, limit), ...]) returns the newest-first
+    list_messages page of each request (repository.list_messages_pages);
+    `before` is None or a (created_at, id) keyset.
+    cursors maps each thread still to be read to a (before, skip) cursor;
+    start with first_cursors() and pass the returned cursors for the next,
+    older window. Each thread is read a page
+    at a time, and only threads that could still hold messages of this
+    window are read again, so a window costs about `size` rows whatever the
+    threads' history. Returns (messages oldest -> newest, cursors of the
+    next window or None when every thread is exhausted).
+    """
+    if not cursors:
+        return [], None
+    page = page or max(MIN_PAGE, -(-size // len(cursors)))
+    sources = [_Source(conv_id, before) for conv_id, before in cursors.items()]
+    reading, merged = sources, []
+    while reading:
+        pages = fetch_pages([(s.conv_id, s.before, page) for s in reading])
+        for s, rows in zip(reading, pages):
+            s.pages.append((s.before, s.skip, len(s.rows)))
+            s.more = len(rows) >= page
+            if rows:
+                # (created_at, id) keyset: a tie across the page boundary is not skipped
+                s.before = rows[-1]["created_at"], rows[-1]["id"]
+            s.rows.extend((_parse(m["created_at"]), k, m) for k, m in enumerate(rows[s.skip:], len(s.rows)))
+            s.skip = 0
+        merged = list(islice(heapq.merge(*(s.rows for s in sources), key=itemgetter(0), reverse=True), size))
+        # a thread with more to read whose oldest row read is newer than the
+        # window's last message may still hold messages of this window
+        floor = merged[-1][0] if len(merged) == size else None
+        reading = [s for s in sources if s.more and (floor is None or s.rows[-1][0] > floor)]
+
+    taken = {}
+    for _, index, m in merged:
+        taken[m["conversation_id"]] = index + 1
+    next_cursors = {}
+    for s in sources:
+        n = taken.get(s.conv_id, 0)
+        if n < len(s.rows) or s.more:
+            next_cursors[s.conv_id] = s.cursor(n)
+    return [m for _, _, m in reversed(merged)], next_cursors or None
@@ -0,0 +1,192 @@
+import html
+import json
+from datetime import datetime, timezone
+
+# ---------------- Settings ----------------
+VIEWPORT_HEIGHT = 640     # px; the transcript scrolls inside this box
+ROW_ESTIMATE = 90         # px; initial height guess for rows not measured yet
+OVERSCAN = 8              # rows rendered above/below the viewport
+
+
+def fmt_time(ts: str) -> str:
+    try:
+        dt = datetime.fromisoformat(ts.replace("Z", "+00:00"))
+        return dt.astimezone(timezone.utc).strftime("%Y-%m-%d %H:%M UTC")
+    except Exception:
+        return ts
+
+
+def fmt_duration(ms) -> str:
+    if ms is None:
+        return "—"
+    secs = ms / 1000
+    if secs < 60:
+        return f"{secs:.1f}s" if secs < 10 else f"{secs:.0f}s"
+    if secs < 3600:
+        return f"{secs // 60:.0f}m {secs % 60:02.0f}s"
+    return f"{secs // 3600:.0f}h {secs % 3600 // 60:02.0f}m"
+
+
+def stats_line(stats: dict) -> str:
+    """One-line summary of a conversation_stats row (see repository.conversation_stats)."""
+    parts = [
+        f"{stats['user_msgs']} user / {stats['assistant_msgs']} assistant",
+        f"first reply {fmt_duration(stats['first_response_ms'])}",
+        f"median reply {fmt_duration(stats['median_response_ms'])}",
+    ]
+    if stats.get("avg_latency_ms") is not None:
+        parts.append(f"model latency {fmt_duration(stats['avg_latency_ms'])}")
+    if stats.get("tokens"):
+        parts.append(f"{stats['tokens']:,} tokens")
+    parts.append(f"{stats['user_chars'] + stats['assistant_chars']:,} chars")
+    return " · ".join(parts)
+
+
+def snippet_html(snippet: str) -> str:
+    # search snippets: escape the text, then turn the \x02/\x03 match markers into <mark>
+    return html.escape(snippet or "").replace("\x02", "<mark>").replace("\x03", "</mark>")
+
+
+def _rows_payload(msgs, sources=None) -> list:
+    # compact rows: [is_user, content, time (· source thread), meta_json_or_None]
+    rows = []
+    for m in msgs:
+        is_user = (m.get("role") or "").lower() == "user"
+        meta = m.get("meta")
+        when = fmt_time(m.get("created_at") or "")
+        if sources:
+            when += f" · {sources.get(m.get('conversation_id'), '')}"
+        rows.append([
+            1 if is_user else 0,
+            m.get("content") or "",
+            when,
+            json.dumps(meta, ensure_ascii=False, indent=2) if meta else None,
+        ])
+    return rows
+
+
+def build_transcript_html(msgs, palette: dict, height: int = VIEWPORT_HEIGHT, highlight_id=None,
+                          sources=None) -> str:
+    """One self-contained HTML document for the whole transcript (oldest -> newest).
+
+    Messages travel as JSON and are inserted with textContent, so content is
+    never interpreted as HTML. Only rows inside the viewport (plus OVERSCAN)
+    exist in the DOM; meta is pretty-printed only when its row is expanded.
+    The message with id `highlight_id`, if any, is outlined and scrolled to;
+    otherwise the view starts at the newest message. `sources` (conversation_id
+    -> label) tags each message with its thread, for merged timelines.
+    """
+    highlight = next((i for i, m in enumerate(msgs) if m.get("id") == highlight_id), -1)
+    # "<" escaped so nothing in the data can close the <script> element
+    data = json.dumps(_rows_payload(msgs, sources), ensure_ascii=False).replace("<", "\\u003c")
+    return _TEMPLATE % {
+        "height": height,
+        "estimate": ROW_ESTIMATE,
+        "overscan": OVERSCAN,
+        "navy": palette["NAVY"],
+        "accent": palette["FUCHSIA"],
+        "highlight": highlight,
+        "data": data,
+    }
+
+
+def render_transcript(msgs, palette: dict, height: int = VIEWPORT_HEIGHT, highlight_id=None, sources=None):
+    import streamlit.components.v1 as components
+    components.html(build_transcript_html(msgs, palette, height, highlight_id, sources),
+                    height=height + 8, scrolling=False)
+
+
+_TEMPLATE = """<!doctype html>
+<html><head><meta charset="utf-8"><style>
+  body { margin:0; font-family: "Source Sans Pro", sans-serif; color:%(navy)s; }
+  #vp { height:%(height)dpx; overflow-y:auto; position:relative; }
+  #sizer { position:relative; width:100%%; }
+  .chat-row { display:flex; padding:5px 4px; position:absolute; left:0; right:0; }
+  .chat-left { justify-content:flex-start; }
+  .chat-right { justify-content:flex-end; }
+  .wrap { max-width:74%%; }
+  .bubble { padding:12px 14px; border-radius:16px; line-height:1.45; word-wrap:break-word;
+            white-space:pre-wrap; box-shadow:0 10px 30px rgba(0,0,0,.10);
+            border:1px solid rgba(255,255,255,0.28); }
+  .user { background:rgba(255,255,255,0.55); }
+  .assistant { background:rgba(255,60,105,0.18); border-color:rgba(255,60,105,0.35); }
+  .hit .bubble { outline:2px solid %(accent)s; outline-offset:2px; }
+  .meta { font-size:12px; color:rgba(0,0,0,.45); margin-top:6px; }
+  .toggle { cursor:pointer; text-decoration:underline; margin-left:8px; }
+  pre { font-size:12px; background:rgba(255,255,255,.6); border-radius:8px; padding:8px;
+        white-space:pre-wrap; margin:6px 0 0; }
+</style></head><body>
+<div id="vp"><div id="sizer"></div></div>
+<script>
+const ROWS = %(data)s;
+const EST = %(estimate)d, OVERSCAN = %(overscan)d, HIGHLIGHT = %(highlight)d;
+const vp = document.getElementById("vp"), sizer = document.getElementById("sizer");
+const heights = new Float64Array(ROWS.length).fill(EST);
+const open = new Set();
+let offsets = new Float64Array(ROWS.length + 1);
+
+function layout() {
+  for (let i = 0; i < ROWS.length; i++) offsets[i + 1] = offsets[i] + heights[i];
+  sizer.style.height = offsets[ROWS.length] + "px";
+}
+
+function firstVisible(y) {
+  let lo = 0, hi = ROWS.length;
+  while (lo < hi) { const mid = (lo + hi) >> 1; if (offsets[mid + 1] <= y) lo = mid + 1; else hi = mid; }
+  return lo;
+}
+
+function buildRow(i) {
+  const [isUser, content, ts, meta] = ROWS[i];
+  const row = document.createElement("div");
+  row.className = "chat-row " + (isUser ? "chat-left" : "chat-right") + (i === HIGHLIGHT ? " hit" : "");
+  const wrap = document.createElement("div"); wrap.className = "wrap";
+  const bubble = document.createElement("div");
+  bubble.className = "bubble " + (isUser ? "user" : "assistant");
+  bubble.textContent = content;
+  const info = document.createElement("div"); info.className = "meta"; info.textContent = ts;
+  wrap.append(bubble, info);
+  if (meta !== null) {
+    const t = document.createElement("span"); t.className = "toggle";
+    t.textContent = open.has(i) ? "Hide details" : "Details";
+    t.onclick = () => { open.has(i) ? open.delete(i) : open.add(i); render(true); };
+    info.append(t);
+    if (open.has(i)) { const pre = document.createElement("pre"); pre.textContent = meta; wrap.append(pre); }
+  }
+  row.append(wrap);
+  return row;
+}
+
+function render(force) {
+  const top = vp.scrollTop, bottom = top + vp.clientHeight;
+  const start = Math.max(0, firstVisible(top) - OVERSCAN);
+  const end = Math.min(ROWS.length, firstVisible(bottom) + 1 + OVERSCAN);
+  if (!force && render.start === start && render.end === end) return;
+  render.start = start; render.end = end;
+  sizer.replaceChildren();
+  let changed = false;
+  for (let i = start; i < end; i++) {
+    const row = buildRow(i);
+    row.style.top = offsets[i] + "px";
+    sizer.append(row);
+    const h = row.offsetHeight;
+    if (h !== heights[i]) { heights[i] = h; changed = true; }
+  }
+  if (changed) {
+    layout();
+    [...sizer.children].forEach((row, k) => { row.style.top = offsets[start + k] + "px"; });
+  }
+}
+
+layout();
+vp.addEventListener("scroll", () => render(false), { passive: true });
+function scrollToStart() {
+  // newest at the bottom, or the highlighted message a third of the way down
+  vp.scrollTop = HIGHLIGHT >= 0 ? offsets[HIGHLIGHT] - vp.clientHeight / 3 : offsets[ROWS.length];
+  render(true);
+}
+render(true);
+scrollToStart();
+scrollToStart();   // again, now that rows around the target are measured
+</script></body></html>
+"""
@@ -0,0 +1,224 @@
+import atexit
+import json
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+# ---------------- Settings ----------------
+DEBOUNCE = 0.75           # seconds a write waits for further edits to the same record
+MAX_DELAY = 5.0           # ...but never longer than this after its first unsent edit
+BATCH_MAX = 100           # records per flush call
+RETRIES = 5               # failed attempts before an item is marked failed
+BACKOFF = 0.5             # seconds before the first retry; doubles per attempt
+BACKOFF_MAX = 30.0
+CLOSE_TIMEOUT = 10.0      # seconds close() waits for pending writes before saving them to the journal
+
+
+class Rejected(Exception):
+    """Raised by send() when records of the batch were not written (e.g. no longer exist).
+
+    The items are retried one at a time like any failed batch; an item sent
+    on its own and rejected is marked failed at once instead of retried.
+    """
+
+
+class _Item:
+    __slots__ = ("kind", "key", "value", "due", "attempts", "error", "failed", "in_flight", "seq", "solo", "queued")
+
+    def __init__(self, kind, key, value, due, seq):
+        self.kind = kind
+        self.key = key
+        self.value = value
+        self.due = due
+        self.attempts = 0
+        self.error = None
+        self.failed = False
+        self.in_flight = False
+        self.seq = seq
+        self.solo = False
+        self.queued = time.monotonic()
+
+
+class WriteQueue:
+    """Process-wide queue of writes, coalesced per record and flushed in the background.
+
+    submit(kind, key, value) queues a write and returns at once; a later
+    submit for the same key replaces the value and restarts its debounce (up
+    to MAX_DELAY), so only the latest edit of a record is sent. Due items are
+    flushed by kind in batches through send(kind, [(key, value), ...]), which
+    raises on failure. Failed batches back off exponentially and are retried
+    one item at a time, so one bad record can't keep failing the others;
+    after RETRIES an item stays `failed` until retry() or discard().
+
+    close() (also run at interpreter exit) flushes what it can and saves the
+    unsent and failed items to `journal`, a JSON file that the next queue
+    created with the same path loads again; without a journal they are
+    reported on stderr.
+    """
+
+    def __init__(self, send, debounce: float = DEBOUNCE, batch_max: int = BATCH_MAX, journal: str = None):
+        self.send = send
+        self.debounce = debounce
+        self.batch_max = batch_max
+        self.journal = journal
+        self.sent = 0
+        self.batches = 0
+        self._items = OrderedDict()     # key -> _Item
+        self._seq = 0
+        self._version = 0
+        self._closed = False
+        self._cond = threading.Condition()
+        self._load()
+        self._thread = threading.Thread(target=self._run, name="write-queue", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    # ---------------- Public ----------------
+    def submit(self, kind: str, key, value):
+        with self._cond:
+            self._seq += 1
+            item = self._items.get(key)
+            if item is None:
+                item = self._items[key] = _Item(kind, key, value, 0.0, self._seq)
+            item.value, item.seq = value, self._seq
+            item.due = min(time.monotonic() + self.debounce, item.queued + MAX_DELAY)
+            item.attempts, item.error, item.failed = 0, None, False
+            self._bump()
+
+    def status(self, key):
+        """None when nothing is queued for key, else {"state": "pending"|"failed", "error", "attempts", "value"}."""
+        with self._cond:
+            item = self._items.get(key)
+            if item is None:
+                return None
+            return {"state": "failed" if item.failed else "pending", "error": item.error,
+                    "attempts": item.attempts, "value": item.value}
+
+    def pending(self, kind: str = None) -> dict:
+        """key -> queued value, for every unsent (or failed) write of `kind`."""
+        with self._cond:
+            return {k: it.value for k, it in self._items.items() if kind is None or it.kind == kind}
+
+    def counts(self) -> dict:
+        with self._cond:
+            failed = sum(it.failed for it in self._items.values())
+            return {"pending": len(self._items) - failed, "failed": failed, "sent": self.sent, "batches": self.batches}
+
+    def retry(self, key):
+        with self._cond:
+            item = self._items.get(key)
+            if item is not None and item.failed:
+                item.failed, item.attempts, item.due = False, 0, time.monotonic()
+                self._bump()
+
+    def discard(self, key):
+        with self._cond:
+            item = self._items.get(key)
+            if item is not None and not item.in_flight:
+                del self._items[key]
+                self._bump()
+
+    def version(self) -> int:
+        # changes whenever an item is queued, sent, retried or fails
+        with self._cond:
+            return self._version
+
+    def flush(self, timeout: float = 10.0) -> bool:
+        """Send everything now and wait until no item is pending (failed items don't count)."""
+        end = time.monotonic() + timeout
+        with self._cond:
+            for item in self._items.values():
+                if not item.failed:
+                    item.due = 0.0
+            self._cond.notify_all()
+            while any(not it.failed for it in self._items.values()):
+                left = end - time.monotonic()
+                if left <= 0:
+                    return False
+                self._cond.wait(left)
+        return True
+
+    def close(self, timeout: float = CLOSE_TIMEOUT):
+        """Flush, then keep whatever is still unsent or failed in the journal."""
+        with self._cond:
+            if self._closed:
+                return
+            self._closed = True
+        self.flush(timeout)
+        with self._cond:
+            left = [{"kind": it.kind, "key": list(it.key), "value": it.value, "failed": it.failed, "error": it.error}
+                    for it in self._items.values()]
+        if self.journal:
+            tmp = self.journal + ".tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(left, f)
+            os.replace(tmp, self.journal)
+        elif left:
+            print(f"write queue: {len(left)} writes not saved: {json.dumps(left)}", file=sys.stderr)
+
+    def _load(self):
+        # items a previous queue saved on close(); unsent ones go out right away
+        if not self.journal:
+            return
+        try:
+            with open(self.journal, encoding="utf-8") as f:
+                saved = json.load(f)
+        except (FileNotFoundError, ValueError):
+            return
+        for entry in saved:
+            self._seq += 1
+            key = tuple(entry["key"])
+            item = self._items[key] = _Item(entry["kind"], key, entry["value"], 0.0, self._seq)
+            item.failed, item.error = entry["failed"], entry["error"]
+            item.attempts = RETRIES if item.failed else 0
+
+    # ---------------- Worker ----------------
+    def _bump(self):
+        self._version += 1
+        self._cond.notify_all()
+
+    def _next_batch(self):
+        # wait for the earliest due item, then take every due item of its kind
+        with self._cond:
+            while True:
+                now = time.monotonic()
+                ready = [it for it in self._items.values() if not it.failed and not it.in_flight]
+                due = [it for it in ready if it.due <= now]
+                if due:
+                    first = due[0]
+                    if first.solo:
+                        batch = [first]
+                    else:
+                        batch = [it for it in due if it.kind == first.kind and not it.solo][:self.batch_max]
+                    for it in batch:
+                        it.in_flight = True
+                    return first.kind, [(it, it.seq, it.value) for it in batch]
+                self._cond.wait(min((it.due for it in ready), default=now + 60) - now)
+
+    def _run(self):
+        while True:
+            kind, batch = self._next_batch()
+            rejected = False
+            try:
+                self.send(kind, [(it.key, value) for it, _, value in batch])
+                error = None
+            except Exception as e:
+                error = f"{type(e).__name__}: {e}"
+                rejected = isinstance(e, Rejected) and len(batch) == 1
+            with self._cond:
+                self.batches += 1
+                for it, seq, value in batch:
+                    it.in_flight = False
+                    if error is None:
+                        self.sent += 1
+                        if it.seq == seq:      # not edited again while in flight
+                            del self._items[it.key]
+                    elif it.seq == seq:
+                        it.attempts += 1
+                        it.error = error
+                        it.solo = len(batch) > 1 or it.solo
+                        it.failed = rejected or it.attempts >= RETRIES
+                        it.due = time.monotonic() + min(BACKOFF * 2 ** (it.attempts - 1), BACKOFF_MAX)
+                self._bump()